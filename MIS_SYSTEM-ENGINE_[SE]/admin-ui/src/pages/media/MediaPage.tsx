@@ -4,21 +4,67 @@ import { Image, Music, Trash2, RefreshCw, Filter } from 'lucide-react';
 
 interface MediaFile {
   id: string;
+  upload_id: number;
   type: 'photo' | 'audio';
   filename: string;
   url: string;
   size_bytes: number;
+  derivatives: Record<string, Record<string, string>> | null;
   created_at: number;
 }
 
 type MediaFilter = 'all' | 'photos' | 'audio';
 
+// Uploads are admin-only and <img> cannot send the bearer token,
+// so previews are fetched and shown from an object URL
+function AuthorizedImage({ file }: { file: MediaFile }) {
+  const [src, setSrc] = useState<string | null>(null);
+  const [failed, setFailed] = useState(false);
+
+  useEffect(() => {
+    let objectUrl: string | null = null;
+    let cancelled = false;
+
+    const load = async () => {
+      if (file.derivatives) {
+        try {
+          return await apiService.media.file(file.upload_id, 'thumbnail');
+        } catch {
+          // The thumbnail may not have been rendered yet
+        }
+      }
+      return await apiService.media.file(file.upload_id);
+    };
+
+    load()
+      .then((blob) => {
+        if (cancelled) return;
+        objectUrl = URL.createObjectURL(blob);
+        setSrc(objectUrl);
+      })
+      .catch(() => {
+        if (!cancelled) setFailed(true);
+      });
+
+    return () => {
+      cancelled = true;
+      if (objectUrl) URL.revokeObjectURL(objectUrl);
+    };
+  }, [file.upload_id]);
+
+  if (failed) return <Image className="h-16 w-16 text-gray-400" />;
+  if (!src) return null;
+  return <img src={src} alt={file.filename} className="w-full h-full object-cover" />;
+}
+
 export function MediaPage() {
   const [files, setFiles] = useState<MediaFile[]>([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
   const [success, setSuccess] = useState<string | null>(null);
   const [filter, setFilter] = useState<MediaFilter>('all');
+  const [total, setTotal] = useState(0);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [deleteConfirm, setDeleteConfirm] = useState<MediaFile | null>(null);
   const [deleting, setDeleting] = useState(false);
 
@@ -26,12 +72,15 @@ export function MediaPage() {
     fetchMedia();
   }, [filter]);
 
-  const fetchMedia = async () => {
+  // Without a cursor the list starts over; with one the next page is appended
+  const fetchMedia = async (cursor?: string) => {
     try {
       setLoading(true);
       setError(null);
-      const response = await apiService.media.list(filter);
-      setFiles(response.files);
+      const response = await apiService.media.list(filter, cursor);
+      setFiles((current) => (cursor ? [...current, ...response.files] : response.files));
+      setTotal(response.count);
+      setNextCursor(response.nextCursor);
     } catch (err: any) {
       setError(err.response?.data?.detail || 'Failed to load media files');
     } finally {
@@ -85,7 +134,7 @@ export function MediaPage() {
           </p>
         </div>
         <button
-          onClick={fetchMedia}
+          onClick={() => fetchMedia()}
           disabled={loading}
           className="flex items-center gap-2 px-4 py-2 bg-blue-600 text-white rounded-lg hover:bg-blue-700 disabled:opacity-50"
         >
@@ -126,7 +175,7 @@ export function MediaPage() {
           ))}
         </div>
         <span className="text-sm text-gray-500 dark:text-gray-400">
-          {files.length} file{files.length !== 1 ? 's' : ''}
+          {files.length} of {total} file{total !== 1 ? 's' : ''}
         </span>
       </div>
 
@@ -144,20 +193,13 @@ export function MediaPage() {
         <div className="grid grid-cols-2 md:grid-cols-3 lg:grid-cols-4 xl:grid-cols-5 gap-4">
           {files.map((file) => (
             <div
-              key={file.id}
+              key={file.upload_id}
               className="group bg-white dark:bg-gray-800 rounded-xl shadow border border-gray-200 dark:border-gray-700 overflow-hidden hover:shadow-lg transition-shadow"
             >
               {/* Preview */}
               <div className="aspect-square bg-gray-100 dark:bg-gray-900 flex items-center justify-center relative">
                 {file.type === 'photo' ? (
-                  <img
-                    src={file.url}
-                    alt={file.filename}
-                    className="w-full h-full object-cover"
-                    onError={(e) => {
-                      (e.target as HTMLImageElement).style.display = 'none';
-                    }}
-                  />
+                  <AuthorizedImage file={file} />
                 ) : (
                   <Music className="h-16 w-16 text-gray-400" />
                 )}
@@ -198,6 +240,18 @@ export function MediaPage() {
         </div>
       )}
 
+      {nextCursor && (
+        <div className="flex justify-center">
+          <button
+            onClick={() => fetchMedia(nextCursor)}
+            disabled={loading}
+            className="px-4 py-2 bg-gray-100 dark:bg-gray-700 text-gray-700 dark:text-gray-300 rounded-lg hover:bg-gray-200 dark:hover:bg-gray-600 disabled:opacity-50"
+          >
+            {loading ? 'Loading...' : 'Load more'}
+          </button>
+        </div>
+      )}
+
       {/* Delete Confirmation Modal */}
       {deleteConfirm && (
         <div className="fixed inset-0 bg-black bg-opacity-50 flex items-center justify-center z-50">
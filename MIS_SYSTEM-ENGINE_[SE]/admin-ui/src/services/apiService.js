@@ -166,8 +166,19 @@ class ApiService {
         };
         // Media Management
         this.media = {
-            list: async (mediaType = 'all') => {
-                return await this.get(`/api/upload/list?media_type=${mediaType}`);
+            list: async (mediaType = 'all', cursor) => {
+                // Pages are chained through the X-Next-Cursor header, absent on the last page
+                const response = await this.instance.get('/api/upload/list', {
+                    params: { media_type: mediaType, cursor },
+                });
+                return { ...response.data, nextCursor: response.headers['x-next-cursor'] ?? null };
+            },
+            // The file (or a photo derivative) through the admin-only download route
+            file: async (uploadId, variant) => {
+                return await this.get(`/api/upload/files/${uploadId}`, {
+                    params: variant ? { variant } : undefined,
+                    responseType: 'blob',
+                });
             },
             delete: async (mediaType, fileId) => {
                 return await this.apiDelete(`/api/upload/${mediaType}/${fileId}`);
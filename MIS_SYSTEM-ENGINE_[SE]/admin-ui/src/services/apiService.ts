@@ -561,19 +561,34 @@ class ApiService {
 
   // Media Management
   media = {
-    list: async (mediaType: 'all' | 'photos' | 'audio' = 'all'): Promise<{
+    list: async (mediaType: 'all' | 'photos' | 'audio' = 'all', cursor?: string): Promise<{
       success: boolean
       count: number
       files: Array<{
         id: string
+        upload_id: number
         type: 'photo' | 'audio'
         filename: string
         url: string
         size_bytes: number
+        derivatives: Record<string, Record<string, string>> | null
         created_at: number
       }>
+      nextCursor: string | null
     }> => {
-      return await this.get(`/api/upload/list?media_type=${mediaType}`)
+      // Pages are chained through the X-Next-Cursor header, absent on the last page
+      const response = await this.instance.get('/api/upload/list', {
+        params: { media_type: mediaType, cursor },
+      })
+      return { ...response.data, nextCursor: response.headers['x-next-cursor'] ?? null }
+    },
+
+    // The file (or a photo derivative) through the admin-only download route
+    file: async (uploadId: number, variant?: 'thumbnail' | 'medium'): Promise<Blob> => {
+      return await this.get<Blob>(`/api/upload/files/${uploadId}`, {
+        params: variant ? { variant } : undefined,
+        responseType: 'blob',
+      })
     },
 
     delete: async (mediaType: 'photos' | 'audio', fileId: string): Promise<{ success: boolean; message: string }> => {
@@ -14,7 +14,9 @@ from app.config import settings
 from app.database import Base
 from app.models import (
     active_user, admin, login_history, pending_user, 
-    qr_session, registered_service
+    qr_session, registered_service, active_session, login_rollup,
+    login_bucket, email_outbox, admin_notification, upload_blob, upload,
+    resumable_upload, photo_hash, job_lease, bulk_job
 )
 
 # this is the Alembic Config object, which provides
@@ -0,0 +1,53 @@
+"""Add composite indexes for hot queries
+
+Revision ID: 27518b931354
+Revises: f9e10644b608
+Create Date: 2026-10-19 10:12:40.118233
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '27518b931354'
+down_revision: Union[str, None] = 'f9e10644b608'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (index name, table, columns) - kept in step with the models' __table_args__
+INDEXES = [
+    ("ix_login_history_user_id_login_at", "login_history", ["user_id", "login_at"]),
+    ("ix_login_history_service_id_login_at", "login_history", ["service_id", "login_at"]),
+    ("ix_login_history_login_at", "login_history", ["login_at"]),
+    ("ix_qr_sessions_expires_at", "qr_sessions", ["expires_at"]),
+    ("ix_waitlist_requests_status_created_at", "waitlist_requests", ["status", "created_at"]),
+    ("ix_waitlist_requests_created_at", "waitlist_requests", ["created_at"]),
+    ("ix_pending_users_is_reviewed_created_at", "pending_users", ["is_reviewed", "created_at"]),
+    ("ix_invitations_is_used_expires_at", "invitations", ["is_used", "expires_at"]),
+    ("ix_invitations_is_used_created_at", "invitations", ["is_used", "created_at"]),
+    ("ix_invitations_created_at", "invitations", ["created_at"]),
+    ("ix_active_users_created_at", "active_users", ["created_at"]),
+]
+
+
+def _existing_tables():
+    return set(sa.inspect(op.get_bind()).get_table_names())
+
+
+def upgrade() -> None:
+    # Tables are created by init_db / app startup, so only index what exists
+    tables = _existing_tables()
+    for name, table, columns in INDEXES:
+        if table in tables:
+            op.create_index(name, table, columns, if_not_exists=True)
+
+
+def downgrade() -> None:
+    tables = _existing_tables()
+    for name, table, columns in reversed(INDEXES):
+        if table in tables:
+            op.drop_index(name, table_name=table, if_exists=True)
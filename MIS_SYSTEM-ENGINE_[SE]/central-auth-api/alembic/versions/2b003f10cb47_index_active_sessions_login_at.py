@@ -0,0 +1,28 @@
+"""Index active_sessions.login_at for the dashboard
+
+Revision ID: 2b003f10cb47
+Revises: 27518b931354
+Create Date: 2026-10-19 11:02:17.540981
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2b003f10cb47'
+down_revision: Union[str, None] = '27518b931354'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if "active_sessions" in sa.inspect(op.get_bind()).get_table_names():
+        op.create_index("ix_active_sessions_login_at", "active_sessions", ["login_at"], if_not_exists=True)
+
+
+def downgrade() -> None:
+    if "active_sessions" in sa.inspect(op.get_bind()).get_table_names():
+        op.drop_index("ix_active_sessions_login_at", table_name="active_sessions", if_exists=True)
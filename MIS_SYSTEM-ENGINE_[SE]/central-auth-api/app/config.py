@@ -23,6 +23,82 @@ class Settings:
     QR_CODE_EXPIRY_MINUTES: int = int(os.getenv("QR_CODE_EXPIRY_MINUTES", "2"))
     PIN_EXPIRY_MINUTES: int = int(os.getenv("PIN_EXPIRY_MINUTES", "5"))
     SESSION_EXPIRY_MINUTES: int = int(os.getenv("SESSION_EXPIRY_MINUTES", "30"))
+
+    # Login write-behind buffer
+    LOGIN_WRITE_BEHIND_MAX_BATCH: int = int(os.getenv("LOGIN_WRITE_BEHIND_MAX_BATCH", "200"))
+    LOGIN_WRITE_BEHIND_FLUSH_SECONDS: float = float(os.getenv("LOGIN_WRITE_BEHIND_FLUSH_SECONDS", "1.0"))
+    # Failed flushes of a batch before it is written row by row and bad rows dropped
+    LOGIN_WRITE_BEHIND_MAX_ATTEMPTS: int = int(os.getenv("LOGIN_WRITE_BEHIND_MAX_ATTEMPTS", "5"))
+
+    # How often expired sessions are moved from active_sessions to login_history
+    SESSION_SWEEP_INTERVAL_SECONDS: int = int(os.getenv("SESSION_SWEEP_INTERVAL_SECONDS", "60"))
+
+    # Login history archiving (0 disables)
+    LOGIN_HISTORY_RETENTION_DAYS: int = int(os.getenv("LOGIN_HISTORY_RETENTION_DAYS", "90"))
+    ARCHIVE_DIR: str = os.getenv("ARCHIVE_DIR", "data/archive")
+    ARCHIVE_CHUNK_SIZE: int = int(os.getenv("ARCHIVE_CHUNK_SIZE", "1000"))
+    ARCHIVE_CHUNK_PAUSE_SECONDS: float = float(os.getenv("ARCHIVE_CHUNK_PAUSE_SECONDS", "0.1"))
+
+    # Retention policies (0 disables a policy)
+    QR_SESSION_RETENTION_HOURS: int = int(os.getenv("QR_SESSION_RETENTION_HOURS", "1"))
+    REVIEWED_PENDING_USER_RETENTION_DAYS: int = int(os.getenv("REVIEWED_PENDING_USER_RETENTION_DAYS", "30"))
+    REJECTED_WAITLIST_RETENTION_DAYS: int = int(os.getenv("REJECTED_WAITLIST_RETENTION_DAYS", "30"))
+    INVITATION_RETENTION_DAYS: int = int(os.getenv("INVITATION_RETENTION_DAYS", "30"))
+    ADMIN_NOTIFICATION_RETENTION_DAYS: int = int(os.getenv("ADMIN_NOTIFICATION_RETENTION_DAYS", "7"))
+    # Sent and failed emails carry invitation codes and PINs in their bodies
+    EMAIL_OUTBOX_RETENTION_DAYS: int = int(os.getenv("EMAIL_OUTBOX_RETENTION_DAYS", "7"))
+    RETENTION_BATCH_SIZE: int = int(os.getenv("RETENTION_BATCH_SIZE", "500"))
+    RETENTION_BATCH_PAUSE_SECONDS: float = float(os.getenv("RETENTION_BATCH_PAUSE_SECONDS", "0.05"))
+    RETENTION_INTERVAL_SECONDS: int = int(os.getenv("RETENTION_INTERVAL_SECONDS", "3600"))
+    # A worker running retention holds a database lease for this long, renewed every batch
+    RETENTION_LEASE_SECONDS: int = int(os.getenv("RETENTION_LEASE_SECONDS", "600"))
+
+    # How long list endpoints reuse a computed X-Total-Count
+    TOTAL_COUNT_CACHE_SECONDS: int = int(os.getenv("TOTAL_COUNT_CACHE_SECONDS", "30"))
+
+    # Login analytics: hourly buckets older than this are dropped (daily kept)
+    ANALYTICS_HOURLY_RETENTION_DAYS: int = int(os.getenv("ANALYTICS_HOURLY_RETENTION_DAYS", "90"))
+
+    # Rows fetched per round trip by streaming exports
+    EXPORT_BATCH_SIZE: int = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+    # Uploads
+    UPLOAD_DIR: str = os.getenv("UPLOAD_DIR", "uploads")
+    UPLOAD_CHUNK_SIZE: int = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+    UPLOAD_MAX_PHOTO_BYTES: int = int(os.getenv("UPLOAD_MAX_PHOTO_BYTES", str(10 * 1024 * 1024)))
+    UPLOAD_MAX_AUDIO_BYTES: int = int(os.getenv("UPLOAD_MAX_AUDIO_BYTES", str(50 * 1024 * 1024)))
+    # Set to the internal nginx location (e.g. /internal-uploads/) to have nginx send
+    # downloads via X-Accel-Redirect; empty serves them from Python (development)
+    UPLOAD_ACCEL_REDIRECT_PREFIX: str = os.getenv("UPLOAD_ACCEL_REDIRECT_PREFIX", "")
+    # Public, unauthenticated /uploads mount for development; production turns it off and
+    # the admin UI loads files through /api/upload/files
+    SERVE_UPLOADS_STATIC: bool = os.getenv("SERVE_UPLOADS_STATIC", "True") == "True"
+    # Photos whose 64-bit dHashes differ in at most this many bits are flagged as likely duplicates
+    PHOTO_DUPLICATE_MAX_DISTANCE: int = int(os.getenv("PHOTO_DUPLICATE_MAX_DISTANCE", "10"))
+    # Uploads no registration links are deleted after this many hours (0 disables)
+    UPLOAD_ORPHAN_GRACE_HOURS: int = int(os.getenv("UPLOAD_ORPHAN_GRACE_HOURS", "48"))
+    UPLOAD_GC_INTERVAL_SECONDS: int = int(os.getenv("UPLOAD_GC_INTERVAL_SECONDS", "3600"))
+    # Chunked uploads: largest chunk accepted, and how long an idle partial upload is kept
+    UPLOAD_RESUMABLE_CHUNK_BYTES: int = int(os.getenv("UPLOAD_RESUMABLE_CHUNK_BYTES", str(5 * 1024 * 1024)))
+    UPLOAD_RESUMABLE_TTL_SECONDS: int = int(os.getenv("UPLOAD_RESUMABLE_TTL_SECONDS", "86400"))
+    UPLOAD_RESUMABLE_SWEEP_INTERVAL_SECONDS: int = int(os.getenv("UPLOAD_RESUMABLE_SWEEP_INTERVAL_SECONDS", "900"))
+
+    # Photo derivatives (thumbnail and medium WebP/JPEG), rendered in a process pool
+    IMAGE_DERIVATIVES_ENABLED: bool = os.getenv("IMAGE_DERIVATIVES_ENABLED", "True") == "True"
+    IMAGE_WORKERS: int = int(os.getenv("IMAGE_WORKERS", "2"))
+    IMAGE_THUMBNAIL_PX: int = int(os.getenv("IMAGE_THUMBNAIL_PX", "256"))
+    IMAGE_MEDIUM_PX: int = int(os.getenv("IMAGE_MEDIUM_PX", "1024"))
+
+    # How long finished bulk jobs stay pollable
+    JOB_RETENTION_SECONDS: int = int(os.getenv("JOB_RETENTION_SECONDS", "3600"))
+
+    # Admin dashboard snapshot
+    DASHBOARD_REFRESH_SECONDS: int = int(os.getenv("DASHBOARD_REFRESH_SECONDS", "15"))
+
+    # Service registry cache
+    SERVICE_REGISTRY_TTL_SECONDS: int = int(os.getenv("SERVICE_REGISTRY_TTL_SECONDS", "300"))
+    # How long an unknown service id is remembered as missing
+    SERVICE_REGISTRY_NEGATIVE_TTL_SECONDS: int = int(os.getenv("SERVICE_REGISTRY_NEGATIVE_TTL_SECONDS", "30"))
     
     # Email
     SMTP_HOST: str = os.getenv("SMTP_HOST", "smtp.gmail.com")
@@ -30,6 +106,19 @@ class Settings:
     SMTP_USER: str = os.getenv("SMTP_USER", "")
     SMTP_PASSWORD: str = os.getenv("SMTP_PASSWORD", "")
     ADMIN_EMAIL: str = os.getenv("ADMIN_EMAIL", "admin@example.com")
+    SMTP_START_TLS: bool = os.getenv("SMTP_START_TLS", "True") == "True"
+    SMTP_TIMEOUT_SECONDS: float = float(os.getenv("SMTP_TIMEOUT_SECONDS", "30"))
+    # Open SMTP connections reused by the dispatcher, and so its send concurrency
+    EMAIL_CONCURRENCY: int = int(os.getenv("EMAIL_CONCURRENCY", "5"))
+    EMAIL_DISPATCH_BATCH_SIZE: int = int(os.getenv("EMAIL_DISPATCH_BATCH_SIZE", "100"))
+    EMAIL_DISPATCH_INTERVAL_SECONDS: float = float(os.getenv("EMAIL_DISPATCH_INTERVAL_SECONDS", "5"))
+    EMAIL_MAX_ATTEMPTS: int = int(os.getenv("EMAIL_MAX_ATTEMPTS", "6"))
+    # Retry n waits EMAIL_RETRY_BASE_SECONDS * 2**(n-1), capped at an hour
+    EMAIL_RETRY_BASE_SECONDS: float = float(os.getenv("EMAIL_RETRY_BASE_SECONDS", "30"))
+    # Admin notifications: the first few per window are emailed immediately,
+    # the rest go out as one digest per window. A window of 0 disables digests.
+    ADMIN_DIGEST_WINDOW_SECONDS: int = int(os.getenv("ADMIN_DIGEST_WINDOW_SECONDS", "300"))
+    ADMIN_DIGEST_IMMEDIATE_LIMIT: int = int(os.getenv("ADMIN_DIGEST_IMMEDIATE_LIMIT", "5"))
     
     # API
     API_TITLE: str = os.getenv("API_TITLE", "Central Auth API")
@@ -0,0 +1,77 @@
+"""
+Background Jobs
+
+Small helper for running periodic maintenance jobs inside the API process.
+Jobs are plain blocking functions; they run in the threadpool so they never
+block the event loop. Started and stopped by the app's startup/shutdown hooks.
+"""
+import asyncio
+from typing import Callable, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app.database import SessionLocal
+
+
+def with_session(job: Callable) -> Callable:
+    """Wrap a job taking a db session so it opens and closes its own"""
+    def run():
+        db = SessionLocal()
+        try:
+            return job(db)
+        finally:
+            db.close()
+    run.__name__ = getattr(job, "__name__", "job")
+    return run
+
+
+class PeriodicTask:
+    def __init__(self, name: str, interval_seconds: float, job: Callable):
+        self.name = name
+        self.interval_seconds = interval_seconds
+        self.job = job
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name=self.name)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def run_once(self):
+        try:
+            return await run_in_threadpool(self.job)
+        except Exception as e:
+            print(f"Background job '{self.name}' failed: {e}")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            await self.run_once()
+
+
+# Jobs registered here are started on app startup and cancelled on shutdown
+periodic_tasks: List[PeriodicTask] = []
+
+
+def register_periodic_task(name: str, interval_seconds: float, job: Callable) -> PeriodicTask:
+    task = PeriodicTask(name, interval_seconds, job)
+    periodic_tasks.append(task)
+    return task
+
+
+def start_periodic_tasks():
+    for task in periodic_tasks:
+        task.start()
+
+
+async def stop_periodic_tasks():
+    for task in periodic_tasks:
+        await task.stop()
@@ -1,44 +1,117 @@
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
+"""
+Email Delivery
+
+Sends mail over a small pool of reused aiosmtplib connections. Request
+handlers never send directly: they queue mail in the email_outbox table
+(notification_service.queue_email) and the email dispatcher delivers it.
+"""
+import asyncio
+from email.message import EmailMessage
+from typing import List, Optional
+
+import aiosmtplib
+
 from app.config import settings
-from typing import List
-
-conf = ConnectionConfig(
-    MAIL_USERNAME=settings.SMTP_USER,
-    MAIL_PASSWORD=settings.SMTP_PASSWORD,
-    MAIL_FROM=settings.ADMIN_EMAIL,
-    MAIL_PORT=settings.SMTP_PORT,
-    MAIL_SERVER=settings.SMTP_HOST,
-    MAIL_STARTTLS=True,
-    MAIL_SSL_TLS=False,
-    USE_CREDENTIALS=True,
-    VALIDATE_CERTS=True
-)
-
-async def send_email(recipients: List[str], subject: str, body: str):
+
+
+def smtp_configured() -> bool:
+    """Without credentials emails are only printed (local development)"""
+    return bool(settings.SMTP_USER and settings.SMTP_PASSWORD)
+
+
+def build_message(recipient: str, subject: str, body: str, subtype: str = "html") -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = settings.ADMIN_EMAIL
+    message["To"] = recipient
+    message["Subject"] = subject
+    message.set_content(body, subtype=subtype)
+    return message
+
+
+class SMTPPool:
     """
-    Send email asynchronously using FastMail
+    Up to `size` open SMTP connections, each used by one send at a time
+    Idle connections are kept and reused; broken ones are dropped
     """
-    try:
-        # Check if email is actually configured
-        if not settings.SMTP_USER or not settings.SMTP_PASSWORD:
-            print(f" [MOCK EMAIL] -------------------------------------------------")
-            print(f" To: {recipients}")
-            print(f" Subject: {subject}")
-            print(f" Body Preview: {body[:100]}...")
-            print(f" --------------------------------------------------------------")
-            return True
-
-        message = MessageSchema(
-            subject=subject,
-            recipients=recipients,
-            body=body,
-            subtype=MessageType.html
+
+    def __init__(
+        self,
+        hostname: str,
+        port: int,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        start_tls: bool = True,
+        timeout: float = 30,
+        size: int = 5
+    ):
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.password = password
+        self.start_tls = start_tls
+        self.timeout = timeout
+        self.size = size
+        self.connections_opened = 0
+        self._idle: List[aiosmtplib.SMTP] = []
+        # Created lazily so it binds to the event loop that uses it
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        client = aiosmtplib.SMTP(
+            hostname=self.hostname,
+            port=self.port,
+            timeout=self.timeout,
+            start_tls=self.start_tls
         )
+        await client.connect()
+        if self.username:
+            await client.login(self.username, self.password)
+        self.connections_opened += 1
+        return client
+
+    async def send(self, message: EmailMessage):
+        """Send one message, raising on failure"""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.size)
+
+        async with self._slots:
+            client = self._idle.pop() if self._idle else None
+            try:
+                if client is None or not client.is_connected:
+                    client = await self._connect()
+                try:
+                    await client.send_message(message)
+                except aiosmtplib.SMTPServerDisconnected:
+                    # The server dropped an idle connection; retry once on a fresh one
+                    client = await self._connect()
+                    await client.send_message(message)
+            except Exception:
+                if client is not None:
+                    client.close()
+                raise
+
+            self._idle.append(client)
+
+    async def close(self):
+        idle, self._idle = self._idle, []
+        for client in idle:
+            try:
+                await client.quit()
+            except Exception:
+                client.close()
+        self._slots = None
+
 
-        fm = FastMail(conf)
-        await fm.send_message(message)
-        print(f"Email sent to {recipients}")
-        return True
-    except Exception as e:
-        print(f"Failed to send email: {e}")
-        return False
+def create_smtp_pool() -> Optional[SMTPPool]:
+    """Pool for the configured SMTP server, or None when email is not configured"""
+    if not smtp_configured():
+        return None
+    return SMTPPool(
+        hostname=settings.SMTP_HOST,
+        port=settings.SMTP_PORT,
+        username=settings.SMTP_USER,
+        password=settings.SMTP_PASSWORD,
+        start_tls=settings.SMTP_START_TLS,
+        timeout=settings.SMTP_TIMEOUT_SECONDS,
+        size=settings.EMAIL_CONCURRENCY
+    )
@@ -0,0 +1,180 @@
+"""
+Email Outbox Dispatcher
+
+Delivers the email_outbox table in the background. Each round claims up to
+EMAIL_DISPATCH_BATCH_SIZE due messages, sends them concurrently over the
+SMTP pool (which caps parallelism at EMAIL_CONCURRENCY reused connections)
+and records the outcome. Failed messages are retried with exponential
+backoff and marked failed after EMAIL_MAX_ATTEMPTS.
+
+Every API worker runs a dispatcher. A round claims its messages with one
+conditional UPDATE ... RETURNING that pushes next_attempt_at past a lease,
+so a message due now is claimed, and sent, by exactly one of them.
+
+Rounds run every EMAIL_DISPATCH_INTERVAL_SECONDS, back to back while there
+is a backlog. Started and stopped by the app's startup/shutdown hooks.
+"""
+import asyncio
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional
+
+from sqlalchemy import select, update
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.core.email import SMTPPool, build_message, create_smtp_pool
+from app.database import SessionLocal
+from app.models.email_outbox import EmailOutbox, OutboxStatus
+
+# Longest wait between retries
+MAX_RETRY_DELAY_SECONDS = 3600
+
+
+class EmailDispatcher:
+    def __init__(
+        self,
+        pool: Optional[SMTPPool],
+        batch_size: int = 100,
+        interval_seconds: float = 5,
+        max_attempts: int = 6,
+        retry_base_seconds: float = 30,
+        session_factory: Callable = SessionLocal
+    ):
+        # No pool means email is not configured: messages are printed instead
+        self.pool = pool
+        self.batch_size = batch_size
+        self.interval_seconds = interval_seconds
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.session_factory = session_factory
+        # Claimed messages are skipped by other rounds until this long has passed. A batch
+        # goes out a pool's worth at a time and each send may take a connect and a
+        # delivery timeout, so the lease covers the slowest whole batch plus one round.
+        concurrency, timeout = (pool.size, pool.timeout) if pool is not None else (1, settings.SMTP_TIMEOUT_SECONDS)
+        rounds = -(-batch_size // concurrency)
+        self.lease_seconds = timeout * 2 * (rounds + 1)
+        self.sent = 0
+        self.failed = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def retry_delay(self, attempts: int) -> float:
+        return min(self.retry_base_seconds * 2 ** (attempts - 1), MAX_RETRY_DELAY_SECONDS)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="email-dispatcher")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.pool is not None:
+            await self.pool.close()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                while await self.run_once() == self.batch_size:
+                    pass
+            except Exception as e:
+                print(f"Email dispatcher round failed: {e}")
+
+    async def run_once(self) -> int:
+        """Claim, send and record one batch; returns how many were attempted"""
+        messages = await run_in_threadpool(self._claim)
+        if not messages:
+            return 0
+
+        outcomes = await asyncio.gather(*(self._send(message) for message in messages))
+        await run_in_threadpool(self._record, messages, outcomes)
+        return len(messages)
+
+    def _claim(self) -> List[dict]:
+        now = datetime.utcnow()
+        due = select(EmailOutbox.id).where(
+            EmailOutbox.status == OutboxStatus.PENDING,
+            EmailOutbox.next_attempt_at <= now
+        ).order_by(EmailOutbox.next_attempt_at).limit(self.batch_size)
+
+        db = self.session_factory()
+        try:
+            # Re-checked in the UPDATE itself: rows another worker claimed meanwhile are not returned
+            rows = db.execute(
+                update(EmailOutbox)
+                .where(
+                    EmailOutbox.id.in_(due.scalar_subquery()),
+                    EmailOutbox.status == OutboxStatus.PENDING,
+                    EmailOutbox.next_attempt_at <= now
+                )
+                .values(next_attempt_at=now + timedelta(seconds=self.lease_seconds))
+                .returning(
+                    EmailOutbox.id, EmailOutbox.recipient, EmailOutbox.subject,
+                    EmailOutbox.body, EmailOutbox.subtype, EmailOutbox.attempts
+                )
+                .execution_options(synchronize_session=False)
+            ).all()
+            db.commit()
+
+            return [row._asdict() for row in rows]
+        finally:
+            db.close()
+
+    async def _send(self, message: dict) -> Optional[str]:
+        """Returns None on success, otherwise the error"""
+        if self.pool is None:
+            print(f" [MOCK EMAIL] To: {message['recipient']} Subject: {message['subject']}")
+            return None
+        try:
+            await self.pool.send(build_message(
+                message["recipient"], message["subject"], message["body"], message["subtype"]
+            ))
+            return None
+        except Exception as e:
+            return str(e) or e.__class__.__name__
+
+    def _record(self, messages: List[dict], outcomes: List[Optional[str]]):
+        now = datetime.utcnow()
+        updates = []
+        for message, error in zip(messages, outcomes):
+            attempts = message["attempts"] + 1
+            if error is None:
+                updates.append({
+                    "id": message["id"], "status": OutboxStatus.SENT, "attempts": attempts,
+                    "next_attempt_at": now, "sent_at": now, "last_error": None
+                })
+                self.sent += 1
+            elif attempts >= self.max_attempts:
+                print(f"Giving up on email {message['id']} to {message['recipient']}: {error}")
+                updates.append({
+                    "id": message["id"], "status": OutboxStatus.FAILED, "attempts": attempts,
+                    "next_attempt_at": now, "sent_at": None, "last_error": error
+                })
+                self.failed += 1
+            else:
+                updates.append({
+                    "id": message["id"], "status": OutboxStatus.PENDING, "attempts": attempts,
+                    "next_attempt_at": now + timedelta(seconds=self.retry_delay(attempts)),
+                    "sent_at": None, "last_error": error
+                })
+
+        db = self.session_factory()
+        try:
+            # Bulk UPDATE by primary key, one executemany
+            db.execute(update(EmailOutbox), updates)
+            db.commit()
+        finally:
+            db.close()
+
+
+email_dispatcher = EmailDispatcher(
+    pool=create_smtp_pool(),
+    batch_size=settings.EMAIL_DISPATCH_BATCH_SIZE,
+    interval_seconds=settings.EMAIL_DISPATCH_INTERVAL_SECONDS,
+    max_attempts=settings.EMAIL_MAX_ATTEMPTS,
+    retry_base_seconds=settings.EMAIL_RETRY_BASE_SECONDS
+)
@@ -0,0 +1,141 @@
+"""
+Image Derivatives
+
+Renders downsized copies of uploaded photos with Pillow. Decoding and
+resizing a phone photo is CPU bound, so the work runs in a process pool
+rather than on the event loop or the threadpool.
+
+Each derivative has EXIF orientation applied and carries no metadata, so
+the admin screens never download the multi-megabyte original to show a
+preview. Originals are kept as uploaded.
+
+Photos also get a perceptual hash (dHash) for near-duplicate detection.
+"""
+import asyncio
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+from app.config import settings
+
+# Output format -> (file extension, Pillow save options)
+FORMATS = {
+    "webp": (".webp", {"format": "WEBP", "quality": 80, "method": 4}),
+    "jpeg": (".jpg", {"format": "JPEG", "quality": 82, "optimize": True, "progressive": True}),
+}
+
+
+def variant_sizes() -> Dict[str, int]:
+    """Derivative name -> longest edge in pixels"""
+    return {
+        "thumbnail": settings.IMAGE_THUMBNAIL_PX,
+        "medium": settings.IMAGE_MEDIUM_PX,
+    }
+
+
+def _flatten(image: Image.Image) -> Image.Image:
+    """JPEG has no alpha channel; composite transparent images onto white"""
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def render_derivatives(source_path: str, targets: List[Tuple[str, int, str]]) -> List[str]:
+    """
+    Write each (path, longest edge, format) target from one source image
+    Runs in a worker process. Returns the paths written.
+    """
+    written = []
+    with Image.open(source_path) as original:
+        # Let the JPEG decoder downscale while decoding; much cheaper than a full decode
+        largest = max(size for _, size, _ in targets)
+        original.draft("RGB", (largest, largest))
+        image = ImageOps.exif_transpose(original)
+        has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+
+        # Largest first so smaller sizes are resized from an already reduced image
+        for path, size, fmt in sorted(targets, key=lambda target: target[1], reverse=True):
+            resized = image.copy()
+            resized.thumbnail((size, size), Image.LANCZOS)
+            if fmt == "jpeg":
+                resized = _flatten(resized)
+            else:
+                resized = resized.convert("RGBA" if has_alpha else "RGB")
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f"{path}.{uuid.uuid4().hex}.part"
+            # A fresh image carries no EXIF, ICC or XMP data unless passed to save()
+            resized.save(temp_path, **FORMATS[fmt][1])
+            os.replace(temp_path, path)
+            written.append(path)
+
+    return written
+
+
+def dhash(source_path: str, hash_size: int = 8) -> int:
+    """
+    Difference hash: one bit per adjacent pixel pair of a tiny grayscale copy
+    Survives re-saving, recompression and resizing; visually similar photos differ in few bits
+    """
+    with Image.open(source_path) as original:
+        original.draft("L", (hash_size * 4, hash_size * 4))
+        image = ImageOps.exif_transpose(original).convert("L").resize(
+            (hash_size + 1, hash_size), Image.LANCZOS
+        )
+        pixels = list(image.getdata())
+
+    value = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+class ImageProcessor:
+    """Process pool for image work, created on first use"""
+
+    def __init__(self, workers: int = 2):
+        self.workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    async def render(self, source_path: str, targets: List[Tuple[str, int, str]]) -> List[str]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.pool, render_derivatives, source_path, targets)
+
+    async def dhash(self, source_path: str) -> int:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.pool, dhash, source_path)
+
+    def run_many(self, fn: Callable, jobs: Iterable[tuple]):
+        """
+        Call fn(*args) for every args tuple in parallel, for backfills
+        Yields (args, result or the exception raised)
+        """
+        futures = [(args, self.pool.submit(fn, *args)) for args in jobs]
+        for args, future in futures:
+            try:
+                yield args, future.result()
+            except Exception as e:
+                yield args, e
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+
+image_processor = ImageProcessor(workers=settings.IMAGE_WORKERS)
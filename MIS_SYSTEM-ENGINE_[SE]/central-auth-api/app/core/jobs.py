@@ -0,0 +1,78 @@
+"""
+Bulk Jobs
+
+Tracks long-running admin operations (e.g. bulk waitlist triage) that are
+started by a request and finish in the background. The request returns a
+job id straight away and the admin UI polls the job for progress.
+
+Jobs are rows in bulk_jobs, so a poll can land on any worker and jobs
+survive restarts. The retention engine drops them JOB_RETENTION_SECONDS
+after they finish; until then get_job hides them once they are past it.
+"""
+import json
+import uuid
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.retention import RetentionPolicy
+from app.models.bulk_job import BulkJob
+
+# Jobs that never finished (their worker died) are dropped after this long
+ABANDONED_JOB_DAYS = 1
+
+
+def create_job(db: Session, kind: str, total: int) -> BulkJob:
+    job = BulkJob(id=uuid.uuid4().hex, kind=kind, status="queued", total=total)
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def get_job(db: Session, job_id: str) -> Optional[BulkJob]:
+    cutoff = datetime.utcnow() - timedelta(seconds=settings.JOB_RETENTION_SECONDS)
+    return db.query(BulkJob).filter(
+        BulkJob.id == job_id,
+        or_(BulkJob.finished_at.is_(None), BulkJob.finished_at >= cutoff)
+    ).first()
+
+
+def _update(db: Session, job_id: str, **values):
+    db.query(BulkJob).filter(BulkJob.id == job_id).update(values, synchronize_session=False)
+    db.commit()
+
+
+def start_job(db: Session, job_id: str):
+    _update(db, job_id, status="running")
+
+
+def finish_job(db: Session, job_id: str, results: List[dict], emails_queued: int = 0):
+    _update(
+        db, job_id,
+        status="completed",
+        results=json.dumps(results),
+        processed=len(results),
+        emails_queued=emails_queued,
+        finished_at=datetime.utcnow()
+    )
+
+
+def fail_job(db: Session, job_id: str, error: str):
+    _update(db, job_id, status="failed", error=error, finished_at=datetime.utcnow())
+
+
+def job_retention_policy() -> RetentionPolicy:
+    """Retention policy for finished jobs past JOB_RETENTION_SECONDS, and abandoned ones"""
+    seconds = settings.JOB_RETENTION_SECONDS
+    return RetentionPolicy(
+        "bulk_jobs",
+        BulkJob.__table__,
+        lambda now: or_(
+            BulkJob.finished_at < now - timedelta(seconds=seconds),
+            and_(BulkJob.finished_at.is_(None), BulkJob.created_at < now - timedelta(days=ABANDONED_JOB_DAYS))
+        )
+    )
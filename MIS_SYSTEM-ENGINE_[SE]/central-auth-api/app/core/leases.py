@@ -0,0 +1,81 @@
+"""
+Job Leases
+
+Periodic maintenance jobs are registered in every API worker. A job that
+must not run in two workers at once (retention, upload collection) first
+claims its row in job_leases with a conditional UPDATE: the claim only
+succeeds when nobody holds the lease or the holder's lease has expired.
+
+The holder renews the lease as it makes progress, so a long run keeps it
+while a crashed worker's lease simply runs out.
+"""
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Iterator, Optional
+
+from sqlalchemy import or_, update
+from sqlalchemy.orm import Session
+
+from app.models.job_lease import JobLease
+from app.utils.upsert import insert_for
+
+_UNCLAIMED = datetime(1970, 1, 1)
+
+
+def acquire_lease(db: Session, name: str, ttl_seconds: float) -> Optional[str]:
+    """Claim the named lease. Returns a holder id, or None if another worker holds it."""
+    insert = insert_for(db)
+    db.execute(
+        insert(JobLease).values(name=name, holder=None, expires_at=_UNCLAIMED)
+        .on_conflict_do_nothing(index_elements=[JobLease.name])
+    )
+
+    now = datetime.utcnow()
+    holder = uuid.uuid4().hex
+    claimed = db.execute(
+        update(JobLease)
+        .where(
+            JobLease.name == name,
+            or_(JobLease.holder.is_(None), JobLease.expires_at < now)
+        )
+        .values(holder=holder, expires_at=now + timedelta(seconds=ttl_seconds))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+
+    return holder if claimed else None
+
+
+def renew_lease(db: Session, name: str, holder: str, ttl_seconds: float) -> bool:
+    """Extend a lease this holder still has. False once it has been lost."""
+    renewed = db.execute(
+        update(JobLease)
+        .where(JobLease.name == name, JobLease.holder == holder)
+        .values(expires_at=datetime.utcnow() + timedelta(seconds=ttl_seconds))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return bool(renewed)
+
+
+def release_lease(db: Session, name: str, holder: str):
+    db.execute(
+        update(JobLease)
+        .where(JobLease.name == name, JobLease.holder == holder)
+        .values(holder=None, expires_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+
+@contextmanager
+def held_lease(db: Session, name: str, ttl_seconds: float) -> Iterator[Optional[str]]:
+    """Hold the named lease for the block. Yields the holder id, or None if it is taken."""
+    holder = acquire_lease(db, name, ttl_seconds)
+    try:
+        yield holder
+    finally:
+        if holder is not None:
+            db.rollback()
+            release_lease(db, name, holder)
@@ -0,0 +1,245 @@
+"""
+Login Write-Behind Buffer
+
+Takes new-session inserts and last_login updates off the PIN verification
+path. Records are queued in memory and written by a background thread:
+active_sessions rows in one executemany insert, last_login coalesced to a
+single update per user, and the login rollups and analytics buckets bumped
+in the same transaction. Sessions move on to login_history when they end.
+
+A batch is flushed when it reaches LOGIN_WRITE_BEHIND_MAX_BATCH records, every
+LOGIN_WRITE_BEHIND_FLUSH_SECONDS, and on shutdown. Sessions that are queued
+or being written can be looked up with pending_session(), which gives
+validate_session_token read-your-writes behaviour within this worker;
+session_service inserts sessions still queued in another worker itself.
+Either may get there first, so the insert skips tokens already written and
+sessions that have already ended.
+
+A batch that keeps failing is retried up to LOGIN_WRITE_BEHIND_MAX_ATTEMPTS
+times, then written one row at a time so a bad row is dropped on its own
+instead of blocking every later login.
+"""
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import bindparam, or_, update
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.active_user import ActiveUser
+from app.models.active_session import ActiveSession
+from app.models.login_history import LoginHistory
+from app.services import rollup_service, analytics_service
+from app.utils.upsert import insert_for
+
+logger = logging.getLogger(__name__)
+
+
+class LoginWriteBehind:
+    def __init__(self, max_batch: int = 200, flush_interval_seconds: float = 1.0, max_attempts: int = 5):
+        self.max_batch = max_batch
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_attempts = max_attempts
+        # Consecutive failed flushes of the batch at the head of the queue
+        self._failures = 0
+
+        # Queued and in-flight session rows, keyed by session token
+        self._pending: Dict[str, dict] = {}
+        self._in_flight: Dict[str, dict] = {}
+        # Latest login time per user, coalesced
+        self._last_login: Dict[int, datetime] = {}
+
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Start the background flusher thread"""
+        if self.running:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(
+            target=self._run, name="login-write-behind", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Stop the flusher thread and write anything still queued"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def record_login(
+        self,
+        user_id: int,
+        service_id: int,
+        session_token: str,
+        login_at: datetime,
+        session_expires_at: datetime
+    ):
+        """Queue a new active session row and the matching last_login update"""
+        row = {
+            "user_id": user_id,
+            "service_id": service_id,
+            "session_token": session_token,
+            "login_at": login_at,
+            "session_expires_at": session_expires_at
+        }
+
+        with self._cond:
+            self._pending[session_token] = row
+            previous = self._last_login.get(user_id)
+            if previous is None or login_at > previous:
+                self._last_login[user_id] = login_at
+            if len(self._pending) >= self.max_batch:
+                self._cond.notify()
+
+        # Without a flusher (scripts, disabled buffer) write straight through
+        if not self.running:
+            self.flush()
+
+    def pending_session(self, session_token: str) -> Optional[dict]:
+        """Return a session row that has been accepted but not yet committed"""
+        with self._cond:
+            return self._pending.get(session_token) or self._in_flight.get(session_token)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._stopping and len(self._pending) < self.max_batch:
+                    self._cond.wait(timeout=self.flush_interval_seconds)
+                stopping = self._stopping
+            self.flush()
+            if stopping:
+                return
+
+    def flush(self) -> int:
+        """Write queued records in one transaction. Returns rows inserted."""
+        with self._flush_lock:
+            with self._cond:
+                if not self._pending and not self._last_login:
+                    return 0
+                batch = self._pending
+                last_login = self._last_login
+                self._pending = {}
+                self._last_login = {}
+                self._in_flight = batch
+
+            try:
+                self._write(list(batch.values()), last_login)
+            except Exception:
+                self._failures += 1
+                if self._failures >= self.max_attempts:
+                    logger.exception(
+                        "Login write-behind flush failed %d times; writing %d row(s) one by one",
+                        self._failures, len(batch)
+                    )
+                    self._failures = 0
+                    written = self._write_each(batch, last_login)
+                    with self._cond:
+                        self._in_flight = {}
+                    return written
+
+                logger.warning(
+                    "Login write-behind flush failed (attempt %d of %d), will retry",
+                    self._failures, self.max_attempts, exc_info=True
+                )
+                with self._cond:
+                    # Put the batch back without losing newer entries
+                    batch.update(self._pending)
+                    self._pending = batch
+                    for user_id, login_at in last_login.items():
+                        current = self._last_login.get(user_id)
+                        if current is None or login_at > current:
+                            self._last_login[user_id] = login_at
+                    self._in_flight = {}
+                return 0
+
+            self._failures = 0
+            with self._cond:
+                self._in_flight = {}
+
+            return len(batch)
+
+    def _write_each(self, batch: Dict[str, dict], last_login: Dict[int, datetime]) -> int:
+        """Write a failing batch row by row, dropping the rows that still fail"""
+        written = 0
+        for token, row in batch.items():
+            try:
+                self._write([row], {})
+                written += 1
+            except Exception:
+                logger.exception(
+                    "Dropping login of user %s on service %s (session %s...)",
+                    row["user_id"], row["service_id"], token[:16]
+                )
+        for user_id, login_at in last_login.items():
+            try:
+                self._write([], {user_id: login_at})
+            except Exception:
+                logger.exception("Dropping last_login update of user %s", user_id)
+        return written
+
+    def _write(self, rows: List[dict], last_login: Dict[int, datetime]):
+        db = SessionLocal()
+        try:
+            if rows:
+                # Validation or logout on another worker may have written the session
+                # already, and it may even have ended since
+                ended = {
+                    token for (token,) in db.query(LoginHistory.session_token).filter(
+                        LoginHistory.session_token.in_([row["session_token"] for row in rows])
+                    )
+                }
+                live = [row for row in rows if row["session_token"] not in ended]
+                if live:
+                    insert = insert_for(db)
+                    db.execute(
+                        insert(ActiveSession).on_conflict_do_nothing(
+                            index_elements=[ActiveSession.session_token]
+                        ),
+                        live
+                    )
+                rollup_service.apply_logins(db, rows)
+                analytics_service.record_logins(db, rows)
+
+            if last_login:
+                users = ActiveUser.__table__
+                db.execute(
+                    update(users)
+                    .where(users.c.id == bindparam("b_user_id"))
+                    .where(or_(
+                        users.c.last_login == None,
+                        users.c.last_login < bindparam("b_last_login")
+                    ))
+                    .values(last_login=bindparam("b_last_login")),
+                    [
+                        {"b_user_id": user_id, "b_last_login": login_at}
+                        for user_id, login_at in last_login.items()
+                    ]
+                )
+
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+
+login_writer = LoginWriteBehind(
+    max_batch=settings.LOGIN_WRITE_BEHIND_MAX_BATCH,
+    flush_interval_seconds=settings.LOGIN_WRITE_BEHIND_FLUSH_SECONDS,
+    max_attempts=settings.LOGIN_WRITE_BEHIND_MAX_ATTEMPTS
+)
@@ -0,0 +1,216 @@
+"""
+Retention Engine
+
+Deletes expired rows table by table according to a list of policies.
+Rows are removed in batches of at most batch_size, each in its own short
+transaction, with a pause between batches so the SQLite write lock is
+never held for long. A policy can archive each batch before it is deleted.
+
+Every API worker schedules the engine, so a run first takes a database
+lease (app.core.leases) and is skipped while another worker holds it. The
+lease is renewed after every batch; a run that loses it stops.
+
+Per-policy metrics (rows deleted, batch latency, remaining backlog) are
+kept in memory for the admin dashboard.
+"""
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import Table, delete, func, select, tuple_
+from sqlalchemy.orm import Session
+
+from app.core.leases import held_lease, renew_lease
+
+
+class RetentionPolicy:
+    def __init__(
+        self,
+        name: str,
+        table: Table,
+        expired: Callable[[datetime], object],
+        archive: Optional[Callable[[List[dict]], None]] = None,
+        batch_size: Optional[int] = None,
+        before_delete: Optional[Callable[[Session, list], None]] = None
+    ):
+        self.name = name
+        self.table = table
+        # Builds the WHERE clause matching expired rows for a given "now"
+        self.expired = expired
+        # Optional hook receiving full rows before they are deleted
+        self.archive = archive
+        # Overrides the engine's batch size for this table
+        self.batch_size = batch_size
+        # Optional hook removing rows that reference a batch, in the same transaction
+        self.before_delete = before_delete
+
+
+class RetentionMetrics:
+    def __init__(self):
+        self.runs = 0
+        self.rows_deleted_total = 0
+        self.last_run_at: Optional[datetime] = None
+        self.last_run_deleted = 0
+        self.last_run_batches = 0
+        self.last_batch_ms = 0.0
+        self.max_batch_ms = 0.0
+        self.backlog = 0
+        self.last_error: Optional[str] = None
+
+    def as_dict(self) -> dict:
+        return {
+            "runs": self.runs,
+            "rows_deleted_total": self.rows_deleted_total,
+            "last_run_at": self.last_run_at,
+            "last_run_deleted": self.last_run_deleted,
+            "last_run_batches": self.last_run_batches,
+            "last_batch_ms": round(self.last_batch_ms, 2),
+            "max_batch_ms": round(self.max_batch_ms, 2),
+            "backlog": self.backlog,
+            "last_error": self.last_error
+        }
+
+
+class LeaseLostError(RuntimeError):
+    """Another worker took over the run's lease"""
+
+
+class RetentionEngine:
+    def __init__(
+        self,
+        policies: List[RetentionPolicy],
+        batch_size: int = 500,
+        pause_seconds: float = 0.05,
+        lease_name: str = "retention",
+        lease_seconds: float = 600
+    ):
+        self.policies = policies
+        self.batch_size = batch_size
+        self.pause_seconds = pause_seconds
+        self.lease_name = lease_name
+        self.lease_seconds = lease_seconds
+        self._metrics: Dict[str, RetentionMetrics] = {
+            policy.name: RetentionMetrics() for policy in policies
+        }
+        self._lock = threading.Lock()
+        # Only one run at a time in this process; the lease covers other processes
+        self._run_lock = threading.Lock()
+        self._holder: Optional[str] = None
+
+    def run(self, db: Session) -> Dict[str, int]:
+        """
+        Apply every policy. Returns rows deleted per table.
+        Returns nothing when another worker is already running retention.
+        """
+        with self._run_lock, held_lease(db, self.lease_name, self.lease_seconds) as holder:
+            if holder is None:
+                return {}
+
+            self._holder = holder
+            try:
+                results = {}
+                for policy in self.policies:
+                    try:
+                        results[policy.name] = self.run_policy(db, policy)
+                    except LeaseLostError as e:
+                        db.rollback()
+                        print(f"Retention stopped at '{policy.name}': {e}")
+                        break
+                    except Exception as e:
+                        db.rollback()
+                        print(f"Retention for '{policy.name}' failed: {e}")
+                        with self._lock:
+                            self._metrics[policy.name].last_error = str(e)
+                        results[policy.name] = 0
+                return results
+            finally:
+                self._holder = None
+
+    def _keep_lease(self, db: Session):
+        """Renew the run's lease, if it holds one"""
+        if self._holder is not None and not renew_lease(db, self.lease_name, self._holder, self.lease_seconds):
+            raise LeaseLostError("lease expired and was taken by another worker")
+
+    def run_policy(self, db: Session, policy: RetentionPolicy) -> int:
+        """Delete one table's expired rows in throttled batches"""
+        table = policy.table
+        criteria = policy.expired(datetime.utcnow())
+        batch_size = policy.batch_size or self.batch_size
+        metrics = self._metrics.setdefault(policy.name, RetentionMetrics())
+
+        # Batches are identified by primary key, composite or not
+        key_columns = list(table.primary_key.columns)
+        key = key_columns[0] if len(key_columns) == 1 else tuple_(*key_columns)
+
+        deleted = 0
+        batches = 0
+
+        while True:
+            self._keep_lease(db)
+            started = time.perf_counter()
+
+            if policy.archive:
+                rows = [
+                    dict(row._mapping) for row in db.execute(
+                        select(table).where(criteria).limit(batch_size)
+                    )
+                ]
+                ids = [
+                    tuple(row[c.name] for c in key_columns) if len(key_columns) > 1
+                    else row[key_columns[0].name]
+                    for row in rows
+                ]
+            else:
+                result = db.execute(select(*key_columns).where(criteria).limit(batch_size))
+                ids = result.scalars().all() if len(key_columns) == 1 else [tuple(r) for r in result]
+
+            if not ids:
+                db.rollback()
+                break
+
+            if policy.archive:
+                # Release the read transaction while writing the archive;
+                # a crash before the delete only archives the batch twice
+                db.rollback()
+                policy.archive(rows)
+
+            if policy.before_delete:
+                policy.before_delete(db, ids)
+            db.execute(delete(table).where(key.in_(ids)))
+            db.commit()
+
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            deleted += len(ids)
+            batches += 1
+
+            with self._lock:
+                metrics.rows_deleted_total += len(ids)
+                metrics.last_batch_ms = elapsed_ms
+                metrics.max_batch_ms = max(metrics.max_batch_ms, elapsed_ms)
+
+            if len(ids) < batch_size:
+                break
+
+            time.sleep(self.pause_seconds)
+
+        # Rows that are due right now and still left over
+        backlog = db.execute(
+            select(func.count()).select_from(table).where(policy.expired(datetime.utcnow()))
+        ).scalar()
+        db.rollback()
+
+        with self._lock:
+            metrics.runs += 1
+            metrics.last_run_at = datetime.utcnow()
+            metrics.last_run_deleted = deleted
+            metrics.last_run_batches = batches
+            metrics.backlog = backlog
+            metrics.last_error = None
+
+        return deleted
+
+    def metrics(self) -> Dict[str, dict]:
+        """Snapshot of per-table metrics"""
+        with self._lock:
+            return {name: m.as_dict() for name, m in self._metrics.items()}
@@ -0,0 +1,139 @@
+"""
+Service Registry
+
+In-memory index of registered services keyed by service id.
+API keys are held only as salted SHA-256 digests and compared in constant
+time, so authenticating a service on every QR request needs no database
+round-trip. Ids with no service are remembered for
+SERVICE_REGISTRY_NEGATIVE_TTL_SECONDS, so requests with bogus ids do not
+query the database each time either.
+
+The registry is warmed at startup, invalidated by service registration and
+deactivation, and fully reloaded after SERVICE_REGISTRY_TTL_SECONDS so that
+changes made by other workers are picked up.
+"""
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from typing import Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.registered_service import RegisteredService
+
+
+def _hash_api_key(salt: bytes, api_key: str) -> bytes:
+    """Salted SHA-256 digest of an API key"""
+    return hashlib.sha256(salt + api_key.encode("utf-8")).digest()
+
+
+class ServiceRecord:
+    """Cached, detached view of a RegisteredService row, without the plaintext key"""
+
+    def __init__(self, service: RegisteredService):
+        self.id = service.id
+        self.service_name = service.service_name
+        self.service_url = service.service_url
+        self.description = service.description
+        self.is_active = bool(service.is_active)
+        self.created_at = service.created_at
+
+        self._salt = secrets.token_bytes(16)
+        self._api_key_hash = _hash_api_key(self._salt, service.api_key)
+
+    def check_api_key(self, api_key: str) -> bool:
+        """Constant-time comparison of a presented key against the stored digest"""
+        return hmac.compare_digest(
+            _hash_api_key(self._salt, api_key or ""),
+            self._api_key_hash
+        )
+
+
+class ServiceRegistry:
+    def __init__(self, ttl_seconds: int = 300, negative_ttl_seconds: int = 30):
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self._services: Dict[int, ServiceRecord] = {}
+        # Service id -> monotonic time until which it is known not to exist
+        self._missing: Dict[int, float] = {}
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def warm(self, db: Session) -> int:
+        """Load every registered service. Returns the number cached."""
+        services = db.query(RegisteredService).all()
+        records = {service.id: ServiceRecord(service) for service in services}
+
+        with self._lock:
+            self._services = records
+            self._missing = {}
+            self._loaded_at = time.monotonic()
+
+        return len(records)
+
+    def invalidate(self, service_id: Optional[int] = None):
+        """Drop a single service (or everything) from the cache"""
+        with self._lock:
+            if service_id is None:
+                self._services = {}
+                self._missing = {}
+                self._loaded_at = 0.0
+            else:
+                self._services.pop(service_id, None)
+                self._missing.pop(service_id, None)
+
+    def _is_stale(self) -> bool:
+        return time.monotonic() - self._loaded_at > self.ttl_seconds
+
+    def get(self, service_id: int, db: Session) -> Optional[ServiceRecord]:
+        """
+        Get a cached service by id
+        Falls back to a single-row read for services added since the last load
+        """
+        if self._is_stale():
+            self.warm(db)
+
+        record = self._services.get(service_id)
+        if record is not None:
+            return record
+
+        if self._missing.get(service_id, 0.0) > time.monotonic():
+            return None
+
+        service = db.query(RegisteredService).filter(
+            RegisteredService.id == service_id
+        ).first()
+
+        if not service:
+            with self._lock:
+                self._missing[service_id] = time.monotonic() + self.negative_ttl_seconds
+            return None
+
+        record = ServiceRecord(service)
+        with self._lock:
+            self._services[service_id] = record
+
+        return record
+
+    def authenticate(self, service_id: int, api_key: str, db: Session) -> Optional[ServiceRecord]:
+        """
+        Return the active service matching the id and API key, or None
+        """
+        record = self.get(service_id, db)
+
+        if record is None or not record.is_active:
+            return None
+
+        if not record.check_api_key(api_key):
+            return None
+
+        return record
+
+
+service_registry = ServiceRegistry(
+    ttl_seconds=settings.SERVICE_REGISTRY_TTL_SECONDS,
+    negative_ttl_seconds=settings.SERVICE_REGISTRY_NEGATIVE_TTL_SECONDS
+)
@@ -8,8 +8,21 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import RedirectResponse
 from app.config import settings
-from app.database import engine, Base
+from app.database import engine, Base, SessionLocal
 from app.core.system_status import get_system_status
+from app.core.service_registry import service_registry
+from app.core.login_writer import login_writer
+from app.core.email_dispatcher import email_dispatcher
+from app.core.images import image_processor
+from app.core.leases import held_lease
+from app.middleware.body_limit import BodySizeLimitMiddleware
+from app.core.background import (
+    register_periodic_task, with_session, start_periodic_tasks, stop_periodic_tasks
+)
+from app.services import (
+    session_service, retention_service, dashboard_service, notification_service, resumable_upload_service,
+    upload_gc_service, rollup_service, analytics_service
+)
 
 # Import all route modules
 from app.routes import registration, admin, auth, services, system, invitation, waitlist, upload
@@ -58,16 +71,39 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "PATCH"],
     allow_headers=["*"],
-    expose_headers=["X-Total-Count"],
+    expose_headers=["X-Total-Count", "X-Next-Cursor", "ETag"],
+)
+
+# Refuse oversized uploads before they are spooled to disk
+# (the allowance covers multipart boundaries and headers)
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    limits={
+        "/api/upload/photo": settings.UPLOAD_MAX_PHOTO_BYTES + MULTIPART_OVERHEAD_BYTES,
+        "/api/upload/audio": settings.UPLOAD_MAX_AUDIO_BYTES + MULTIPART_OVERHEAD_BYTES,
+        "/api/upload/resumable": settings.UPLOAD_RESUMABLE_CHUNK_BYTES,
+    },
 )
 
 # Mount uploads directory to serve images/audio
 # Ensure the directory exists to avoid startup errors
 import os
-if not os.path.exists("uploads"):
-    os.makedirs("uploads")
+if not os.path.exists(settings.UPLOAD_DIR):
+    os.makedirs(settings.UPLOAD_DIR)
     
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+class UploadStaticFiles(StaticFiles):
+    """Blobs and derivatives are named by content hash, so clients may cache them forever"""
+    async def get_response(self, path: str, scope):
+        response = await super().get_response(path, scope)
+        if response.status_code == 200 and path.startswith(("blobs/", "derivatives/")):
+            response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
+
+
+# Admin downloads go through /api/upload/files (X-Accel-Redirect behind nginx)
+if settings.SERVE_UPLOADS_STATIC:
+    app.mount("/uploads", UploadStaticFiles(directory=settings.UPLOAD_DIR), name="uploads")
 
 # Register all route modules with their prefixes
 app.include_router(
@@ -140,6 +176,40 @@ def admin_redirect():
 if admin_dist_dir.exists():
     app.mount("/admin", SPAStaticFiles(directory=str(admin_dist_dir), html=True), name="admin")
 
+# Periodic maintenance jobs
+register_periodic_task(
+    "session-sweeper",
+    settings.SESSION_SWEEP_INTERVAL_SECONDS,
+    with_session(session_service.sweep_expired_sessions)
+)
+register_periodic_task(
+    "retention",
+    settings.RETENTION_INTERVAL_SECONDS,
+    with_session(retention_service.run_retention)
+)
+register_periodic_task(
+    "dashboard-snapshot",
+    settings.DASHBOARD_REFRESH_SECONDS,
+    with_session(dashboard_service.refresh_dashboard)
+)
+register_periodic_task(
+    "resumable-upload-expiry",
+    settings.UPLOAD_RESUMABLE_SWEEP_INTERVAL_SECONDS,
+    with_session(resumable_upload_service.expire_resumable_uploads)
+)
+if settings.UPLOAD_ORPHAN_GRACE_HOURS:
+    register_periodic_task(
+        "upload-gc",
+        settings.UPLOAD_GC_INTERVAL_SECONDS,
+        with_session(upload_gc_service.collect_orphaned_uploads)
+    )
+if settings.ADMIN_DIGEST_WINDOW_SECONDS:
+    register_periodic_task(
+        "admin-digest",
+        settings.ADMIN_DIGEST_WINDOW_SECONDS,
+        with_session(notification_service.send_admin_digest)
+    )
+
 # Startup event - runs when server starts
 @app.on_event("startup")
 async def startup_event():
@@ -152,6 +222,47 @@ async def startup_event():
     print(f"📊 System Status: {status['status'].upper()}")
     print(f"💬 {status['message']}")
     
+    # Warm the service registry so QR requests skip the services table
+    db = SessionLocal()
+    try:
+        count = service_registry.warm(db)
+        print(f"🔑 Service registry warmed with {count} service(s)")
+    except Exception as e:
+        print(f"Warning: Service registry warm-up failed: {e}")
+    finally:
+        db.close()
+    
+    # Sessions from before active_sessions existed are still in login_history
+    db = SessionLocal()
+    try:
+        adopted = session_service.adopt_live_history_sessions(db)
+        if adopted:
+            print(f"🔐 Moved {adopted} live session(s) from login history to active sessions")
+    except Exception as e:
+        print(f"Warning: Live session backfill failed: {e}")
+    finally:
+        db.close()
+    
+    # Login aggregates are empty on the first deploy that has them; one worker fills them
+    db = SessionLocal()
+    try:
+        with held_lease(db, "login-aggregates-backfill", settings.RETENTION_LEASE_SECONDS) as holder:
+            if holder:
+                users = rollup_service.backfill_login_rollups(db)
+                if users is not None:
+                    print(f"📈 Rebuilt login rollups for {users} user(s)")
+                logins = analytics_service.backfill_login_buckets(db)
+                if logins is not None:
+                    print(f"📈 Rebuilt login analytics buckets from {logins} login(s)")
+    except Exception as e:
+        print(f"Warning: Login aggregate backfill failed: {e}")
+    finally:
+        db.close()
+    
+    login_writer.start()
+    start_periodic_tasks()
+    email_dispatcher.start()
+    
     if settings.DEBUG_MODE:
         print("⚠️  DEBUG MODE IS ENABLED")
     
@@ -165,6 +276,11 @@ async def shutdown_event():
     """Cleanup on shutdown"""
     print("\n" + "=" * 60)
     print("🛑 Shutting down Central Auth API...")
+    await stop_periodic_tasks()
+    await email_dispatcher.stop()
+    image_processor.shutdown()
+    print("📝 Flushing queued login sessions...")
+    login_writer.stop()
     print("💾 Closing database connections...")
     print("✅ Shutdown complete")
     print("=" * 60)
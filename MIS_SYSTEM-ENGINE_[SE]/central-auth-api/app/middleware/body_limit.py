@@ -0,0 +1,61 @@
+"""
+Request Body Size Limits
+
+Rejects oversized request bodies with 413 before they are buffered. A
+declared Content-Length over the limit is refused without reading
+anything; otherwise the body is counted as it arrives and the request is
+aborted as soon as the limit is crossed.
+
+Multipart form parsing otherwise spools the whole upload to a temp file
+before the route runs, so this is the only place a cap can act early.
+"""
+from typing import Dict
+
+from fastapi import HTTPException, status
+from starlette.responses import JSONResponse
+
+
+class BodySizeLimitMiddleware:
+    def __init__(self, app, limits: Dict[str, int]):
+        self.app = app
+        # Path prefix -> max body bytes; the longest matching prefix wins
+        self.limits = sorted(limits.items(), key=lambda item: len(item[0]), reverse=True)
+
+    def _limit_for(self, path: str):
+        for prefix, limit in self.limits:
+            if path.startswith(prefix):
+                return limit
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        limit = self._limit_for(scope["path"])
+        if limit is None:
+            return await self.app(scope, receive, send)
+
+        detail = f"Request body exceeds the {limit} byte limit"
+
+        headers = dict(scope["headers"])
+        content_length = headers.get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            response = JSONResponse({"detail": detail}, status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+            return await response(scope, receive, send)
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Surfaces from the body parser as an HTTP error response
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=detail
+                    )
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -1,2 +1,13 @@
 from app.models.waitlist import WaitlistRequest
 from app.models.system_schedule import SystemSchedule, SystemScheduleAudit
+from app.models.active_session import ActiveSession
+from app.models.login_rollup import UserLoginRollup, UserServiceLoginRollup
+from app.models.login_bucket import ServiceLoginHourly, ServiceLoginDaily
+from app.models.email_outbox import EmailOutbox
+from app.models.admin_notification import AdminNotificationEvent
+from app.models.upload_blob import UploadBlob
+from app.models.upload import Upload, RegistrationAttachment
+from app.models.resumable_upload import ResumableUpload
+from app.models.photo_hash import PhotoHash
+from app.models.job_lease import JobLease
+from app.models.bulk_job import BulkJob
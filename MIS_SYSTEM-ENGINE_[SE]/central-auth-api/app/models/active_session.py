@@ -0,0 +1,20 @@
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey
+from app.models.base import BaseModel
+
+class ActiveSession(BaseModel):
+    """
+    Live login sessions only
+    Rows move to login_history when the session is logged out or expires,
+    so this table stays small no matter how much history accumulates
+    """
+    __tablename__ = "active_sessions"
+    
+    user_id = Column(Integer, ForeignKey("active_users.id"), index=True, nullable=False)
+    service_id = Column(Integer, ForeignKey("registered_services.id"), nullable=False)
+    
+    session_token = Column(String, unique=True, index=True, nullable=False)
+    login_at = Column(DateTime, nullable=False, index=True)
+    session_expires_at = Column(DateTime, index=True, nullable=False)
+    
+    ip_address = Column(String, nullable=True)
+    user_agent = Column(String, nullable=True)
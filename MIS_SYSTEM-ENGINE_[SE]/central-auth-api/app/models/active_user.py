@@ -1,8 +1,11 @@
-from sqlalchemy import Column, String, Boolean, DateTime
+from sqlalchemy import Column, String, Boolean, DateTime, Index
 from app.models.base import BaseModel
 
 class ActiveUser(BaseModel):
     __tablename__ = "active_users"
+    __table_args__ = (
+        Index("ix_active_users_created_at", "created_at"),
+    )
     
     email = Column(String, unique=True, index=True, nullable=False)
     username = Column(String, unique=True, index=True, nullable=False)
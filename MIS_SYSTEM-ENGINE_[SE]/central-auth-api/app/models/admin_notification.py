@@ -0,0 +1,25 @@
+from sqlalchemy import Column, String, Text, Index
+from app.models.base import BaseModel
+
+
+class NotificationDelivery:
+    IMMEDIATE = "immediate"  # Emailed on its own
+    PENDING = "pending"      # Waiting for the next digest
+    DIGESTED = "digested"    # Included in a digest email
+
+
+class AdminNotificationEvent(BaseModel):
+    """
+    Something the admin is told about (new registration, waitlist request)
+    Recent events decide whether the next one is emailed straight away or
+    coalesced into the periodic digest
+    """
+    __tablename__ = "admin_notification_events"
+    __table_args__ = (
+        Index("ix_admin_notification_events_created_at", "created_at"),
+        Index("ix_admin_notification_events_delivery_created_at", "delivery", "created_at"),
+    )
+
+    subject = Column(String(255), nullable=False)
+    message = Column(Text, nullable=False)
+    delivery = Column(String(10), nullable=False, default=NotificationDelivery.PENDING)
@@ -1,10 +1,13 @@
 from sqlalchemy import Column, Integer, DateTime
 from sqlalchemy.sql import func
+from datetime import datetime
 from app.database import Base as DBBase
 
 class BaseModel(DBBase):
     __abstract__ = True
     
     id = Column(Integer, primary_key=True, index=True)
-    created_at = Column(DateTime, server_default=func.now())
+    # Set in Python as well so every row has the same timestamp precision;
+    # keyset pagination compares (created_at, id) across rows
+    created_at = Column(DateTime, default=datetime.utcnow, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
\ No newline at end of file
@@ -0,0 +1,37 @@
+import json
+from sqlalchemy import Column, String, Integer, DateTime, Text
+from datetime import datetime
+from app.database import Base
+
+
+class BulkJob(Base):
+    """
+    A long-running admin operation and its outcome (see app.core.jobs)
+    Kept in the database so any worker can answer a poll
+    """
+    __tablename__ = "bulk_jobs"
+
+    id = Column(String(32), primary_key=True)
+    kind = Column(String(50), nullable=False)
+    status = Column(String(20), nullable=False, default="queued")  # queued, running, completed or failed
+    total = Column(Integer, nullable=False, default=0)
+    processed = Column(Integer, nullable=False, default=0)
+    emails_queued = Column(Integer, nullable=False, default=0)
+    results = Column(Text, nullable=True)  # JSON list of per-item outcomes
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    finished_at = Column(DateTime, nullable=True, index=True)
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "total": self.total,
+            "processed": self.processed,
+            "emails_queued": self.emails_queued,
+            "results": json.loads(self.results) if self.results else [],
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at
+        }
@@ -0,0 +1,32 @@
+from sqlalchemy import Column, String, Integer, DateTime, Text, Index
+from datetime import datetime
+from app.models.base import BaseModel
+
+
+class OutboxStatus:
+    PENDING = "pending"
+    SENT = "sent"
+    FAILED = "failed"  # Gave up after EMAIL_MAX_ATTEMPTS
+
+
+class EmailOutbox(BaseModel):
+    """
+    Emails waiting to be sent
+    Written in the same transaction as the change that triggers them and
+    delivered by the background email dispatcher
+    """
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        Index("ix_email_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+
+    recipient = Column(String(255), nullable=False)
+    subject = Column(String(255), nullable=False)
+    body = Column(Text, nullable=False)
+    subtype = Column(String(10), nullable=False, default="html")  # html or plain
+
+    status = Column(String(10), nullable=False, default=OutboxStatus.PENDING)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    last_error = Column(Text, nullable=True)
+    sent_at = Column(DateTime, nullable=True)
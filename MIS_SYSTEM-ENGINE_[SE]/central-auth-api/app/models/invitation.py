@@ -5,7 +5,7 @@ Invitations are created by admins and sent to potential members.
 Each invitation has a unique code and 4-digit PIN.
 """
 
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, Index
 from datetime import datetime, timedelta
 from app.database import Base
 
@@ -21,6 +21,11 @@ class Invitation(Base):
     - Optional notes about who the invitation is for
     """
     __tablename__ = "invitations"
+    __table_args__ = (
+        Index("ix_invitations_is_used_expires_at", "is_used", "expires_at"),
+        Index("ix_invitations_is_used_created_at", "is_used", "created_at"),
+        Index("ix_invitations_created_at", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     code = Column(String(50), unique=True, nullable=False, index=True)
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, String, DateTime
+from app.database import Base
+
+
+class JobLease(Base):
+    """
+    Lease on a maintenance job shared by every API worker
+    Only the worker holding an unexpired lease runs the job (see app.core.leases)
+    """
+    __tablename__ = "job_leases"
+
+    name = Column(String(64), primary_key=True)
+    holder = Column(String(32), nullable=True)
+    expires_at = Column(DateTime, nullable=False)
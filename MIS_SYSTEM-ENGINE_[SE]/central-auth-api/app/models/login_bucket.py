@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Integer, DateTime, ForeignKey
+from app.database import Base
+
+
+class ServiceLoginHourly(Base):
+    """
+    Logins per service per hour
+    Kept for ANALYTICS_HOURLY_RETENTION_DAYS, then only the daily buckets remain
+    """
+    __tablename__ = "service_login_hourly"
+
+    # Time first so range queries across all services walk the primary key
+    bucket_start = Column(DateTime, primary_key=True)
+    service_id = Column(Integer, ForeignKey("registered_services.id"), primary_key=True)
+    login_count = Column(Integer, nullable=False, default=0)
+
+
+class ServiceLoginDaily(Base):
+    """Logins per service per day (UTC)"""
+    __tablename__ = "service_login_daily"
+
+    bucket_start = Column(DateTime, primary_key=True)
+    service_id = Column(Integer, ForeignKey("registered_services.id"), primary_key=True)
+    login_count = Column(Integer, nullable=False, default=0)
@@ -1,8 +1,14 @@
-from sqlalchemy import Column, String, Integer, DateTime, ForeignKey
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Index
 from app.models.base import BaseModel
 
 class LoginHistory(BaseModel):
     __tablename__ = "login_history"
+    __table_args__ = (
+        # Per-user / per-service history and the newest-first admin list
+        Index("ix_login_history_user_id_login_at", "user_id", "login_at"),
+        Index("ix_login_history_service_id_login_at", "service_id", "login_at"),
+        Index("ix_login_history_login_at", "login_at"),
+    )
     
     user_id = Column(Integer, ForeignKey("active_users.id"), nullable=False)
     service_id = Column(Integer, ForeignKey("registered_services.id"), nullable=False)
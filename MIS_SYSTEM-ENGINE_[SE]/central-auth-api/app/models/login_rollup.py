@@ -0,0 +1,27 @@
+from sqlalchemy import Column, Integer, DateTime, ForeignKey
+from app.database import Base
+
+
+class UserLoginRollup(Base):
+    """
+    Running login totals per user
+    Maintained as sessions are created so user stats are a primary-key read
+    """
+    __tablename__ = "user_login_rollups"
+
+    user_id = Column(Integer, ForeignKey("active_users.id"), primary_key=True)
+    login_count = Column(Integer, nullable=False, default=0)
+    services_used = Column(Integer, nullable=False, default=0)
+    first_login_at = Column(DateTime, nullable=True)
+    last_login_at = Column(DateTime, nullable=True)
+
+
+class UserServiceLoginRollup(Base):
+    """Running login totals per user and service"""
+    __tablename__ = "user_service_login_rollups"
+
+    user_id = Column(Integer, ForeignKey("active_users.id"), primary_key=True)
+    service_id = Column(Integer, ForeignKey("registered_services.id"), primary_key=True)
+    login_count = Column(Integer, nullable=False, default=0)
+    first_login_at = Column(DateTime, nullable=True)
+    last_login_at = Column(DateTime, nullable=True)
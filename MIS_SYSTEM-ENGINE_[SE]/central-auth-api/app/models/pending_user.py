@@ -1,8 +1,11 @@
-from sqlalchemy import Column, String, Boolean, Text, Integer, ForeignKey
+from sqlalchemy import Column, String, Boolean, Text, Integer, ForeignKey, Index
 from app.models.base import BaseModel
 
 class PendingUser(BaseModel):
     __tablename__ = "pending_users"
+    __table_args__ = (
+        Index("ix_pending_users_is_reviewed_created_at", "is_reviewed", "created_at"),
+    )
     
     email = Column(String, unique=True, index=True, nullable=False)
     username = Column(String, unique=True, index=True, nullable=False)
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from datetime import datetime
+from app.database import Base
+
+
+class PhotoHash(Base):
+    """
+    Perceptual hash (dHash) of a stored photo, by content
+    Loaded into an in-memory multi-index hash table to find near-duplicate photos
+    """
+    __tablename__ = "photo_hashes"
+
+    # Increasing id lets each worker load only the hashes it has not seen
+    id = Column(Integer, primary_key=True)
+    sha256 = Column(String(64), unique=True, nullable=False)
+    dhash = Column(String(16), nullable=False)  # 64 bits, hex
+    created_at = Column(DateTime, default=datetime.utcnow)
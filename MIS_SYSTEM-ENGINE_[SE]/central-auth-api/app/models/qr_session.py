@@ -14,6 +14,6 @@ class QRSession(BaseModel):
     # Status tracking
     is_used = Column(Boolean, default=False)
     is_verified = Column(Boolean, default=False)
-    expires_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
     scanned_at = Column(DateTime, nullable=True)
     verified_at = Column(DateTime, nullable=True)
\ No newline at end of file
@@ -0,0 +1,28 @@
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime
+from app.models.base import BaseModel
+
+
+class ResumableUpload(BaseModel):
+    """
+    An upload being received in chunks (see resumable_upload_service)
+    Deleted once finalized, aborted or expired
+    """
+    __tablename__ = "resumable_uploads"
+
+    # Handed to the client; every chunk request carries it
+    token = Column(String(64), unique=True, nullable=False, index=True)
+
+    media_type = Column(String(10), nullable=False)  # photo or audio
+    filename = Column(String(255), nullable=True)
+    content_type = Column(String(100), nullable=True)
+    extension = Column(String(16), nullable=False)
+    total_bytes = Column(BigInteger, nullable=False)
+    # Optional SHA-256 of the whole file, checked on finalize
+    sha256 = Column(String(64), nullable=True)
+
+    received_bytes = Column(BigInteger, nullable=False, default=0)
+    chunks_received = Column(Integer, nullable=False, default=0)
+
+    # Set while a chunk is being written so concurrent retries cannot interleave
+    writing_until = Column(DateTime, nullable=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
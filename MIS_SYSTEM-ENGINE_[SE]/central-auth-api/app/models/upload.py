@@ -0,0 +1,38 @@
+from sqlalchemy import Column, Integer, BigInteger, String, ForeignKey, Index
+from app.database import Base
+from app.models.base import BaseModel
+
+
+class Upload(BaseModel):
+    """
+    One uploaded file, as returned to the client that uploaded it
+    Identical uploads are separate rows pointing at the same stored file
+    """
+    __tablename__ = "uploads"
+    __table_args__ = (
+        Index("ix_uploads_media_type_created_at", "media_type", "created_at"),
+        Index("ix_uploads_created_at", "created_at"),
+    )
+
+    # Public id handed to the client (the stored file's name) and its path under UPLOAD_DIR
+    file_id = Column(String(100), nullable=False, index=True)
+    path = Column(String(300), nullable=False)
+
+    media_type = Column(String(10), nullable=False)  # photo or audio
+    content_type = Column(String(100), nullable=True)
+    size_bytes = Column(BigInteger, nullable=False)
+    sha256 = Column(String(64), nullable=False, index=True)
+    original_filename = Column(String(255), nullable=True)
+
+    # Registration the file was submitted with, once known
+    owner_id = Column(Integer, ForeignKey("pending_users.id"), nullable=True, index=True)
+
+
+class RegistrationAttachment(Base):
+    """Uploads submitted with a registration (photos and the audio oath)"""
+    __tablename__ = "registration_attachments"
+
+    pending_user_id = Column(Integer, ForeignKey("pending_users.id"), primary_key=True)
+    upload_id = Column(Integer, ForeignKey("uploads.id"), primary_key=True, index=True)
+    kind = Column(String(10), nullable=False)  # photo or audio_oath
+    position = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime
+from datetime import datetime
+from app.database import Base
+
+
+class UploadBlob(Base):
+    """
+    One stored file in the content-addressed upload store
+    Identical uploads share a blob; ref_count tracks how many uploads point at it
+    """
+    __tablename__ = "upload_blobs"
+
+    sha256 = Column(String(64), primary_key=True)
+    # Extension of the first upload, kept so the URL and served content type never change
+    extension = Column(String(16), nullable=False, default="")
+    media_type = Column(String(10), nullable=False)  # photo or audio
+    content_type = Column(String(100), nullable=True)
+    size_bytes = Column(BigInteger, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_referenced_at = Column(DateTime, default=datetime.utcnow)
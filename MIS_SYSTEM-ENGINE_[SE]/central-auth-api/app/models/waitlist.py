@@ -4,7 +4,7 @@ Waitlist Request Model
 Stores interest/waitlist requests from users who want to be invited to register.
 """
 
-from sqlalchemy import Column, String, Boolean, Enum, Text
+from sqlalchemy import Column, String, Boolean, Enum, Text, Index
 from sqlalchemy.orm import relationship
 from app.models.base import BaseModel
 import enum
@@ -29,6 +29,10 @@ class WaitlistRequest(BaseModel):
     4. User uses invitation to complete registration
     """
     __tablename__ = "waitlist_requests"
+    __table_args__ = (
+        Index("ix_waitlist_requests_status_created_at", "status", "created_at"),
+        Index("ix_waitlist_requests_created_at", "created_at"),
+    )
     
     # Contact information
     full_name = Column(String(100), nullable=False)
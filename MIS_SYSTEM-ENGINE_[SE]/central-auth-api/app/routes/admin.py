@@ -1,15 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
+from datetime import date, datetime
+import json
 from app.database import get_db
 from app.schemas.user import PendingUserResponse, UserResponse
-from app.schemas.admin import ApprovalRequest, RejectionRequest, LoginHistoryResponse, AdminLogin
-from app.services import registration_service, admin_service, notification_service
-from app.models.active_user import ActiveUser
+from app.schemas.admin import ApprovalRequest, RejectionRequest, BulkApprovalRequest, BulkRejectionRequest, BulkReviewResult, LoginHistoryResponse, AdminLogin, ActiveSessionResponse
+from app.services import registration_service, admin_service, session_service, archive_service, retention_service, dashboard_service, analytics_service, export_service, photo_similarity_service
 from app.core.security import create_access_token
 from app.core.dependencies import get_current_admin
 from app.models.admin import Admin
 from app.core.websocket_manager import manager
+from app.utils.pagination import set_page_headers
 
 router = APIRouter()
 
@@ -50,20 +53,53 @@ def login(credentials: AdminLogin, db: Session = Depends(get_db)):
         }
     }
 
+@router.get("/dashboard")
+def get_dashboard(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_admin: Admin = Depends(get_current_admin)
+):
+    """
+    Get all headline numbers for the admin dashboard in one call
+    Refreshed in the background; send If-None-Match to get a 304 when unchanged
+    """
+    body, etag = dashboard_service.dashboard_snapshot.get(db)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    
+    client_etags = [t.strip() for t in request.headers.get("if-none-match", "").split(",")]
+    if etag in client_etags or f"W/{etag}" in client_etags:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    return Response(content=body, media_type="application/json", headers=headers)
+
 @router.get("/pending", response_model=List[PendingUserResponse])
 def get_pending_users(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
     db: Session = Depends(get_db),
     current_admin: Admin = Depends(get_current_admin)
 ):
     """
     Get all users awaiting approval
     Admin control center calls this to display pending registrations
+    Pass the X-Next-Cursor header back as `cursor` to get the next page
+    Registrations whose photos look like another registration's list it in possible_duplicates
     """
     try:
-        pending_users = registration_service.get_pending_users(db, skip, limit)
-        return pending_users
+        page = registration_service.get_pending_users(
+            db, skip, limit, cursor=cursor, start_date=start_date, end_date=end_date
+        )
+        set_page_headers(response, page)
+        return photo_similarity_service.annotate_duplicates(db, page.items)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -79,7 +115,7 @@ async def approve_user(
 ):
     """
     Approve a pending user registration
-    Moves user from pending_users to active_users
+    Moves user from pending_users to active_users and queues the approval email
     """
     try:
         # Approve the user
@@ -89,12 +125,6 @@ async def approve_user(
             db=db
         )
         
-        # Send approval notification to user
-        await notification_service.notify_user_approval(
-            email=active_user.email,
-            username=active_user.username
-        )
-        
         return active_user
         
     except ValueError as e:
@@ -137,36 +167,203 @@ def reject_user(
             detail=str(e)
         )
 
+@router.post("/bulk-approve", response_model=List[BulkReviewResult])
+def bulk_approve_users(
+    request: BulkApprovalRequest,
+    db: Session = Depends(get_db),
+    current_admin: Admin = Depends(get_current_admin)
+):
+    """
+    Approve a batch of pending registrations in one transaction
+    Reports an outcome per id; approval emails go through the outbox
+    """
+    return registration_service.bulk_approve_users(
+        user_ids=request.user_ids,
+        admin_notes=request.admin_notes,
+        db=db
+    )
+
+@router.post("/bulk-reject", response_model=List[BulkReviewResult])
+def bulk_reject_users(
+    request: BulkRejectionRequest,
+    db: Session = Depends(get_db),
+    current_admin: Admin = Depends(get_current_admin)
+):
+    """
+    Reject a batch of pending registrations in one transaction
+    Reports an outcome per id
+    """
+    return registration_service.bulk_reject_users(
+        user_ids=request.user_ids,
+        reason=request.reason,
+        db=db
+    )
+
 @router.get("/login-history")
 def get_login_history(
+    response: Response,
     user_id: Optional[int] = None,
     service_id: Optional[int] = None,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
     db: Session = Depends(get_db),
     current_admin: Admin = Depends(get_current_admin)
 ):
     """
     Get login history for admin dashboard
     Shows who logged into which service and when
+    Pass the X-Next-Cursor header back as `cursor` to get the next page
     """
     try:
-        history = admin_service.get_login_history(
+        page = admin_service.get_login_history(
             db=db,
             user_id=user_id,
             service_id=service_id,
             skip=skip,
-            limit=limit
+            limit=limit,
+            cursor=cursor,
+            start_date=start_date,
+            end_date=end_date
         )
         
-        return history
+        set_page_headers(response, page)
+        return page.items
         
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to retrieve login history: {str(e)}"
         )
 
+@router.get("/login-history/archive")
+def get_archived_login_history(
+    start_date: date,
+    end_date: date,
+    user_id: Optional[int] = None,
+    service_id: Optional[int] = None,
+    current_admin: Admin = Depends(get_current_admin)
+):
+    """
+    Stream archived login history between two dates (inclusive)
+    Returns newline-delimited JSON, one record per line
+    """
+    if end_date < start_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="end_date must not be before start_date"
+        )
+    
+    records = archive_service.iter_archived_login_history(
+        start_date=start_date,
+        end_date=end_date,
+        user_id=user_id,
+        service_id=service_id
+    )
+    
+    return StreamingResponse(
+        (json.dumps(record) + "\n" for record in records),
+        media_type="application/x-ndjson"
+    )
+
+@router.get("/export/{dataset}")
+def export_data(
+    dataset: str,
+    format: str = "csv",
+    compress: bool = True,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    current_admin: Admin = Depends(get_current_admin)
+):
+    """
+    Download a full export of active_users, pending_users or login_history
+    Streamed as CSV or NDJSON, gzipped unless compress=false
+    """
+    try:
+        export_service.validate_export(dataset, format)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    filename = export_service.export_filename(dataset, format, compress)
+    
+    return StreamingResponse(
+        export_service.stream_export(
+            dataset,
+            export_format=format,
+            compress=compress,
+            start_date=start_date,
+            end_date=end_date
+        ),
+        media_type="application/gzip" if compress else export_service.FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@router.get("/active-sessions", response_model=List[ActiveSessionResponse])
+def get_active_sessions(
+    user_id: Optional[int] = None,
+    service_id: Optional[int] = None,
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_db),
+    current_admin: Admin = Depends(get_current_admin)
+):
+    """
+    Get sessions that are currently logged in
+    Shows who is online and on which service
+    """
+    return session_service.get_active_sessions(
+        db=db,
+        user_id=user_id,
+        service_id=service_id,
+        skip=skip,
+        limit=limit
+    )
+
+@router.get("/retention/metrics")
+def get_retention_metrics(current_admin: Admin = Depends(get_current_admin)):
+    """
+    Get data retention metrics per table
+    Rows deleted, batch latency and remaining backlog
+    """
+    return retention_service.get_retention_metrics()
+
+@router.get("/analytics/logins")
+def get_login_analytics(
+    start: datetime,
+    end: datetime,
+    granularity: str = "auto",
+    service_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_admin: Admin = Depends(get_current_admin)
+):
+    """
+    Get login counts per service over time
+    granularity is hour, day or auto (hourly for ranges up to a week)
+    """
+    try:
+        return analytics_service.get_login_series(
+            db=db,
+            start=start,
+            end=end,
+            granularity=granularity,
+            service_id=service_id
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
 @router.get("/user-stats/{user_id}")
 def get_user_statistics(
     user_id: int, 
@@ -188,16 +385,31 @@ def get_user_statistics(
 
 @router.get("/users", response_model=List[UserResponse])
 def get_all_users(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
     db: Session = Depends(get_db),
     current_admin: Admin = Depends(get_current_admin)
 ):
     """
     Get all active users
+    Pass the X-Next-Cursor header back as `cursor` to get the next page
     """
-    users = db.query(ActiveUser).offset(skip).limit(limit).all()
-    return users
+    try:
+        page = admin_service.get_all_users(
+            db, skip, limit, cursor=cursor, start_date=start_date, end_date=end_date
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    set_page_headers(response, page)
+    return page.items
 
 
 # ============================================================================
@@ -4,16 +4,22 @@ Invitation Routes for Registration Portal
 These endpoints handle invitation verification and management.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional
 from datetime import datetime
+import csv
+import io
 
 from app.database import get_db
+from app.core.dependencies import get_current_admin
+from app.models.admin import Admin
 from app.services import invitation_service
 from app.core.system_status import is_system_open
 from app.middleware.rate_limiter import RateLimiter
+from app.utils.pagination import set_page_headers
 
 router = APIRouter()
 
@@ -49,6 +55,14 @@ class InvitationCreateRequest(BaseModel):
     custom_pin: Optional[str] = None
 
 
+class InvitationBulkCreateRequest(BaseModel):
+    """Request schema for minting many invitations at once (admin only)"""
+    count: int = Field(..., ge=1, le=10000)
+    intended_for: Optional[str] = None
+    notes: Optional[str] = None
+    expires_in_hours: int = 72
+
+
 class InvitationResponse(BaseModel):
     """Response schema for invitation"""
     id: int
@@ -154,11 +168,68 @@ def create_invitation(
         )
 
 
+@router.post("/bulk", status_code=status.HTTP_201_CREATED)
+def bulk_create_invitations(
+    request: InvitationBulkCreateRequest,
+    db: Session = Depends(get_db),
+    admin: Admin = Depends(get_current_admin)
+):
+    """
+    Mint a batch of invitations (Admin only)
+    
+    All codes are created in one transaction and returned as a CSV
+    download of id, code, pin, intended_for and expires_at.
+    """
+    try:
+        invitations = invitation_service.mint_invitations(
+            db=db,
+            count=request.count,
+            created_by=admin.username,
+            intended_for=request.intended_for,
+            notes=request.notes,
+            expires_in_hours=request.expires_in_hours
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e)
+        )
+    
+    columns = ["id", "code", "pin", "intended_for", "expires_at"]
+    
+    def rows():
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=columns)
+        writer.writeheader()
+        for i, invitation in enumerate(invitations, 1):
+            writer.writerow({
+                **invitation,
+                "expires_at": invitation["expires_at"].isoformat() if invitation["expires_at"] else ""
+            })
+            if i % 1000 == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    
+    filename = f"invitations-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.csv"
+    return StreamingResponse(
+        rows(),
+        status_code=status.HTTP_201_CREATED,
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
 @router.get("/list", response_model=list[InvitationResponse])
 def list_invitations(
+    response: Response,
     skip: int = 0,
     limit: int = 50,
     include_used: bool = False,
+    cursor: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
     db: Session = Depends(get_db)
     # TODO: Add admin authentication dependency
 ):
@@ -166,13 +237,25 @@ def list_invitations(
     List all invitations (Admin only)
     
     Returns all invitations, optionally including used ones.
+    Pass the X-Next-Cursor header back as `cursor` to get the next page.
     """
-    if include_used:
-        invitations = invitation_service.get_all_invitations(db, skip=skip, limit=limit)
-    else:
-        invitations = invitation_service.get_pending_invitations(db, skip=skip, limit=limit)
+    list_page = (
+        invitation_service.get_all_invitations if include_used
+        else invitation_service.get_pending_invitations
+    )
+    
+    try:
+        page = list_page(
+            db, skip=skip, limit=limit, cursor=cursor, start_date=start_date, end_date=end_date
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     
-    return invitations
+    set_page_headers(response, page)
+    return page.items
 
 
 @router.delete("/{invitation_id}")
@@ -1,6 +1,5 @@
 from fastapi import (
     APIRouter,
-    BackgroundTasks,
     Depends,
     HTTPException,
     Query,
@@ -10,7 +9,7 @@ from sqlalchemy.orm import Session
 from pydantic import BaseModel, EmailStr
 from app.database import get_db
 from app.schemas.user import UserRegister, PendingUserResponse
-from app.services import registration_service, notification_service
+from app.services import registration_service
 from app.core.system_status import is_system_open
 from app.models.pending_user import PendingUser
 from app.models.active_user import ActiveUser
@@ -126,7 +125,6 @@ def check_username_availability(
 )
 def register_user(
     user_data: UserRegister,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
 ):
     """
@@ -169,16 +167,6 @@ def register_user(
             audio_oath_id=user_data.audio_oath_id,
         )
 
-        # Send notification to admin
-        background_tasks.add_task(
-            notification_service.send_admin_notification,
-            subject="New User Registration",
-            message=(
-                f"New user {user_data.username} ({user_data.email}) has registered "
-                "and is awaiting approval."
-            ),
-        )
-
         return pending_user
 
     except ValueError as e:
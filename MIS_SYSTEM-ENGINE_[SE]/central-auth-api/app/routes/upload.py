@@ -1,13 +1,31 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, status
-import shutil
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, UploadFile, File, HTTPException, Request, Response, status
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session
+from pydantic import BaseModel, Field
+from typing import Optional
+from datetime import datetime
+from urllib.parse import quote
 import os
-import uuid
+from app.config import settings
+from app.database import get_db
+from app.core.dependencies import get_current_admin
+from app.models.admin import Admin
+from app.models.upload import Upload
+from app.models.resumable_upload import ResumableUpload
+from app.models.upload_blob import UploadBlob
+from app.services import upload_service, resumable_upload_service, photo_similarity_service
+from app.services.upload_service import UploadTooLargeError
+from app.services.resumable_upload_service import UploadOffsetConflictError
+from app.utils.pagination import set_page_headers
 
 router = APIRouter()
 
 # Define upload paths relative to the project root
 # Using strict configuration for upload directory
-UPLOAD_DIR = "uploads"
+# New uploads go to the content-addressed store (UPLOAD_DIR/blobs);
+# photos/ and audio/ hold files uploaded before it existed
+# (scripts/backfill_uploads.py records them in the uploads table)
+UPLOAD_DIR = settings.UPLOAD_DIR
 PHOTO_DIR = os.path.join(UPLOAD_DIR, "photos")
 AUDIO_DIR = os.path.join(UPLOAD_DIR, "audio")
 
@@ -15,11 +33,64 @@ AUDIO_DIR = os.path.join(UPLOAD_DIR, "audio")
 os.makedirs(PHOTO_DIR, exist_ok=True)
 os.makedirs(AUDIO_DIR, exist_ok=True)
 
+# media_type path/query values -> uploads.media_type
+MEDIA_TYPES = {"photos": "photo", "audio": "audio"}
+
+# An upload's content never changes, but downloads require an admin
+DOWNLOAD_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+def _upload_response(upload: Upload, blob: UploadBlob, message: str) -> dict:
+    return {
+        "success": True,
+        "upload_id": upload.id,
+        "file_id": upload.file_id,
+        "url": upload_service.upload_url(upload),
+        "download_url": f"/api/upload/files/{upload.id}",
+        "size_bytes": upload.size_bytes,
+        "sha256": upload.sha256,
+        "deduplicated": blob.ref_count > 1,
+        "derivatives": _derivatives(upload),
+        "message": message
+    }
+
+class ResumableUploadCreateRequest(BaseModel):
+    """Request schema for starting a chunked upload"""
+    media_type: str = Field(..., pattern="^(photo|audio)$")
+    total_bytes: int = Field(..., ge=1)
+    filename: Optional[str] = None
+    content_type: Optional[str] = None
+    # Optional hex SHA-256 of the whole file, verified on finalize
+    sha256: Optional[str] = Field(None, pattern="^[0-9a-fA-F]{64}$")
+
+def _derivatives(upload: Upload) -> Optional[dict]:
+    if upload.media_type != "photo" or not settings.IMAGE_DERIVATIVES_ENABLED:
+        return None
+    return upload_service.derivative_urls(upload.sha256)
+
+def _schedule_photo_processing(background_tasks: BackgroundTasks, upload: Upload, db: Session):
+    """
+    Render derivatives and the duplicate-detection hash after the response,
+    unless identical content already has them
+    """
+    if upload.media_type != "photo":
+        return
+    if _derivatives(upload) is not None and not upload_service.derivatives_exist(upload.sha256):
+        background_tasks.add_task(upload_service.generate_derivatives, upload.sha256, upload.path)
+    if not photo_similarity_service.is_hashed(db, upload.sha256):
+        background_tasks.add_task(photo_similarity_service.hash_photo, upload.sha256, upload.path)
+
 @router.post("/photo", status_code=status.HTTP_201_CREATED)
-async def upload_photo(file: UploadFile = File(...)):
+async def upload_photo(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db)
+):
     """
     Upload a photo for registration.
     Returns the file ID and URL for access through the static mount.
+    Identical files are stored once and share a URL.
+    Thumbnail and medium derivatives are rendered after the response;
+    until they exist clients should fall back to the original URL.
     """
     try:
         # Validate file type
@@ -29,27 +100,25 @@ async def upload_photo(file: UploadFile = File(...)):
                 detail="File must be an image"
             )
 
-        # Generate unique filename
         # Use .jpg as default if extension missing, otherwise preserve orig extension
-        file_extension = os.path.splitext(file.filename)[1] if file.filename else ".jpg"
-        if not file_extension:
-             file_extension = ".jpg"
+        file_extension = upload_service.clean_extension(file.filename, ".jpg")
 
-        unique_filename = f"{uuid.uuid4()}{file_extension}"
-        file_path = os.path.join(PHOTO_DIR, unique_filename)
+        # Stream file into the store
+        upload, blob = await upload_service.store_upload(
+            db, file, "photo", file_extension, settings.UPLOAD_MAX_PHOTO_BYTES
+        )
 
-        # Save file
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        _schedule_photo_processing(background_tasks, upload, db)
 
-        # Return file info
-        return {
-            "success": True,
-            "file_id": unique_filename,
-            "url": f"/uploads/photos/{unique_filename}",
-            "message": "Photo uploaded successfully"
-        }
+        return _upload_response(upload, blob, "Photo uploaded successfully")
 
+    except UploadTooLargeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=str(e)
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Upload error: {e}")
         raise HTTPException(
@@ -58,7 +127,7 @@ async def upload_photo(file: UploadFile = File(...)):
         )
 
 @router.post("/audio", status_code=status.HTTP_201_CREATED)
-async def upload_audio(file: UploadFile = File(...)):
+async def upload_audio(file: UploadFile = File(...), db: Session = Depends(get_db)):
     """
     Upload an audio recording (Oath).
     Returns file ID and URL.
@@ -69,27 +138,20 @@ async def upload_audio(file: UploadFile = File(...)):
              # Chrome MediaRecorder often sends audio/webm as video/webm or just video/webm container
             pass 
 
-        # Generate unique filename
-        file_extension = ".webm" # Default for browser MediaRecorder
-        if file.filename:
-             ext = os.path.splitext(file.filename)[1]
-             if ext:
-                 file_extension = ext
-        
-        unique_filename = f"{uuid.uuid4()}{file_extension}"
-        file_path = os.path.join(AUDIO_DIR, unique_filename)
+        file_extension = upload_service.clean_extension(file.filename, ".webm")  # Default for browser MediaRecorder
 
-        # Save file
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        # Stream file into the store
+        upload, blob = await upload_service.store_upload(
+            db, file, "audio", file_extension, settings.UPLOAD_MAX_AUDIO_BYTES
+        )
 
-        return {
-            "success": True,
-            "file_id": unique_filename,
-            "url": f"/uploads/audio/{unique_filename}",
-            "message": "Audio uploaded successfully"
-        }
+        return _upload_response(upload, blob, "Audio uploaded successfully")
 
+    except UploadTooLargeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=str(e)
+        )
     except Exception as e:
         print(f"Upload error: {e}")
         raise HTTPException(
@@ -98,54 +160,69 @@ async def upload_audio(file: UploadFile = File(...)):
         )
 
 
+def _file_entry(upload: Upload) -> dict:
+    return {
+        "id": upload.file_id,
+        "upload_id": upload.id,
+        "type": upload.media_type,
+        "filename": upload.original_filename or upload.file_id,
+        "url": upload_service.upload_url(upload),
+        "download_url": f"/api/upload/files/{upload.id}",
+        "size_bytes": upload.size_bytes,
+        "content_type": upload.content_type,
+        "sha256": upload.sha256,
+        "owner_id": upload.owner_id,
+        "derivatives": _derivatives(upload),
+        "created_at": upload.created_at.timestamp()
+    }
+
+
 @router.get("/list")
-async def list_uploads(media_type: str = "all"):
+async def list_uploads(
+    response: Response,
+    media_type: str = "all",
+    skip: int = 0,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+    current_admin: Admin = Depends(get_current_admin)
+):
     """
-    List all uploaded files (Admin only).
+    List uploaded files, newest first (Admin only).
     media_type can be 'photos', 'audio', or 'all'
+    Pass the X-Next-Cursor header back as `cursor` to get the next page
     """
+    if media_type != "all" and media_type not in MEDIA_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid media type. Use 'photos', 'audio' or 'all'"
+        )
+
     try:
-        files = []
-        
-        if media_type in ["photos", "all"]:
-            if os.path.exists(PHOTO_DIR):
-                for filename in os.listdir(PHOTO_DIR):
-                    filepath = os.path.join(PHOTO_DIR, filename)
-                    if os.path.isfile(filepath):
-                        stat = os.stat(filepath)
-                        files.append({
-                            "id": filename,
-                            "type": "photo",
-                            "filename": filename,
-                            "url": f"/uploads/photos/{filename}",
-                            "size_bytes": stat.st_size,
-                            "created_at": stat.st_mtime
-                        })
-        
-        if media_type in ["audio", "all"]:
-            if os.path.exists(AUDIO_DIR):
-                for filename in os.listdir(AUDIO_DIR):
-                    filepath = os.path.join(AUDIO_DIR, filename)
-                    if os.path.isfile(filepath):
-                        stat = os.stat(filepath)
-                        files.append({
-                            "id": filename,
-                            "type": "audio",
-                            "filename": filename,
-                            "url": f"/uploads/audio/{filename}",
-                            "size_bytes": stat.st_size,
-                            "created_at": stat.st_mtime
-                        })
-        
-        # Sort by created time, newest first
-        files.sort(key=lambda x: x["created_at"], reverse=True)
+        page = upload_service.get_uploads(
+            db,
+            media_type=MEDIA_TYPES.get(media_type),
+            skip=skip,
+            limit=limit,
+            cursor=cursor,
+            start_date=start_date,
+            end_date=end_date
+        )
+        set_page_headers(response, page)
         
         return {
             "success": True,
-            "count": len(files),
-            "files": files
+            "count": page.total,
+            "files": [_file_entry(upload) for upload in page.items]
         }
         
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -153,33 +230,236 @@ async def list_uploads(media_type: str = "all"):
         )
 
 
+@router.get("/files/{upload_id}")
+def download_upload(
+    upload_id: int,
+    request: Request,
+    variant: Optional[str] = None,
+    format: str = "webp",
+    db: Session = Depends(get_db),
+    current_admin: Admin = Depends(get_current_admin)
+):
+    """
+    Download an upload, or with variant=thumbnail|medium one of a photo's derivatives (Admin only).
+    Behind nginx the bytes are sent by nginx (X-Accel-Redirect); Python only checks access.
+    Send If-None-Match to get a 304.
+    """
+    upload = db.get(Upload, upload_id)
+    if upload is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="File not found"
+        )
+
+    try:
+        relpath, content_type, etag = upload_service.download_target(upload, variant, format)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+
+    headers = {"ETag": etag, "Cache-Control": DOWNLOAD_CACHE_CONTROL}
+
+    client_etags = [t.strip() for t in request.headers.get("if-none-match", "").split(",")]
+    if etag in client_etags or f"W/{etag}" in client_etags:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    if settings.UPLOAD_ACCEL_REDIRECT_PREFIX:
+        headers["X-Accel-Redirect"] = settings.UPLOAD_ACCEL_REDIRECT_PREFIX.rstrip("/") + "/" + quote(relpath)
+        return Response(media_type=content_type, headers=headers)
+
+    path = os.path.join(settings.UPLOAD_DIR, *relpath.split("/"))
+    if not os.path.isfile(path):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="File not found"
+        )
+    return FileResponse(path, media_type=content_type, headers=headers)
+
+
+@router.get("/registrations/{pending_user_id}")
+def get_registration_attachments(
+    pending_user_id: int,
+    db: Session = Depends(get_db),
+    current_admin: Admin = Depends(get_current_admin)
+):
+    """
+    Files submitted with a registration (Admin only).
+    Photos in submission order, then the audio oath
+    """
+    attachments = upload_service.get_registration_attachments(db, pending_user_id)
+    return {
+        "success": True,
+        "pending_user_id": pending_user_id,
+        "photos": [_file_entry(upload) for link, upload in attachments if link.kind == "photo"],
+        "audio_oath": next(
+            (_file_entry(upload) for link, upload in attachments if link.kind == "audio_oath"),
+            None
+        )
+    }
+
+
+def _progress(upload: ResumableUpload) -> dict:
+    return {
+        "upload_id": upload.token,
+        "media_type": upload.media_type,
+        "total_bytes": upload.total_bytes,
+        "received_bytes": upload.received_bytes,
+        "chunks_received": upload.chunks_received,
+        "chunk_size": settings.UPLOAD_RESUMABLE_CHUNK_BYTES,
+        "complete": upload.received_bytes >= upload.total_bytes,
+        "expires_at": upload.expires_at
+    }
+
+def _get_resumable(db: Session, upload_id: str) -> ResumableUpload:
+    upload = resumable_upload_service.get_resumable_upload(db, upload_id)
+    if upload is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Upload not found or expired"
+        )
+    return upload
+
+def _offset_conflict(e: UploadOffsetConflictError) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail=str(e),
+        headers={"Upload-Offset": str(e.received_bytes)}
+    )
+
+
+@router.post("/resumable", status_code=status.HTTP_201_CREATED)
+def create_resumable_upload(request: ResumableUploadCreateRequest, db: Session = Depends(get_db)):
+    """
+    Start a chunked upload (used for audio oaths on unreliable connections).
+    Send the file with PUT /resumable/{upload_id}?offset=N in chunks of at most
+    chunk_size bytes, then POST /resumable/{upload_id}/finalize.
+    """
+    try:
+        upload = resumable_upload_service.create_resumable_upload(
+            db,
+            media_type=request.media_type,
+            total_bytes=request.total_bytes,
+            filename=request.filename,
+            content_type=request.content_type,
+            sha256=request.sha256
+        )
+        return _progress(upload)
+    except UploadTooLargeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=str(e)
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
+@router.get("/resumable/{upload_id}")
+def get_resumable_upload(upload_id: str, db: Session = Depends(get_db)):
+    """
+    Progress of a chunked upload.
+    After a dropped connection, resume from received_bytes.
+    """
+    return _progress(_get_resumable(db, upload_id))
+
+
+@router.put("/resumable/{upload_id}")
+async def put_upload_chunk(
+    upload_id: str,
+    offset: int,
+    request: Request,
+    x_chunk_sha256: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Append the raw request body at offset, which must equal received_bytes.
+    Send X-Chunk-SHA256 (hex) to have the chunk verified; a mismatched chunk is discarded.
+    A wrong offset gets 409 with the expected one in the Upload-Offset header.
+    """
+    upload = _get_resumable(db, upload_id)
+    try:
+        upload = await resumable_upload_service.write_chunk(
+            db, upload, offset, request.stream(), checksum=x_chunk_sha256
+        )
+        return _progress(upload)
+    except UploadOffsetConflictError as e:
+        raise _offset_conflict(e)
+    except UploadTooLargeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=str(e)
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
+@router.post("/resumable/{upload_id}/finalize", status_code=status.HTTP_201_CREATED)
+async def finalize_resumable_upload(
+    upload_id: str,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db)
+):
+    """
+    Complete a chunked upload.
+    Returns the same fields as a direct upload.
+    """
+    upload = _get_resumable(db, upload_id)
+    try:
+        stored, blob = await resumable_upload_service.finalize_resumable_upload(db, upload)
+    except UploadOffsetConflictError as e:
+        raise _offset_conflict(e)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+    _schedule_photo_processing(background_tasks, stored, db)
+    return _upload_response(stored, blob, "Upload completed successfully")
+
+
+@router.delete("/resumable/{upload_id}")
+def abort_resumable_upload(upload_id: str, db: Session = Depends(get_db)):
+    """Abandon a chunked upload and discard what was received"""
+    resumable_upload_service.abort_resumable_upload(db, _get_resumable(db, upload_id))
+    return {"success": True, "message": "Upload aborted"}
+
+
 @router.delete("/{media_type}/{file_id}")
-async def delete_upload(media_type: str, file_id: str):
+async def delete_upload(media_type: str, file_id: str, db: Session = Depends(get_db)):
     """
     Delete an uploaded file (Admin only).
+    Shared files are only removed once their last reference is deleted.
     """
+    if media_type not in MEDIA_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid media type. Use 'photos' or 'audio'"
+        )
+
     try:
-        if media_type == "photos":
-            file_path = os.path.join(PHOTO_DIR, file_id)
-        elif media_type == "audio":
-            file_path = os.path.join(AUDIO_DIR, file_id)
-        else:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid media type. Use 'photos' or 'audio'"
-            )
-        
-        if not os.path.exists(file_path):
+        upload = upload_service.find_upload(db, file_id, MEDIA_TYPES[media_type])
+        if upload is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="File not found"
             )
         
-        os.remove(file_path)
+        deleted = upload_service.delete_upload(db, upload)
         
         return {
             "success": True,
-            "message": f"File {file_id} deleted successfully"
+            "message": (
+                f"File {file_id} deleted successfully" if deleted
+                else f"Reference to {file_id} removed; the file is still in use"
+            )
         }
         
     except HTTPException:
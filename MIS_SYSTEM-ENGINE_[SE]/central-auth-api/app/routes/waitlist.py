@@ -6,9 +6,9 @@ These endpoints handle waitlist/interest requests:
 - Admin: Review, approve, reject requests
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Response, status
 from sqlalchemy.orm import Session
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from typing import Optional, List
 from datetime import datetime
 
@@ -16,8 +16,10 @@ from app.database import get_db
 from app.services import waitlist_service
 from app.models.waitlist import WaitlistStatus
 from app.core.dependencies import get_current_admin
+from app.core import jobs
 from app.models.admin import Admin
 from app.middleware.rate_limiter import RateLimiter
+from app.utils.pagination import set_page_headers
 
 router = APIRouter()
 
@@ -87,6 +89,15 @@ class RejectRequestBody(BaseModel):
     reason: str
 
 
+class BulkTriageBody(BaseModel):
+    """Request body for approving or rejecting many waitlist requests"""
+    request_ids: List[int] = Field(..., min_length=1, max_length=5000)
+    action: str = Field(..., pattern="^(approve|reject)$")
+    admin_notes: Optional[str] = None
+    reason: Optional[str] = None
+    expires_in_hours: int = 72
+
+
 class ApprovalResponse(BaseModel):
     """Response for approval action"""
     success: bool
@@ -193,16 +204,31 @@ def _get_status_message(status: WaitlistStatus) -> str:
     response_model=List[WaitlistRequestResponse]
 )
 def get_pending_requests(
+    response: Response,
     skip: int = 0,
     limit: int = 50,
+    cursor: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
     db: Session = Depends(get_db),
     current_admin: Admin = Depends(get_current_admin)
 ):
     """
     Get all pending waitlist requests (Admin only)
+    Pass the X-Next-Cursor header back as `cursor` to get the next page
     """
-    requests = waitlist_service.get_pending_requests(db, skip=skip, limit=limit)
-    return requests
+    try:
+        page = waitlist_service.get_pending_requests(
+            db, skip=skip, limit=limit, cursor=cursor, start_date=start_date, end_date=end_date
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    set_page_headers(response, page)
+    return page.items
 
 
 @router.get(
@@ -210,14 +236,19 @@ def get_pending_requests(
     response_model=List[WaitlistRequestResponse]
 )
 def get_all_requests(
+    response: Response,
     status: Optional[str] = None,
     skip: int = 0,
     limit: int = 50,
+    cursor: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
     db: Session = Depends(get_db),
     current_admin: Admin = Depends(get_current_admin)
 ):
     """
     Get all waitlist requests with optional status filter (Admin only)
+    Pass the X-Next-Cursor header back as `cursor` to get the next page
     """
     status_enum = None
     if status:
@@ -229,8 +260,19 @@ def get_all_requests(
                 detail=f"Invalid status. Must be one of: {[s.value for s in WaitlistStatus]}"
             )
     
-    requests = waitlist_service.get_all_requests(db, status=status_enum, skip=skip, limit=limit)
-    return requests
+    try:
+        page = waitlist_service.get_all_requests(
+            db, status=status_enum, skip=skip, limit=limit,
+            cursor=cursor, start_date=start_date, end_date=end_date
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=400,
+            detail=str(e)
+        )
+    
+    set_page_headers(response, page)
+    return page.items
 
 
 @router.get(
@@ -270,6 +312,61 @@ def get_request_details(
     return request
 
 
+@router.post("/bulk-triage", status_code=status.HTTP_202_ACCEPTED)
+def bulk_triage(
+    body: BulkTriageBody,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    current_admin: Admin = Depends(get_current_admin)
+):
+    """
+    Approve or reject many waitlist requests (Admin only)
+    
+    Returns a job id immediately; the requests are processed in one
+    transaction in the background, which also queues their emails.
+    Poll GET /jobs/{job_id} for progress and per-request outcomes.
+    """
+    if body.action == "reject" and not body.reason:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="A reason is required to reject requests"
+        )
+    
+    job = jobs.create_job(db, "waitlist_triage", total=len(set(body.request_ids)))
+    background_tasks.add_task(
+        waitlist_service.run_bulk_triage,
+        job.id,
+        request_ids=body.request_ids,
+        action=body.action,
+        admin_username=current_admin.username,
+        admin_notes=body.admin_notes,
+        reason=body.reason,
+        expires_in_hours=body.expires_in_hours
+    )
+    
+    return {"job_id": job.id, "status": job.status}
+
+
+@router.get("/jobs/{job_id}")
+def get_job(
+    job_id: str,
+    db: Session = Depends(get_db),
+    current_admin: Admin = Depends(get_current_admin)
+):
+    """
+    Progress and outcomes of a bulk triage job (Admin only)
+    """
+    job = jobs.get_job(db, job_id)
+    
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+    
+    return job.to_dict()
+
+
 @router.post(
     "/{request_id}/approve",
     response_model=ApprovalResponse
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import List, Optional
 from datetime import datetime
 
 class ApprovalRequest(BaseModel):
@@ -10,6 +10,23 @@ class RejectionRequest(BaseModel):
     """Data needed to reject a user"""
     reason: str
 
+class BulkApprovalRequest(BaseModel):
+    """Pending users to approve in one go"""
+    user_ids: List[int] = Field(..., min_length=1, max_length=1000)
+    admin_notes: Optional[str] = None
+
+class BulkRejectionRequest(BaseModel):
+    """Pending users to reject in one go"""
+    user_ids: List[int] = Field(..., min_length=1, max_length=1000)
+    reason: str
+
+class BulkReviewResult(BaseModel):
+    """Outcome for one id in a bulk approval or rejection"""
+    user_id: int
+    status: str  # approved, rejected or error
+    detail: Optional[str] = None
+    active_user_id: Optional[int] = None
+
 class AdminLogin(BaseModel):
     """Admin login credentials"""
     username: str
@@ -38,4 +55,15 @@ class LoginHistoryResponse(BaseModel):
     session_expires_at: datetime
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class ActiveSessionResponse(BaseModel):
+    """Currently logged-in session"""
+    id: int
+    user_id: int
+    service_id: int
+    login_at: datetime
+    session_expires_at: datetime
+    
+    class Config:
+        from_attributes = True
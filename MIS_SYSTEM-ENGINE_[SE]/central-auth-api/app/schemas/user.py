@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 class UserRegister(BaseModel):
     email: EmailStr
@@ -35,6 +35,12 @@ class UserResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class PossibleDuplicate(BaseModel):
+    """Another registration with a near-identical photo"""
+    pending_user_id: int
+    username: str
+    distance: int  # Differing bits between the closest pair of photo hashes (of 64)
+
 class PendingUserResponse(BaseModel):
     id: int
     email: str
@@ -50,5 +56,8 @@ class PendingUserResponse(BaseModel):
     city: Optional[str] = None
     country: Optional[str] = None
     
+    # Set by the admin pending list; empty when no likely duplicates
+    possible_duplicates: List[PossibleDuplicate] = []
+    
     class Config:
         from_attributes = True
\ No newline at end of file
@@ -3,7 +3,10 @@ from app.models.login_history import LoginHistory
 from app.models.active_user import ActiveUser
 from sqlalchemy.orm import Session
 from typing import Optional
+from datetime import datetime
 from app.core.security import verify_password
+from app.services import rollup_service
+from app.utils.pagination import Page, apply_date_range, keyset_paginate
 
 def authenticate_admin(username: str, password: str, db: Session) -> Optional[Admin]:
     """
@@ -28,11 +31,14 @@ def get_login_history(
     user_id: Optional[int] = None,
     service_id: Optional[int] = None,
     skip: int = 0,
-    limit: int = 100
-):
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None
+) -> Page:
     """
     Get login history for admin dashboard
-    Can filter by user or service
+    Can filter by user, service and login time; newest first
     """
     query = db.query(LoginHistory)
     
@@ -42,7 +48,32 @@ def get_login_history(
     if service_id:
         query = query.filter(LoginHistory.service_id == service_id)
     
-    return query.order_by(LoginHistory.login_at.desc()).offset(skip).limit(limit).all()
+    query = apply_date_range(query, LoginHistory.login_at, start_date, end_date)
+    
+    return keyset_paginate(
+        query, LoginHistory.login_at, LoginHistory.id,
+        count_key=("login_history", user_id, service_id, start_date, end_date),
+        cursor=cursor, limit=limit, skip=skip
+    )
+
+def get_all_users(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None
+) -> Page:
+    """
+    Get all active users in the order they were created
+    """
+    query = apply_date_range(db.query(ActiveUser), ActiveUser.created_at, start_date, end_date)
+    
+    return keyset_paginate(
+        query, ActiveUser.created_at, ActiveUser.id,
+        count_key=("active_users", start_date, end_date),
+        cursor=cursor, limit=limit, skip=skip, descending=False
+    )
 
 def get_user_statistics(user_id: int, db: Session) -> dict:
     """
@@ -54,22 +85,16 @@ def get_user_statistics(user_id: int, db: Session) -> dict:
     if not user:
         raise ValueError("User not found")
     
-    # Count total logins
-    total_logins = db.query(LoginHistory).filter(
-        LoginHistory.user_id == user_id
-    ).count()
-    
-    # Get unique services used
-    services_used = db.query(LoginHistory.service_id).filter(
-        LoginHistory.user_id == user_id
-    ).distinct().count()
+    # Totals are kept up to date as sessions are created
+    rollup = rollup_service.get_user_rollup(db, user_id)
     
     return {
         "user_id": user.id,
         "username": user.username,
         "full_name": user.full_name,
-        "total_logins": total_logins,
-        "services_used": services_used,
+        "total_logins": rollup.login_count if rollup else 0,
+        "services_used": rollup.services_used if rollup else 0,
+        "first_login": rollup.first_login_at if rollup else None,
         "last_login": user.last_login,
         "account_created": user.approved_at
     }
\ No newline at end of file
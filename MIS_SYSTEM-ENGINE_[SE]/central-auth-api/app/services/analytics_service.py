@@ -0,0 +1,217 @@
+"""
+Login Analytics
+
+Per-service login counts in hourly and daily buckets. Both are bumped by
+the login write-behind in the same transaction that inserts new sessions.
+Hourly buckets older than ANALYTICS_HOURLY_RETENTION_DAYS are dropped by
+the retention engine, leaving the daily buckets for long ranges, so a time
+series is read from a few hundred rows whatever the history size.
+
+On startup the buckets are rebuilt when they count fewer logins than the
+session tables hold, as on the first deploy with buckets.
+"""
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Table, delete, func
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.retention import RetentionPolicy
+from app.models.active_session import ActiveSession
+from app.models.login_bucket import ServiceLoginDaily, ServiceLoginHourly
+from app.models.login_history import LoginHistory
+from app.services import archive_service
+from app.utils.upsert import insert_for, lock_for_rebuild
+
+_hourly = ServiceLoginHourly.__table__
+_daily = ServiceLoginDaily.__table__
+
+# (bucket_start, service_id) -> logins
+BucketCounts = Dict[Tuple[datetime, int], int]
+
+# Auto granularity switches to daily buckets above this range
+AUTO_HOURLY_MAX_RANGE = timedelta(days=7)
+
+
+def _naive_utc(at: datetime) -> datetime:
+    """Buckets are stored as naive UTC; convert timezone-aware inputs to match"""
+    if at.tzinfo is None:
+        return at
+    return at.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _hour(at: datetime) -> datetime:
+    return at.replace(minute=0, second=0, microsecond=0)
+
+
+def _day(at: datetime) -> datetime:
+    return at.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _bucket(logins: Iterable[Tuple[int, datetime]]) -> Tuple[BucketCounts, BucketCounts]:
+    hourly: BucketCounts = Counter()
+    daily: BucketCounts = Counter()
+    for service_id, login_at in logins:
+        hourly[(_hour(login_at), service_id)] += 1
+        daily[(_day(login_at), service_id)] += 1
+    return hourly, daily
+
+
+def _add_counts(db: Session, table: Table, counts: BucketCounts):
+    """Upsert bucket rows, adding to any existing counts"""
+    if not counts:
+        return
+
+    insert = insert_for(db)
+    stmt = insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.bucket_start, table.c.service_id],
+        set_={"login_count": table.c.login_count + stmt.excluded.login_count}
+    )
+
+    db.execute(stmt, [
+        {"bucket_start": bucket_start, "service_id": service_id, "login_count": count}
+        for (bucket_start, service_id), count in counts.items()
+    ])
+
+
+def record_logins(db: Session, sessions: Iterable[dict]):
+    """
+    Count new sessions into their buckets
+    Caller commits, normally together with the session inserts
+    """
+    hourly, daily = _bucket((s["service_id"], s["login_at"]) for s in sessions)
+    _add_counts(db, _hourly, hourly)
+    _add_counts(db, _daily, daily)
+
+
+def rebuild_login_buckets(db: Session, include_archive: bool = True, batch_size: int = 5000) -> int:
+    """
+    Recompute all buckets from login_history, active_sessions and the archive
+    Returns the number of logins counted
+
+    Logins written meanwhile wait for the rebuild to commit and are added on
+    top, so none is missed or counted twice.
+    """
+    # Write first: on SQLite that takes the write lock before anything is read
+    lock_for_rebuild(db, _hourly, _daily)
+    db.execute(delete(_hourly))
+    db.execute(delete(_daily))
+
+    hourly_cutoff = _hour(datetime.utcnow()) - timedelta(days=settings.ANALYTICS_HOURLY_RETENTION_DAYS)
+
+    def logins():
+        for model in (LoginHistory, ActiveSession):
+            rows = db.query(model.service_id, model.login_at).execution_options(yield_per=batch_size)
+            for service_id, login_at in rows:
+                yield service_id, login_at
+        if include_archive:
+            for record in archive_service.iter_all_archived_login_history():
+                yield record["service_id"], datetime.fromisoformat(record["login_at"])
+
+    total = 0
+    hourly: BucketCounts = Counter()
+    daily: BucketCounts = Counter()
+    for service_id, login_at in logins():
+        total += 1
+        if login_at >= hourly_cutoff:
+            hourly[(_hour(login_at), service_id)] += 1
+        daily[(_day(login_at), service_id)] += 1
+
+    _add_counts(db, _hourly, hourly)
+    _add_counts(db, _daily, daily)
+    db.commit()
+
+    return total
+
+
+def buckets_incomplete(db: Session) -> bool:
+    """
+    True when the daily buckets count fewer logins than login_history and active_sessions hold
+    Complete buckets also count archived logins, so they are never fewer.
+    """
+    counted = db.query(func.coalesce(func.sum(ServiceLoginDaily.login_count), 0)).scalar()
+    stored = db.query(func.count(LoginHistory.id)).scalar() + db.query(func.count(ActiveSession.id)).scalar()
+    db.rollback()
+    return counted < stored
+
+
+def backfill_login_buckets(db: Session) -> Optional[int]:
+    """Rebuild the buckets if they are missing logins. Returns logins counted, or None."""
+    if not buckets_incomplete(db):
+        return None
+    return rebuild_login_buckets(db)
+
+
+def hourly_retention_policy():
+    """Retention policy dropping hourly buckets that daily buckets now cover"""
+    days = settings.ANALYTICS_HOURLY_RETENTION_DAYS
+    return RetentionPolicy(
+        "service_login_hourly",
+        _hourly,
+        lambda now: _hourly.c.bucket_start < now - timedelta(days=days)
+    )
+
+
+def get_login_series(
+    db: Session,
+    start: datetime,
+    end: datetime,
+    granularity: str = "auto",
+    service_id: Optional[int] = None
+) -> dict:
+    """
+    Login counts per service per bucket for start <= bucket_start < end
+    Buckets without logins are omitted. Naive datetimes are taken as UTC.
+    """
+    start, end = _naive_utc(start), _naive_utc(end)
+    if end <= start:
+        raise ValueError("end must be after start")
+
+    oldest_hourly = _hour(datetime.utcnow() - timedelta(days=settings.ANALYTICS_HOURLY_RETENTION_DAYS))
+
+    if granularity == "auto":
+        short_range = end - start <= AUTO_HOURLY_MAX_RANGE
+        granularity = "hour" if short_range and start >= oldest_hourly else "day"
+
+    if granularity == "hour":
+        if start < oldest_hourly:
+            raise ValueError(
+                f"Hourly data is kept for {settings.ANALYTICS_HOURLY_RETENTION_DAYS} days; use granularity=day"
+            )
+        model, start = ServiceLoginHourly, _hour(start)
+    elif granularity == "day":
+        model, start = ServiceLoginDaily, _day(start)
+    else:
+        raise ValueError("granularity must be one of: auto, hour, day")
+
+    query = db.query(model.bucket_start, model.service_id, model.login_count).filter(
+        model.bucket_start >= start,
+        model.bucket_start < end
+    )
+
+    if service_id:
+        query = query.filter(model.service_id == service_id)
+
+    series: Dict[int, List[dict]] = {}
+    for bucket_start, bucket_service_id, count in query.order_by(model.bucket_start):
+        series.setdefault(bucket_service_id, []).append({
+            "bucket_start": bucket_start,
+            "logins": count
+        })
+
+    return {
+        "granularity": granularity,
+        "start": start,
+        "end": end,
+        "services": [
+            {
+                "service_id": sid,
+                "total": sum(point["logins"] for point in points),
+                "points": points
+            }
+            for sid, points in sorted(series.items())
+        ]
+    }
@@ -0,0 +1,179 @@
+"""
+Login History Archive
+
+Old login_history rows are moved out of the database into gzip-compressed
+JSONL files, one file per day of login_at:
+
+    ARCHIVE_DIR/login_history/YYYY/MM/YYYY-MM-DD.jsonl.gz
+
+Rows are archived in bounded chunks by the retention engine. Each chunk is
+appended to its partition files as a new gzip member and fsynced, then
+deleted in its own short transaction, and the engine pauses before the next
+chunk so other writers can take the SQLite write lock.
+"""
+import glob
+import gzip
+import json
+import os
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.retention import RetentionEngine, RetentionPolicy
+from app.models.login_history import LoginHistory
+
+_history = LoginHistory.__table__
+
+
+def _partition_path(day: date, archive_dir: str) -> str:
+    return os.path.join(
+        archive_dir, "login_history",
+        f"{day:%Y}", f"{day:%m}", f"{day:%Y-%m-%d}.jsonl.gz"
+    )
+
+
+def _serialize(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def write_partitions(rows: List[dict], archive_dir: Optional[str] = None):
+    """Append login history rows to their day partitions and fsync them"""
+    if archive_dir is None:
+        archive_dir = settings.ARCHIVE_DIR
+
+    by_day: Dict[date, List[dict]] = defaultdict(list)
+    for row in rows:
+        by_day[row["login_at"].date()].append(row)
+
+    for day, day_rows in by_day.items():
+        path = _partition_path(day, archive_dir)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        lines = "".join(
+            json.dumps({k: _serialize(v) for k, v in row.items()}) + "\n"
+            for row in day_rows
+        )
+
+        # Appending starts a new gzip member; readers see one continuous stream
+        with open(path, "ab") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="wb") as gz:
+                gz.write(lines.encode("utf-8"))
+            raw.flush()
+            os.fsync(raw.fileno())
+
+
+def login_history_policy(
+    older_than_days: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+    archive_dir: Optional[str] = None
+) -> RetentionPolicy:
+    """Retention policy that archives login history past the retention window"""
+    if older_than_days is None:
+        older_than_days = settings.LOGIN_HISTORY_RETENTION_DAYS
+
+    return RetentionPolicy(
+        "login_history",
+        _history,
+        lambda now: _history.c.login_at < now - timedelta(days=older_than_days),
+        archive=lambda rows: write_partitions(rows, archive_dir),
+        batch_size=chunk_size or settings.ARCHIVE_CHUNK_SIZE
+    )
+
+
+def archive_login_history(
+    db: Session,
+    older_than_days: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+    pause_seconds: Optional[float] = None,
+    archive_dir: Optional[str] = None
+) -> int:
+    """
+    Move login history older than the retention window into the archive
+    Returns the number of rows archived
+    """
+    policy = login_history_policy(older_than_days, chunk_size, archive_dir)
+    engine = RetentionEngine(
+        [policy],
+        pause_seconds=settings.ARCHIVE_CHUNK_PAUSE_SECONDS if pause_seconds is None else pause_seconds
+    )
+    return engine.run_policy(db, policy)
+
+
+def _listdir(path: str) -> List[str]:
+    try:
+        return sorted(os.listdir(path))
+    except FileNotFoundError:
+        return []
+
+
+def _partitions_between(start_date: date, end_date: date, archive_dir: str) -> Iterator[str]:
+    """
+    Paths of the existing partitions between two dates (inclusive), oldest first
+    Walks only the year and month directories that exist, so the cost follows
+    the archive's size rather than the width of the range
+    """
+    root = os.path.join(archive_dir, "login_history")
+    for year in _listdir(root):
+        if not year.isdigit() or not start_date.year <= int(year) <= end_date.year:
+            continue
+        for month in _listdir(os.path.join(root, year)):
+            if not month.isdigit():
+                continue
+            first = date(int(year), int(month), 1)
+            if first > end_date or (first.replace(day=28) + timedelta(days=4)).replace(day=1) <= start_date:
+                continue
+            for name in _listdir(os.path.join(root, year, month)):
+                try:
+                    day = datetime.strptime(name, "%Y-%m-%d.jsonl.gz").date()
+                except ValueError:
+                    continue
+                if start_date <= day <= end_date:
+                    yield os.path.join(root, year, month, name)
+
+
+def iter_archived_login_history(
+    start_date: date,
+    end_date: date,
+    user_id: Optional[int] = None,
+    service_id: Optional[int] = None,
+    archive_dir: Optional[str] = None
+) -> Iterator[dict]:
+    """
+    Stream archived login history between two dates (inclusive)
+    Only the existing partitions inside the range are opened, one at a time
+    """
+    if archive_dir is None:
+        archive_dir = settings.ARCHIVE_DIR
+
+    for path in _partitions_between(start_date, end_date, archive_dir):
+        yield from _read_partition(path, user_id, service_id)
+
+
+def iter_all_archived_login_history(archive_dir: Optional[str] = None) -> Iterator[dict]:
+    """Stream every archived login history record, oldest partition first"""
+    if archive_dir is None:
+        archive_dir = settings.ARCHIVE_DIR
+
+    pattern = os.path.join(archive_dir, "login_history", "*", "*", "*.jsonl.gz")
+    for path in sorted(glob.glob(pattern)):
+        yield from _read_partition(path)
+
+
+def _read_partition(
+    path: str,
+    user_id: Optional[int] = None,
+    service_id: Optional[int] = None
+) -> Iterator[dict]:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            if user_id and record["user_id"] != user_id:
+                continue
+            if service_id and record["service_id"] != service_id:
+                continue
+            yield record
@@ -0,0 +1,117 @@
+"""
+Dashboard Snapshot
+
+All headline numbers for the admin dashboard in one document. A background
+task rebuilds it every DASHBOARD_REFRESH_SECONDS; requests are served from
+the cached copy with an ETag, so an unchanged dashboard costs a 304.
+"""
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import func, or_, select, union_all
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.service_registry import service_registry
+from app.models.active_session import ActiveSession
+from app.models.invitation import Invitation
+from app.models.login_history import LoginHistory
+from app.models.pending_user import PendingUser
+from app.services import waitlist_service
+
+
+def build_snapshot(db: Session) -> dict:
+    """Compute the dashboard numbers"""
+    now = datetime.utcnow()
+    since = now - timedelta(hours=24)
+
+    pending_registrations = db.query(func.count(PendingUser.id)).filter(
+        PendingUser.is_reviewed == False
+    ).scalar()
+
+    active_sessions = db.query(func.count(ActiveSession.id)).filter(
+        ActiveSession.session_expires_at >= now
+    ).scalar()
+
+    unused_invitations = db.query(func.count(Invitation.id)).filter(
+        Invitation.is_used == False,
+        or_(Invitation.expires_at == None, Invitation.expires_at > now)
+    ).scalar()
+
+    # Finished and live sessions started in the last 24 hours
+    recent = union_all(
+        select(LoginHistory.service_id).where(LoginHistory.login_at >= since),
+        select(ActiveSession.service_id).where(ActiveSession.login_at >= since)
+    ).subquery()
+    per_service = db.execute(
+        select(recent.c.service_id, func.count())
+        .group_by(recent.c.service_id)
+        .order_by(func.count().desc())
+    ).all()
+
+    logins_last_24h = []
+    for service_id, count in per_service:
+        service = service_registry.get(service_id, db)
+        logins_last_24h.append({
+            "service_id": service_id,
+            "service_name": service.service_name if service else None,
+            "logins": count
+        })
+
+    return {
+        "pending_registrations": pending_registrations,
+        "waitlist": waitlist_service.get_waitlist_stats(db),
+        "active_sessions": active_sessions,
+        "logins_last_24h": logins_last_24h,
+        "unused_invitations": unused_invitations,
+        "generated_at": now
+    }
+
+
+class DashboardSnapshot:
+    def __init__(self, max_age_seconds: float):
+        # Older than this and a request rebuilds it instead of waiting
+        self.max_age_seconds = max_age_seconds
+        self.body: Optional[bytes] = None
+        self.etag: Optional[str] = None
+        self._built_at = 0.0
+        self._lock = threading.Lock()
+
+    def refresh(self, db: Session):
+        """Rebuild the snapshot and its ETag"""
+        body = json.dumps(jsonable_encoder(build_snapshot(db))).encode("utf-8")
+        # generated_at is excluded so an unchanged dashboard keeps its ETag
+        numbers = json.loads(body)
+        numbers.pop("generated_at")
+        digest = hashlib.sha256(json.dumps(numbers, sort_keys=True).encode("utf-8")).hexdigest()
+
+        with self._lock:
+            self.body = body
+            self.etag = f'"{digest[:32]}"'
+            self._built_at = time.monotonic()
+
+    def invalidate(self):
+        with self._lock:
+            self.body = None
+            self.etag = None
+
+    def get(self, db: Session):
+        """Return (body, etag), rebuilding first if the background task is behind"""
+        if self.body is None or time.monotonic() - self._built_at > self.max_age_seconds:
+            self.refresh(db)
+        with self._lock:
+            return self.body, self.etag
+
+
+dashboard_snapshot = DashboardSnapshot(
+    max_age_seconds=settings.DASHBOARD_REFRESH_SECONDS * 2
+)
+
+
+def refresh_dashboard(db: Session):
+    dashboard_snapshot.refresh(db)
@@ -0,0 +1,208 @@
+"""
+Data Exports
+
+Streams whole tables as CSV or NDJSON for compliance requests. Only the
+listed columns are selected (never password hashes, auth keys or session
+tokens), rows come off a server-side cursor EXPORT_BATCH_SIZE at a time,
+and output is gzip-compressed chunk by chunk, so memory stays flat no
+matter how many rows are exported.
+
+Login history lives in three places: day partitions archived after
+LOGIN_HISTORY_RETENTION_DAYS, the login_history table, and active_sessions
+for sessions not yet ended. The export streams all three in that order;
+its source column says where each row came from, since ids are only
+unique within a source.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime
+from typing import Iterator, List, Optional
+
+from sqlalchemy import literal, select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.active_session import ActiveSession
+from app.models.active_user import ActiveUser
+from app.models.login_history import LoginHistory
+from app.models.pending_user import PendingUser
+from app.services import archive_service
+
+# Exportable tables: (model, columns, column the date range applies to)
+EXPORTS = {
+    "active_users": (ActiveUser, [
+        "id", "email", "username", "full_name", "phone", "is_active",
+        "approved_at", "last_login", "created_at"
+    ], "created_at"),
+    "pending_users": (PendingUser, [
+        "id", "email", "username", "full_name", "phone", "date_of_birth",
+        "occupation", "address", "city", "state", "country", "postal_code",
+        "is_reviewed", "admin_notes", "created_at"
+    ], "created_at"),
+    "login_history": (LoginHistory, [
+        "source", "id", "user_id", "service_id", "login_at", "logout_at",
+        "session_expires_at", "ip_address", "user_agent"
+    ], "login_at"),
+}
+
+FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def _value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _csv_chunk(rows: List[tuple], header: Optional[List[str]] = None) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(header)
+    writer.writerows([_value(v) for v in row] for row in rows)
+    return buffer.getvalue()
+
+
+def _ndjson_chunk(rows: List[tuple], columns: List[str]) -> str:
+    return "".join(
+        json.dumps({c: _value(v) for c, v in zip(columns, row)}) + "\n"
+        for row in rows
+    )
+
+
+def validate_export(dataset: str, export_format: str):
+    if dataset not in EXPORTS:
+        raise ValueError(f"Unknown export. Must be one of: {sorted(EXPORTS)}")
+    if export_format not in FORMATS:
+        raise ValueError(f"Unknown format. Must be one of: {sorted(FORMATS)}")
+
+
+def _table_batches(
+    db: Session,
+    model,
+    columns: List[str],
+    date_column: str,
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    batch_size: int,
+    source: Optional[str] = None
+) -> Iterator[List[tuple]]:
+    """Rows of one table off a server-side cursor; columns the table lacks are null"""
+    fields = [
+        literal(source).label(c) if c == "source"
+        else getattr(model, c) if hasattr(model, c)
+        else literal(None).label(c)
+        for c in columns
+    ]
+    stmt = select(*fields).order_by(model.id)
+    if start_date:
+        stmt = stmt.where(getattr(model, date_column) >= start_date)
+    if end_date:
+        stmt = stmt.where(getattr(model, date_column) < end_date)
+
+    result = db.execute(
+        stmt,
+        execution_options={"stream_results": True, "yield_per": batch_size}
+    )
+    for rows in result.partitions():
+        yield rows
+
+
+def _archived_batches(
+    columns: List[str],
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    batch_size: int
+) -> Iterator[List[tuple]]:
+    """Archived login history in the range, from the partitions that cover it"""
+    records = archive_service.iter_archived_login_history(
+        start_date.date() if start_date else date.min,
+        end_date.date() if end_date else date.max
+    )
+
+    batch = []
+    for record in records:
+        login_at = datetime.fromisoformat(record["login_at"])
+        if (start_date and login_at < start_date) or (end_date and login_at >= end_date):
+            continue
+        batch.append(tuple("archive" if c == "source" else record.get(c) for c in columns))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _batches(
+    db: Session,
+    dataset: str,
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    batch_size: int
+) -> Iterator[List[tuple]]:
+    model, columns, date_column = EXPORTS[dataset]
+
+    if dataset != "login_history":
+        yield from _table_batches(db, model, columns, date_column, start_date, end_date, batch_size)
+        return
+
+    yield from _archived_batches(columns, start_date, end_date, batch_size)
+    yield from _table_batches(
+        db, LoginHistory, columns, date_column, start_date, end_date, batch_size, source="history"
+    )
+    yield from _table_batches(
+        db, ActiveSession, columns, date_column, start_date, end_date, batch_size, source="active"
+    )
+
+
+def stream_export(
+    dataset: str,
+    export_format: str = "csv",
+    compress: bool = True,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    batch_size: Optional[int] = None
+) -> Iterator[bytes]:
+    """
+    Yield the export as encoded (and optionally gzipped) chunks
+    Opens its own session, since it runs after the request handler returns
+    """
+    validate_export(dataset, export_format)
+    columns = EXPORTS[dataset][1]
+    batch_size = batch_size or settings.EXPORT_BATCH_SIZE
+
+    # wbits=31 writes a gzip header and trailer around the deflate stream
+    compressor = zlib.compressobj(wbits=31) if compress else None
+
+    def encode(text: str) -> bytes:
+        data = text.encode("utf-8")
+        return compressor.compress(data) if compressor else data
+
+    db = SessionLocal()
+    try:
+        if export_format == "csv":
+            yield encode(_csv_chunk([], header=columns))
+
+        for rows in _batches(db, dataset, start_date, end_date, batch_size):
+            if export_format == "csv":
+                chunk = encode(_csv_chunk(rows))
+            else:
+                chunk = encode(_ndjson_chunk(rows, columns))
+            if chunk:
+                yield chunk
+
+        if compressor:
+            yield compressor.flush()
+    finally:
+        db.close()
+
+
+def export_filename(dataset: str, export_format: str, compress: bool) -> str:
+    stamp = datetime.utcnow().strftime("%Y%m%d-%H%M%S")
+    return f"{dataset}-{stamp}.{export_format}" + (".gz" if compress else "")
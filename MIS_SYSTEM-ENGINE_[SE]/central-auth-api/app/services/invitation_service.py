@@ -4,13 +4,15 @@ Invitation Service for Registration Portal
 Handles invitation code creation, verification, and management.
 """
 
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
-from typing import Optional, List
+from typing import Optional, List, Set
 import secrets
 import string
 
 from app.models.invitation import Invitation
+from app.utils.pagination import Page, apply_date_range, keyset_paginate
 
 
 def generate_invitation_code() -> str:
@@ -32,7 +34,8 @@ def create_invitation(
     notes: Optional[str] = None,
     expires_in_hours: int = 72,
     custom_code: Optional[str] = None,
-    custom_pin: Optional[str] = None
+    custom_pin: Optional[str] = None,
+    commit: bool = True
 ) -> Invitation:
     """
     Create a new invitation code
@@ -45,6 +48,7 @@ def create_invitation(
         expires_in_hours: Hours until expiry (default 72)
         custom_code: Optional custom invitation code
         custom_pin: Optional custom PIN
+        commit: False to only flush, leaving the commit to the caller
     
     Returns:
         Created Invitation object
@@ -74,12 +78,106 @@ def create_invitation(
     )
     
     db.add(invitation)
-    db.commit()
-    db.refresh(invitation)
+    if commit:
+        db.commit()
+        db.refresh(invitation)
+    else:
+        db.flush()
     
     return invitation
 
 
+# Codes per IN (...) when checking for collisions
+COLLISION_CHECK_CHUNK = 500
+
+
+def _existing_codes(db: Session, codes: List[str]) -> Set[str]:
+    """Which of the given codes are already taken, checked in a few set-based queries"""
+    existing = set()
+    for i in range(0, len(codes), COLLISION_CHECK_CHUNK):
+        chunk = codes[i:i + COLLISION_CHECK_CHUNK]
+        existing.update(
+            code for (code,) in db.query(Invitation.code).filter(Invitation.code.in_(chunk))
+        )
+    return existing
+
+
+def reserve_invitation_codes(db: Session, count: int, max_attempts: int = 5) -> List[str]:
+    """
+    Generate count new unique codes
+    
+    Candidates are generated in memory and collisions with existing codes
+    are found with set-based queries and replaced.
+    """
+    codes: Set[str] = set()
+    for _ in range(max_attempts):
+        candidates = set()
+        while len(codes) + len(candidates) < count:
+            code = generate_invitation_code()
+            if code not in codes:
+                candidates.add(code)
+        codes |= candidates - _existing_codes(db, list(candidates))
+        if len(codes) == count:
+            return list(codes)
+    
+    raise ValueError("Could not generate enough unique invitation codes")
+
+
+def insert_invitations(db: Session, rows: List[dict]) -> List[int]:
+    """
+    Insert invitation rows with one executemany, without committing
+    Returns the new ids in row order
+    """
+    result = db.execute(
+        insert(Invitation).returning(Invitation.id, sort_by_parameter_order=True),
+        rows
+    )
+    return [invitation_id for (invitation_id,) in result]
+
+
+def mint_invitations(
+    db: Session,
+    count: int,
+    created_by: Optional[str] = None,
+    intended_for: Optional[str] = None,
+    notes: Optional[str] = None,
+    expires_in_hours: int = 72
+) -> List[dict]:
+    """
+    Create many invitations in one transaction
+    
+    Returns:
+        One dict per invitation with id, code, pin, intended_for and expires_at
+    """
+    expires_at = datetime.utcnow() + timedelta(hours=expires_in_hours) if expires_in_hours > 0 else None
+    
+    rows = [
+        {
+            "code": code,
+            "pin": generate_pin(),
+            "created_by": created_by,
+            "intended_for": intended_for,
+            "notes": notes,
+            "expires_at": expires_at
+        }
+        for code in reserve_invitation_codes(db, count)
+    ]
+    
+    ids = insert_invitations(db, rows)
+    db.commit()
+    
+    return [
+        {
+            "id": invitation_id,
+            "code": row["code"],
+            "pin": row["pin"],
+            "intended_for": intended_for,
+            "expires_at": expires_at
+        }
+        for invitation_id, row in zip(ids, rows)
+    ]
+
+
 def verify_invitation(
     db: Session,
     code: str,
@@ -172,18 +270,43 @@ def get_invitation_by_id(db: Session, invitation_id: int) -> Optional[Invitation
     return db.query(Invitation).filter(Invitation.id == invitation_id).first()
 
 
-def get_pending_invitations(db: Session, skip: int = 0, limit: int = 100) -> List[Invitation]:
-    """Get all unused, non-expired invitations"""
-    return db.query(Invitation).filter(
+def get_pending_invitations(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None
+) -> Page:
+    """Get all unused invitations, oldest first"""
+    query = db.query(Invitation).filter(
         Invitation.is_used == False
-    ).offset(skip).limit(limit).all()
+    )
+    query = apply_date_range(query, Invitation.created_at, start_date, end_date)
+    
+    return keyset_paginate(
+        query, Invitation.created_at, Invitation.id,
+        count_key=("invitations", "pending", start_date, end_date),
+        cursor=cursor, limit=limit, skip=skip, descending=False
+    )
 
 
-def get_all_invitations(db: Session, skip: int = 0, limit: int = 100) -> List[Invitation]:
-    """Get all invitations (for admin view)"""
-    return db.query(Invitation).order_by(
-        Invitation.created_at.desc()
-    ).offset(skip).limit(limit).all()
+def get_all_invitations(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None
+) -> Page:
+    """Get all invitations (for admin view), newest first"""
+    query = apply_date_range(db.query(Invitation), Invitation.created_at, start_date, end_date)
+    
+    return keyset_paginate(
+        query, Invitation.created_at, Invitation.id,
+        count_key=("invitations", "all", start_date, end_date),
+        cursor=cursor, limit=limit, skip=skip
+    )
 
 
 def delete_invitation(db: Session, invitation_id: int) -> bool:
@@ -1,16 +1,120 @@
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+from typing import List
+from datetime import datetime, timedelta
+from html import escape
 from app.config import settings
-from app.core.email import send_email
+from app.core.leases import acquire_lease
+from app.models.email_outbox import EmailOutbox
+from app.models.admin_notification import AdminNotificationEvent, NotificationDelivery
 
-async def send_admin_notification(subject: str, message: str) -> bool:
+# Events listed per subject in a digest; the rest are only counted
+DIGEST_MAX_LISTED = 50
+
+# Held for most of a digest window, leaving slack for timer drift between workers
+DIGEST_LEASE_NAME = "admin-digest"
+DIGEST_LEASE_FRACTION = 0.9
+
+def queue_email(db: Session, recipients: List[str], subject: str, body: str, subtype: str = "html"):
+    """
+    Add an email to the outbox, one row per recipient
+    Not committed here: it goes out only if the caller's transaction commits
+    """
+    db.add_all([
+        EmailOutbox(recipient=recipient, subject=subject, body=body, subtype=subtype)
+        for recipient in recipients
+    ])
+
+def queue_admin_notification(db: Session, subject: str, message: str):
+    """
+    Notify admin, e.g. when a new user registers
+    Emailed immediately while notifications are rare, otherwise held for
+    the next digest (see send_admin_digest)
+    """
+    event = AdminNotificationEvent(subject=subject, message=message)
+    window = settings.ADMIN_DIGEST_WINDOW_SECONDS
+    
+    recent = 0
+    if window:
+        recent = db.query(func.count(AdminNotificationEvent.id)).filter(
+            AdminNotificationEvent.created_at >= datetime.utcnow() - timedelta(seconds=window)
+        ).scalar()
+    
+    if not window or recent < settings.ADMIN_DIGEST_IMMEDIATE_LIMIT:
+        event.delivery = NotificationDelivery.IMMEDIATE
+        queue_email(db, [settings.ADMIN_EMAIL], subject, message)
+    else:
+        event.delivery = NotificationDelivery.PENDING
+    
+    db.add(event)
+
+def send_admin_digest(db: Session) -> int:
     """
-    Send email notification to admin
-    Called when new user registers
+    Queue one summary email covering every notification held for the digest
+    Events are claimed in the same transaction, so concurrent digests never repeat one
+    Returns the number of notifications it covers
     """
-    return await send_email([settings.ADMIN_EMAIL], subject, message)
+    # Every worker schedules the digest; the first one in each window takes a lease
+    # that is left to expire, so admins get one digest per window rather than one per worker
+    window = settings.ADMIN_DIGEST_WINDOW_SECONDS
+    if window and acquire_lease(db, DIGEST_LEASE_NAME, window * DIGEST_LEASE_FRACTION) is None:
+        return 0
+    
+    last_id = db.query(func.max(AdminNotificationEvent.id)).filter(
+        AdminNotificationEvent.delivery == NotificationDelivery.PENDING
+    ).scalar()
+    if last_id is None:
+        return 0
+    
+    # Every worker runs the digest; the conditional UPDATE hands each event to
+    # exactly one of them. Events added while this ran are left for the next digest.
+    events = db.execute(
+        update(AdminNotificationEvent)
+        .where(
+            AdminNotificationEvent.delivery == NotificationDelivery.PENDING,
+            AdminNotificationEvent.id <= last_id
+        )
+        .values(delivery=NotificationDelivery.DIGESTED)
+        .returning(
+            AdminNotificationEvent.id, AdminNotificationEvent.subject,
+            AdminNotificationEvent.message, AdminNotificationEvent.created_at
+        )
+        .execution_options(synchronize_session=False)
+    ).all()
+    events.sort(key=lambda event: event.id)
+    
+    if not events:
+        db.rollback()
+        return 0
+    
+    by_subject = {}
+    for event in events:
+        by_subject.setdefault(event.subject, []).append(event)
+    
+    sections = []
+    for subject, grouped in by_subject.items():
+        items = "".join(
+            f'<li style="white-space: pre-line">{event.created_at:%H:%M:%S} UTC: {escape(event.message.strip())}</li>'
+            for event in grouped[:DIGEST_MAX_LISTED]
+        )
+        more = len(grouped) - DIGEST_MAX_LISTED
+        if more > 0:
+            items += f"<li>...and {more} more</li>"
+        sections.append(f"<h3>{escape(subject)} ({len(grouped)})</h3><ul>{items}</ul>")
+    
+    queue_email(
+        db,
+        [settings.ADMIN_EMAIL],
+        f"Admin digest: {len(events)} new notifications",
+        "<h2>Since the last digest</h2>" + "".join(sections)
+    )
+    db.commit()
+    
+    return len(events)
 
-async def notify_user_approval(email: str, username: str) -> bool:
+def queue_user_approval(db: Session, email: str, username: str):
     """
-    Send email to user when their registration is approved
+    Queue email to user when their registration is approved
     """
     subject = "Your Registration Has Been Approved"
     message = f"""
@@ -20,12 +124,12 @@ async def notify_user_approval(email: str, username: str) -> bool:
     <br>
     <p>Welcome aboard!</p>
     """
-    return await send_email([email], subject, message)
+    queue_email(db, [email], subject, message)
 
 
-async def send_user_notification(email: str, subject: str, message: str) -> bool:
+def queue_user_notification(db: Session, email: str, subject: str, message: str):
     """
-    Send email notification to a specific user
+    Queue email notification to a specific user
     Generic function for sending any email to users
     """
-    return await send_email([email], subject, message)
\ No newline at end of file
+    queue_email(db, [email], subject, message)
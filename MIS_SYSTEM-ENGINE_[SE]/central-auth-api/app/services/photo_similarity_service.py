@@ -0,0 +1,191 @@
+"""
+Near-Duplicate Photo Detection
+
+Every uploaded photo gets a 64-bit dHash (app.core.images.dhash), stored
+by content in photo_hashes. Re-saved, recompressed or resized copies of a
+photo hash within a few bits of each other.
+
+Each worker keeps the hashes in an in-memory multi-index hash table
+(app.utils.multi_index), so finding the photos within
+PHOTO_DUPLICATE_MAX_DISTANCE bits of a new one only compares against the
+few stored photos that share a nearly identical 16-bit substring. The
+index loads only rows it has not seen yet (by id), so hashes recorded by
+other workers appear on the next lookup. Hashes of deleted photos stay in
+the index but no longer resolve to a registration.
+"""
+import os
+import threading
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.core.background import with_session
+from app.core.images import dhash, image_processor
+from app.models.pending_user import PendingUser
+from app.models.photo_hash import PhotoHash
+from app.models.upload import RegistrationAttachment, Upload
+from app.utils.multi_index import MultiIndexHash
+from app.utils.upsert import insert_for
+
+
+class PhotoIndex:
+    def __init__(self):
+        self.index: MultiIndexHash[str] = MultiIndexHash()
+        self.last_id = 0
+        self._lock = threading.Lock()
+
+    def refresh(self, db: Session):
+        """Add hashes recorded since the last refresh"""
+        with self._lock:
+            rows = db.query(PhotoHash.id, PhotoHash.sha256, PhotoHash.dhash).filter(
+                PhotoHash.id > self.last_id
+            ).order_by(PhotoHash.id).all()
+            for row_id, sha256, value in rows:
+                self.index.add(int(value, 16), sha256)
+                self.last_id = row_id
+
+    def search(self, value: int, max_distance: int) -> List[Tuple[int, str]]:
+        """(distance, sha256) of stored photos within max_distance bits"""
+        with self._lock:
+            return self.index.search(value, max_distance)
+
+    def clear(self):
+        with self._lock:
+            self.index = MultiIndexHash()
+            self.last_id = 0
+
+
+photo_index = PhotoIndex()
+
+
+def record_photo_hash(db: Session, sha256: str, value: int):
+    insert = insert_for(db)
+    db.execute(insert(PhotoHash).values(sha256=sha256, dhash=f"{value:016x}").on_conflict_do_nothing(
+        index_elements=[PhotoHash.sha256]
+    ))
+    db.commit()
+
+
+async def hash_photo(sha256: str, source_relpath: str):
+    """
+    Compute and store a photo's dHash in the image process pool
+    Run after the upload response; a photo that cannot be decoded is skipped
+    """
+    source_path = os.path.join(settings.UPLOAD_DIR, *source_relpath.split("/"))
+    try:
+        value = await image_processor.dhash(source_path)
+        await run_in_threadpool(with_session(lambda db: record_photo_hash(db, sha256, value)))
+    except Exception as e:
+        print(f"Warning: Could not hash photo {source_relpath}: {e}")
+
+
+def is_hashed(db: Session, sha256: str) -> bool:
+    return db.query(PhotoHash.id).filter(PhotoHash.sha256 == sha256).first() is not None
+
+
+def find_duplicates(db: Session, pending_user_ids: Iterable[int]) -> Dict[int, List[dict]]:
+    """
+    Other registrations whose photos look like each given registration's photos
+    Returns pending user id -> [{pending_user_id, username, distance}], closest first
+    """
+    pending_user_ids = list(pending_user_ids)
+    if not pending_user_ids:
+        return {}
+
+    photo_index.refresh(db)
+    max_distance = settings.PHOTO_DUPLICATE_MAX_DISTANCE
+
+    # Closest distance from each registration to each similar photo
+    similar: Dict[int, Dict[str, int]] = {}
+    for pending_user_id, value in db.query(
+        RegistrationAttachment.pending_user_id, PhotoHash.dhash
+    ).join(
+        Upload, Upload.id == RegistrationAttachment.upload_id
+    ).join(
+        PhotoHash, PhotoHash.sha256 == Upload.sha256
+    ).filter(
+        RegistrationAttachment.pending_user_id.in_(pending_user_ids),
+        RegistrationAttachment.kind == "photo"
+    ):
+        matches = similar.setdefault(pending_user_id, {})
+        for distance, sha256 in photo_index.search(int(value, 16), max_distance):
+            matches[sha256] = min(distance, matches.get(sha256, distance))
+
+    candidates = {sha256 for matches in similar.values() for sha256 in matches}
+    if not candidates:
+        return {}
+
+    # Registrations that submitted one of the similar photos
+    owners: Dict[str, List[Tuple[int, str]]] = {}
+    for sha256, owner_id, username in db.query(
+        Upload.sha256, PendingUser.id, PendingUser.username
+    ).join(
+        RegistrationAttachment, RegistrationAttachment.upload_id == Upload.id
+    ).join(
+        PendingUser, PendingUser.id == RegistrationAttachment.pending_user_id
+    ).filter(
+        Upload.sha256.in_(candidates),
+        RegistrationAttachment.kind == "photo"
+    ):
+        owners.setdefault(sha256, []).append((owner_id, username))
+
+    duplicates = {}
+    for pending_user_id, matches in similar.items():
+        closest: Dict[int, dict] = {}
+        for sha256, distance in matches.items():
+            for owner_id, username in owners.get(sha256, []):
+                if owner_id == pending_user_id:
+                    continue
+                if owner_id not in closest or distance < closest[owner_id]["distance"]:
+                    closest[owner_id] = {
+                        "pending_user_id": owner_id,
+                        "username": username,
+                        "distance": distance
+                    }
+        if closest:
+            duplicates[pending_user_id] = sorted(
+                closest.values(), key=lambda match: (match["distance"], match["pending_user_id"])
+            )
+    return duplicates
+
+
+def annotate_duplicates(db: Session, pending_users: List[PendingUser]) -> List[PendingUser]:
+    """Set possible_duplicates on each registration (see PendingUserResponse)"""
+    duplicates = find_duplicates(db, [user.id for user in pending_users])
+    for user in pending_users:
+        user.possible_duplicates = duplicates.get(user.id, [])
+    return pending_users
+
+
+def backfill_photo_hashes(db: Session, batch_size: int = 100) -> Tuple[int, int]:
+    """
+    Hash every recorded photo that has no dHash yet, in parallel across the image pool
+    Returns (photos hashed, photos that failed)
+    """
+    hashed = {sha256 for (sha256,) in db.query(PhotoHash.sha256)}
+    sources = {}
+    for sha256, path in db.query(Upload.sha256, Upload.path).filter(
+        Upload.media_type == "photo"
+    ).order_by(Upload.id):
+        if sha256 not in hashed:
+            sources.setdefault(sha256, path)
+
+    jobs = [
+        (sha256, os.path.join(settings.UPLOAD_DIR, *path.split("/")))
+        for sha256, path in sources.items()
+    ]
+
+    done = failed = 0
+    for start in range(0, len(jobs), batch_size):
+        batch = jobs[start:start + batch_size]
+        results = image_processor.run_many(dhash, [(source_path,) for _, source_path in batch])
+        for (sha256, _), ((source_path,), result) in zip(batch, results):
+            if isinstance(result, Exception):
+                print(f"Warning: Could not hash photo {source_path}: {result}")
+                failed += 1
+            else:
+                record_photo_hash(db, sha256, result)
+                done += 1
+    return done, failed
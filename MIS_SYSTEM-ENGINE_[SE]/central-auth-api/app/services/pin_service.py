@@ -1,86 +1,115 @@
-from app.models.login_history import LoginHistory
 from app.models.qr_session import QRSession
 from app.models.active_user import ActiveUser
+from sqlalchemy import select, update
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 from app.config import settings
 from app.core.security import create_access_token
+from app.core.login_writer import login_writer
+import uuid
+
+# Correlates the scanning user with the QR session being updated
+_scanned_by = ActiveUser.auth_key == QRSession.user_auth_key
+
+def _scanning_user(column):
+    """Scalar subquery returning a column of the user who scanned the QR"""
+    return select(column).where(_scanned_by).scalar_subquery()
 
 def verify_pin_and_create_session(qr_token: str, pin: str, db: Session) -> dict:
     """
     Verify the PIN user entered and create login session
     ServiceB.com calls this after user types the PIN
-    
+
+    The scanned -> verified transition is a single conditional UPDATE that
+    also returns the scanning user, so a PIN can only be redeemed once even
+    under concurrent submissions.
+
     Returns:
         dict with session token and user info
     """
-    # Find the QR session
-    qr_session = db.query(QRSession).filter(
-        QRSession.token == qr_token
-    ).first()
-    
-    if not qr_session:
-        raise ValueError("Invalid QR code")
-    
-    # Check if already verified
-    if qr_session.is_verified:
-        raise ValueError("This QR code was already used")
-    
-    # Check if QR was scanned (has a PIN)
-    if not qr_session.pin:
-        raise ValueError("QR code not scanned yet. Please scan with mobile app first.")
-    
-    # Verify the PIN matches
-    if qr_session.pin != pin:
-        raise ValueError("Invalid PIN")
-    
-    # Get the user who scanned the QR
-    user = db.query(ActiveUser).filter(
-        ActiveUser.auth_key == qr_session.user_auth_key
+    now = datetime.utcnow()
+
+    verified = db.execute(
+        update(QRSession)
+        .where(
+            QRSession.token == qr_token,
+            QRSession.is_used == True,
+            QRSession.is_verified == False,
+            QRSession.pin == pin,
+            select(ActiveUser.id).where(_scanned_by).exists()
+        )
+        .values(is_verified=True, verified_at=now)
+        .returning(
+            QRSession.service_id,
+            _scanning_user(ActiveUser.id).label("user_id"),
+            _scanning_user(ActiveUser.auth_key).label("auth_key"),
+            _scanning_user(ActiveUser.username).label("username"),
+            _scanning_user(ActiveUser.full_name).label("full_name"),
+            _scanning_user(ActiveUser.email).label("email")
+        )
+        .execution_options(synchronize_session=False)
     ).first()
-    
-    if not user:
-        raise ValueError("User not found")
-    
+
+    if verified is None:
+        db.rollback()
+        _raise_verify_failure(qr_token, pin, db)
+
     # Create session token (JWT) valid for 30 minutes
     session_token = create_access_token(
         data={
-            "user_id": user.id,
-            "auth_key": user.auth_key,
-            "service_id": qr_session.service_id
+            "user_id": verified.user_id,
+            "auth_key": verified.auth_key,
+            "service_id": verified.service_id,
+            # Unique per session, so two logins in the same second differ
+            "jti": uuid.uuid4().hex
         },
         expires_delta=timedelta(minutes=settings.SESSION_EXPIRY_MINUTES)
     )
-    
-    # Mark QR session as verified
-    qr_session.is_verified = True
-    qr_session.verified_at = datetime.utcnow()
-    
-    # Update user's last login time
-    user.last_login = datetime.utcnow()
-    
-    # Record this login in history
-    session_expires = datetime.utcnow() + timedelta(minutes=settings.SESSION_EXPIRY_MINUTES)
-    
-    login_record = LoginHistory(
-        user_id=user.id,
-        service_id=qr_session.service_id,
+
+    db.commit()
+
+    # The new session and last_login are written behind, off the request path
+    login_writer.record_login(
+        user_id=verified.user_id,
+        service_id=verified.service_id,
         session_token=session_token,
-        login_at=datetime.utcnow(),
-        session_expires_at=session_expires
+        login_at=now,
+        session_expires_at=now + timedelta(minutes=settings.SESSION_EXPIRY_MINUTES)
     )
-    
-    db.add(login_record)
-    db.commit()
-    
+
     return {
         "success": True,
         "session_token": session_token,
         "user_info": {
-            "user_id": user.id,
-            "username": user.username,
-            "full_name": user.full_name,
-            "email": user.email
+            "user_id": verified.user_id,
+            "username": verified.username,
+            "full_name": verified.full_name,
+            "email": verified.email
         },
         "expires_in_seconds": settings.SESSION_EXPIRY_MINUTES * 60
-    }
\ No newline at end of file
+    }
+
+def _raise_verify_failure(qr_token: str, pin: str, db: Session):
+    """
+    Work out why a PIN verification was not applied and raise the matching error
+    Only runs on the failure path, after the conditional UPDATE matched nothing
+    """
+    qr_session = db.query(QRSession).filter(
+        QRSession.token == qr_token
+    ).first()
+
+    if not qr_session:
+        raise ValueError("Invalid QR code")
+
+    # Check if already verified
+    if qr_session.is_verified:
+        raise ValueError("This QR code was already used")
+
+    # Check if QR was scanned (has a PIN)
+    if not qr_session.pin:
+        raise ValueError("QR code not scanned yet. Please scan with mobile app first.")
+
+    if qr_session.pin != pin:
+        raise ValueError("Invalid PIN")
+
+    raise ValueError("User not found")
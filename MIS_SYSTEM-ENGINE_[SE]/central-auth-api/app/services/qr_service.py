@@ -1,8 +1,9 @@
 import uuid
 from datetime import datetime, timedelta
+from sqlalchemy import select, update
 from sqlalchemy.orm import Session
 from app.models.qr_session import QRSession
-from app.models.registered_service import RegisteredService
+from app.core.service_registry import service_registry
 from app.models.active_user import ActiveUser
 from app.utils.qr_generator import create_qr_image
 from app.config import settings
@@ -15,12 +16,8 @@ def generate_qr_session(service_id: int, service_api_key: str, db: Session) -> d
     Returns:
         dict with token, qr_image, and expiry info
     """
-    # Verify the service exists and API key is correct
-    service = db.query(RegisteredService).filter(
-        RegisteredService.id == service_id,
-        RegisteredService.api_key == service_api_key,
-        RegisteredService.is_active == True
-    ).first()
+    # Verify the service exists and API key is correct (cached, constant-time)
+    service = service_registry.authenticate(service_id, service_api_key, db)
     
     if not service:
         raise ValueError("Invalid service credentials")
@@ -59,43 +56,44 @@ def process_qr_scan(qr_token: str, user_auth_key: str, db: Session) -> dict:
     Process when mobile app scans a QR code
     Links the QR session to the user and generates PIN
     
+    The unscanned -> scanned transition is a single conditional UPDATE, so
+    only one of several concurrent scans of the same token can win.
+    
     Returns:
         dict with success status and PIN code
     """
-    # Find the QR session
-    qr_session = db.query(QRSession).filter(
-        QRSession.token == qr_token
-    ).first()
-    
-    if not qr_session:
-        raise ValueError("QR code not found")
-    
-    # Check if QR code has expired
-    if datetime.utcnow() > qr_session.expires_at:
-        raise ValueError("QR code has expired. Please refresh and try again.")
-    
-    # Check if QR code was already scanned
-    if qr_session.is_used:
-        raise ValueError("QR code already scanned")
+    # Generate 6-digit PIN for verification
+    from app.utils.pin_generator import generate_pin
+    pin = generate_pin()
+    now = datetime.utcnow()
     
-    # Verify the user exists and is active
-    user = db.query(ActiveUser).filter(
+    # The scanning user must exist and be active
+    active_user = select(ActiveUser.id).where(
         ActiveUser.auth_key == user_auth_key,
         ActiveUser.is_active == True
+    ).exists()
+    
+    claimed = db.execute(
+        update(QRSession)
+        .where(
+            QRSession.token == qr_token,
+            QRSession.is_used == False,
+            QRSession.expires_at >= now,
+            active_user
+        )
+        .values(
+            user_auth_key=user_auth_key,
+            pin=pin,
+            is_used=True,
+            scanned_at=now
+        )
+        .returning(QRSession.id)
+        .execution_options(synchronize_session=False)
     ).first()
     
-    if not user:
-        raise ValueError("Invalid user credentials")
-    
-    # Generate 6-digit PIN for verification
-    from app.utils.pin_generator import generate_pin
-    pin = generate_pin()
-    
-    # Update QR session with user info and PIN
-    qr_session.user_auth_key = user_auth_key
-    qr_session.pin = pin
-    qr_session.is_used = True
-    qr_session.scanned_at = datetime.utcnow()
+    if claimed is None:
+        db.rollback()
+        _raise_scan_failure(qr_token, user_auth_key, now, db)
     
     db.commit()
     
@@ -103,4 +101,24 @@ def process_qr_scan(qr_token: str, user_auth_key: str, db: Session) -> dict:
         "success": True,
         "pin": pin,
         "message": "QR code scanned successfully. Enter this PIN on the service."
-    }
\ No newline at end of file
+    }
+
+def _raise_scan_failure(qr_token: str, user_auth_key: str, now: datetime, db: Session):
+    """
+    Work out why a scan was not applied and raise the matching error
+    Only runs on the failure path, after the conditional UPDATE matched nothing
+    """
+    qr_session = db.query(QRSession).filter(
+        QRSession.token == qr_token
+    ).first()
+    
+    if not qr_session:
+        raise ValueError("QR code not found")
+    
+    if now > qr_session.expires_at:
+        raise ValueError("QR code has expired. Please refresh and try again.")
+    
+    if qr_session.is_used:
+        raise ValueError("QR code already scanned")
+    
+    raise ValueError("Invalid user credentials")
@@ -1,10 +1,14 @@
+from sqlalchemy import insert, or_, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from datetime import datetime
 from app.models.pending_user import PendingUser
 from app.models.active_user import ActiveUser
 from app.core.security import hash_password
 from app.utils.token_generator import generate_auth_key
-from typing import Optional
+from typing import Dict, Iterable, List, Optional, Tuple
+from app.utils.pagination import Page, apply_date_range, keyset_paginate
+from app.services import notification_service, upload_service
 
 def create_pending_user(
     email: str,
@@ -81,19 +85,45 @@ def create_pending_user(
     )
     
     db.add(pending_user)
+    db.flush()
+    
+    # Link the uploaded photos and oath to this registration
+    upload_service.attach_to_registration(db, pending_user.id, photo_ids, audio_oath_id)
+    
+    # Notify admin, committed together with the registration
+    notification_service.queue_admin_notification(
+        db,
+        subject="New User Registration",
+        message=f"New user {username} ({email}) has registered and is awaiting approval."
+    )
+    
     db.commit()
     db.refresh(pending_user)
     
     return pending_user
 
-def get_pending_users(db: Session, skip: int = 0, limit: int = 100):
+def get_pending_users(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None
+) -> Page:
     """
-    Get all users awaiting approval
+    Get all users awaiting approval, oldest first
     Admin uses this to see who needs review
     """
-    return db.query(PendingUser).filter(
+    query = db.query(PendingUser).filter(
         PendingUser.is_reviewed == False
-    ).offset(skip).limit(limit).all()
+    )
+    query = apply_date_range(query, PendingUser.created_at, start_date, end_date)
+    
+    return keyset_paginate(
+        query, PendingUser.created_at, PendingUser.id,
+        count_key=("pending_users", start_date, end_date),
+        cursor=cursor, limit=limit, skip=skip, descending=False
+    )
 
 def approve_user(user_id: int, admin_notes: Optional[str], db: Session) -> ActiveUser:
     """
@@ -129,6 +159,8 @@ def approve_user(user_id: int, admin_notes: Optional[str], db: Session) -> Activ
     pending_user.is_reviewed = True
     pending_user.admin_notes = admin_notes or "Approved"
     
+    notification_service.queue_user_approval(db, active_user.email, active_user.username)
+    
     db.commit()
     db.refresh(active_user)
     
@@ -155,4 +187,151 @@ def reject_user(user_id: int, reason: str, db: Session) -> bool:
     
     db.commit()
     
-    return True
\ No newline at end of file
+    return True
+
+def _load_for_review(user_ids: Iterable[int], db: Session) -> Tuple[List[int], Dict[int, PendingUser], Dict[int, dict]]:
+    """
+    Fetch the pending users for a bulk review in one query
+    Returns (ids in request order, reviewable users by id, outcomes for the rest)
+    """
+    ids = list(dict.fromkeys(user_ids))
+    users = {
+        user.id: user
+        for user in db.query(PendingUser).filter(PendingUser.id.in_(ids))
+    }
+    
+    outcomes = {}
+    for user_id in ids:
+        user = users.get(user_id)
+        if user is None:
+            outcomes[user_id] = {"user_id": user_id, "status": "error", "detail": "Pending user not found"}
+        elif user.is_reviewed:
+            outcomes[user_id] = {"user_id": user_id, "status": "error", "detail": "User already reviewed"}
+            del users[user_id]
+    
+    return ids, users, outcomes
+
+class _ReviewConflict(Exception):
+    """A user in the batch was reviewed by someone else meanwhile"""
+
+def bulk_approve_users(user_ids: Iterable[int], admin_notes: Optional[str], db: Session) -> List[dict]:
+    """
+    Approve many pending users in one transaction, queueing their emails
+    Returns one outcome per requested id
+
+    If a concurrent approval or registration wins a race for one of the
+    users, emails or usernames, the batch is rolled back and the ids are
+    approved one at a time so each gets its own outcome.
+    """
+    ids = list(dict.fromkeys(user_ids))
+    try:
+        return _bulk_approve(ids, admin_notes, db)
+    except (IntegrityError, _ReviewConflict):
+        db.rollback()
+        return [_approve_one(user_id, admin_notes, db) for user_id in ids]
+
+def _approve_one(user_id: int, admin_notes: Optional[str], db: Session) -> dict:
+    try:
+        active_user = approve_user(user_id, admin_notes, db)
+    except ValueError as e:
+        return {"user_id": user_id, "status": "error", "detail": str(e)}
+    except IntegrityError:
+        db.rollback()
+        return {"user_id": user_id, "status": "error", "detail": "Email or username already registered"}
+    return {"user_id": user_id, "status": "approved", "active_user_id": active_user.id}
+
+def _bulk_approve(ids: List[int], admin_notes: Optional[str], db: Session) -> List[dict]:
+    ids, users, outcomes = _load_for_review(ids, db)
+    
+    # Emails and usernames already taken by active users, in one query
+    emails = {user.email for user in users.values()}
+    usernames = {user.username for user in users.values()}
+    taken = db.query(ActiveUser.email, ActiveUser.username).filter(
+        or_(ActiveUser.email.in_(emails), ActiveUser.username.in_(usernames))
+    ).all()
+    taken_emails = {email for email, _ in taken}
+    taken_usernames = {username for _, username in taken}
+    
+    now = datetime.utcnow()
+    rows = []
+    for user_id in ids:
+        user = users.get(user_id)
+        if user is None:
+            continue
+        if user.email in taken_emails:
+            outcomes[user_id] = {"user_id": user_id, "status": "error", "detail": "Email already registered and approved"}
+            continue
+        if user.username in taken_usernames:
+            outcomes[user_id] = {"user_id": user_id, "status": "error", "detail": "Username already taken"}
+            continue
+        
+        # Also guards against duplicates within the batch
+        taken_emails.add(user.email)
+        taken_usernames.add(user.username)
+        rows.append({
+            "email": user.email,
+            "username": user.username,
+            "hashed_password": user.hashed_password,
+            "full_name": user.full_name,
+            "phone": user.phone,
+            "auth_key": generate_auth_key(),
+            "is_active": True,
+            "approved_at": now
+        })
+    
+    if rows:
+        # Single executemany for the whole batch
+        db.execute(insert(ActiveUser), rows)
+        
+        new_ids = dict(db.query(ActiveUser.email, ActiveUser.id).filter(
+            ActiveUser.email.in_([row["email"] for row in rows])
+        ))
+        approved_ids = [user_id for user_id in ids if user_id in users and user_id not in outcomes]
+        
+        reviewed = db.execute(
+            update(PendingUser)
+            .where(PendingUser.id.in_(approved_ids), PendingUser.is_reviewed == False)
+            .values(is_reviewed=True, admin_notes=admin_notes or "Approved")
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if reviewed != len(approved_ids):
+            raise _ReviewConflict()
+        
+        for user_id in approved_ids:
+            user = users[user_id]
+            outcomes[user_id] = {
+                "user_id": user_id,
+                "status": "approved",
+                "active_user_id": new_ids[user.email]
+            }
+            notification_service.queue_user_approval(db, user.email, user.username)
+    
+    db.commit()
+    
+    return [outcomes[user_id] for user_id in ids]
+
+def bulk_reject_users(user_ids: Iterable[int], reason: str, db: Session) -> List[dict]:
+    """
+    Reject many pending users in one transaction
+    Returns one outcome per requested id
+    """
+    ids, users, outcomes = _load_for_review(user_ids, db)
+    
+    if users:
+        # Only registrations nobody reviewed since they were loaded
+        rejected = set(db.execute(
+            update(PendingUser)
+            .where(PendingUser.id.in_(list(users)), PendingUser.is_reviewed == False)
+            .values(is_reviewed=True, admin_notes=f"Rejected: {reason}")
+            .returning(PendingUser.id)
+            .execution_options(synchronize_session=False)
+        ).scalars())
+        for user_id in users:
+            if user_id in rejected:
+                outcomes[user_id] = {"user_id": user_id, "status": "rejected"}
+            else:
+                outcomes[user_id] = {"user_id": user_id, "status": "error", "detail": "User already reviewed"}
+    
+    db.commit()
+    
+    return [outcomes[user_id] for user_id in ids]
@@ -0,0 +1,290 @@
+"""
+Resumable Uploads
+
+Large files (mostly audio oaths recorded on phones) can be sent in chunks
+so a dropped connection only costs the chunk in flight:
+
+    create   -> token, chunk size
+    PUT      chunk at ?offset=received_bytes, with X-Chunk-SHA256
+    GET      progress (received_bytes), to resume after a failure
+    finalize -> stored like any other upload
+
+Chunks are appended to UPLOAD_DIR/tmp/resumable/<token>.part. A chunk whose
+checksum does not match, or that is cut off, is truncated away so the
+file always ends at received_bytes. Abandoned uploads expire after
+UPLOAD_RESUMABLE_TTL_SECONDS of inactivity.
+"""
+import hashlib
+import os
+import secrets
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Optional, Tuple
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.models.resumable_upload import ResumableUpload
+from app.models.upload import Upload
+from app.models.upload_blob import UploadBlob
+from app.services import upload_service
+from app.services.upload_service import UploadTooLargeError
+
+RESUMABLE_DIR = "resumable"
+
+# How long one chunk request may hold the upload before another may take over
+CHUNK_LEASE_SECONDS = 600
+
+# Default extension and size limit per media type
+MEDIA_TYPES = {
+    "photo": (".jpg", lambda: settings.UPLOAD_MAX_PHOTO_BYTES),
+    "audio": (".webm", lambda: settings.UPLOAD_MAX_AUDIO_BYTES),
+}
+
+
+class UploadOffsetConflictError(ValueError):
+    """The chunk does not start where the upload currently ends"""
+
+    def __init__(self, message: str, received_bytes: int):
+        super().__init__(message)
+        self.received_bytes = received_bytes
+
+
+def part_path(upload: ResumableUpload) -> str:
+    return os.path.join(settings.UPLOAD_DIR, "tmp", RESUMABLE_DIR, f"{upload.token}.part")
+
+
+def _touch(path: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, "wb").close()
+
+
+def _expiry() -> datetime:
+    return datetime.utcnow() + timedelta(seconds=settings.UPLOAD_RESUMABLE_TTL_SECONDS)
+
+
+def create_resumable_upload(
+    db: Session,
+    media_type: str,
+    total_bytes: int,
+    filename: Optional[str] = None,
+    content_type: Optional[str] = None,
+    sha256: Optional[str] = None
+) -> ResumableUpload:
+    """Start a chunked upload of total_bytes"""
+    if media_type not in MEDIA_TYPES:
+        raise ValueError("Invalid media type. Use 'photo' or 'audio'")
+
+    default_extension, max_bytes = MEDIA_TYPES[media_type]
+    if total_bytes > max_bytes():
+        raise UploadTooLargeError(f"File exceeds the {max_bytes()} byte limit")
+
+    upload = ResumableUpload(
+        token=secrets.token_urlsafe(24),
+        media_type=media_type,
+        filename=(filename or "")[:255] or None,
+        content_type=content_type,
+        extension=upload_service.clean_extension(filename, default_extension),
+        total_bytes=total_bytes,
+        sha256=sha256.lower() if sha256 else None,
+        received_bytes=0,
+        chunks_received=0,
+        expires_at=_expiry()
+    )
+    _touch(part_path(upload))
+    db.add(upload)
+    db.commit()
+    db.refresh(upload)
+    return upload
+
+
+def get_resumable_upload(db: Session, token: str) -> Optional[ResumableUpload]:
+    """An upload still in progress, or None if unknown or expired"""
+    return db.query(ResumableUpload).filter(
+        ResumableUpload.token == token,
+        ResumableUpload.expires_at > datetime.utcnow()
+    ).first()
+
+
+def _claim(db: Session, upload: ResumableUpload, offset: int):
+    now = datetime.utcnow()
+    claimed = db.query(ResumableUpload).filter(
+        ResumableUpload.id == upload.id,
+        ResumableUpload.received_bytes == offset,
+        or_(ResumableUpload.writing_until.is_(None), ResumableUpload.writing_until < now)
+    ).update(
+        {"writing_until": now + timedelta(seconds=CHUNK_LEASE_SECONDS)},
+        synchronize_session=False
+    )
+    db.commit()
+    db.refresh(upload)
+
+    if not claimed:
+        if upload.received_bytes != offset:
+            raise UploadOffsetConflictError(
+                f"Chunk must start at offset {upload.received_bytes}", upload.received_bytes
+            )
+        raise UploadOffsetConflictError(
+            "Another chunk is being written; retry shortly", upload.received_bytes
+        )
+
+
+def _open_at(path: str, offset: int):
+    out = open(path, "r+b")
+    # Drop anything past the last complete chunk
+    out.truncate(offset)
+    out.seek(offset)
+    return out
+
+
+def _truncate(path: str, offset: int):
+    with open(path, "r+b") as out:
+        out.truncate(offset)
+
+
+async def write_chunk(
+    db: Session,
+    upload: ResumableUpload,
+    offset: int,
+    body: AsyncIterator[bytes],
+    checksum: Optional[str] = None
+) -> ResumableUpload:
+    """
+    Append one chunk starting at offset
+    With a checksum (hex SHA-256 of the chunk) a corrupted chunk is rejected and discarded
+    """
+    _claim(db, upload, offset)
+
+    path = part_path(upload)
+    digest = hashlib.sha256()
+    size = 0
+
+    try:
+        out = await run_in_threadpool(_open_at, path, offset)
+        try:
+            async for data in body:
+                if not data:
+                    continue
+                size += len(data)
+                if size > settings.UPLOAD_RESUMABLE_CHUNK_BYTES:
+                    raise UploadTooLargeError(
+                        f"Chunk exceeds the {settings.UPLOAD_RESUMABLE_CHUNK_BYTES} byte limit"
+                    )
+                if offset + size > upload.total_bytes:
+                    raise ValueError(f"Chunk runs past the declared {upload.total_bytes} bytes")
+                digest.update(data)
+                await run_in_threadpool(out.write, data)
+        finally:
+            await run_in_threadpool(out.close)
+
+        if size == 0:
+            raise ValueError("Empty chunk")
+        if checksum and checksum.lower() != digest.hexdigest():
+            raise ValueError("Chunk checksum mismatch; resend the chunk")
+    except BaseException:
+        await run_in_threadpool(_truncate, path, offset)
+        upload.writing_until = None
+        db.commit()
+        raise
+
+    upload.received_bytes = offset + size
+    upload.chunks_received += 1
+    upload.writing_until = None
+    upload.expires_at = _expiry()
+    db.commit()
+    db.refresh(upload)
+    return upload
+
+
+def _claim_for_finalize(db: Session, upload: ResumableUpload):
+    """
+    Mark a fully received upload as finalizing (its chunk lease is taken)
+    so a repeated finalize cannot store it twice and no chunk can land meanwhile
+    """
+    now = datetime.utcnow()
+    claimed = db.query(ResumableUpload).filter(
+        ResumableUpload.id == upload.id,
+        ResumableUpload.received_bytes >= ResumableUpload.total_bytes,
+        or_(ResumableUpload.writing_until.is_(None), ResumableUpload.writing_until < now)
+    ).update(
+        {"writing_until": now + timedelta(seconds=CHUNK_LEASE_SECONDS)},
+        synchronize_session=False
+    )
+    db.commit()
+
+    if not claimed:
+        # The winner may already have deleted the row, so read it afresh
+        received = db.query(ResumableUpload.received_bytes).filter(
+            ResumableUpload.id == upload.id
+        ).scalar()
+        if received is None:
+            raise UploadOffsetConflictError("Upload already finalized", upload.total_bytes)
+        if received < upload.total_bytes:
+            raise UploadOffsetConflictError(
+                f"Upload incomplete: {received} of {upload.total_bytes} bytes received", received
+            )
+        raise UploadOffsetConflictError(
+            "Upload is being written or finalized by another request", received
+        )
+    db.refresh(upload)
+
+
+def _release(db: Session, upload_id: int):
+    db.query(ResumableUpload).filter(ResumableUpload.id == upload_id).update(
+        {"writing_until": None}, synchronize_session=False
+    )
+    db.commit()
+
+
+async def finalize_resumable_upload(db: Session, upload: ResumableUpload) -> Tuple[Upload, UploadBlob]:
+    """Move a fully received upload into the store"""
+    _claim_for_finalize(db, upload)
+
+    upload_id, path = upload.id, part_path(upload)
+    try:
+        sha256 = await run_in_threadpool(upload_service.hash_file, path)
+        if upload.sha256 and upload.sha256 != sha256:
+            abort_resumable_upload(db, upload)
+            raise ValueError("File checksum mismatch; the upload was discarded")
+
+        media_type, extension = upload.media_type, upload.extension
+        content_type, filename, total = upload.content_type, upload.filename, upload.total_bytes
+        db.delete(upload)
+        db.flush()
+
+        return await upload_service.record_upload(
+            db, path, total, sha256, media_type, extension, content_type, filename
+        )
+    except BaseException:
+        # Let the client retry unless the upload is already gone
+        db.rollback()
+        _release(db, upload_id)
+        raise
+
+
+def abort_resumable_upload(db: Session, upload: ResumableUpload):
+    path = part_path(upload)
+    db.delete(upload)
+    db.commit()
+    upload_service.remove_file(path)
+
+
+def expire_resumable_uploads(db: Session) -> int:
+    """Delete abandoned partial uploads and their files"""
+    expired = db.query(ResumableUpload).filter(
+        ResumableUpload.expires_at <= datetime.utcnow()
+    ).all()
+    if not expired:
+        return 0
+
+    paths = [part_path(upload) for upload in expired]
+    db.query(ResumableUpload).filter(
+        ResumableUpload.id.in_([upload.id for upload in expired])
+    ).delete(synchronize_session=False)
+    db.commit()
+
+    for path in paths:
+        upload_service.remove_file(path)
+    print(f"🧹 Expired {len(paths)} abandoned resumable upload(s)")
+    return len(paths)
@@ -0,0 +1,127 @@
+"""
+Retention Policies
+
+Declares which rows expire in each table, driven by the retention settings
+in config. The engine runs periodically from the API process and from
+scripts/cleanup.py. A retention period of 0 disables that table's policy.
+"""
+from datetime import timedelta
+
+from sqlalchemy import and_, exists, or_
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.retention import RetentionEngine, RetentionPolicy
+from app.models.qr_session import QRSession
+from app.models.pending_user import PendingUser
+from app.models.upload import RegistrationAttachment
+from app.models.waitlist import WaitlistRequest, WaitlistStatus
+from app.models.invitation import Invitation
+from app.models.admin_notification import AdminNotificationEvent, NotificationDelivery
+from app.models.email_outbox import EmailOutbox, OutboxStatus
+from app.core.jobs import job_retention_policy
+from app.services.archive_service import login_history_policy
+from app.services.analytics_service import hourly_retention_policy
+from app.services.upload_service import detach_registrations
+
+
+def build_policies():
+    policies = []
+
+    if settings.QR_SESSION_RETENTION_HOURS:
+        hours = settings.QR_SESSION_RETENTION_HOURS
+        policies.append(RetentionPolicy(
+            "qr_sessions",
+            QRSession.__table__,
+            lambda now: QRSession.expires_at < now - timedelta(hours=hours)
+        ))
+
+    if settings.LOGIN_HISTORY_RETENTION_DAYS:
+        # Archived to compressed files before deletion
+        policies.append(login_history_policy())
+
+    if settings.REVIEWED_PENDING_USER_RETENTION_DAYS:
+        days = settings.REVIEWED_PENDING_USER_RETENTION_DAYS
+        has_files = exists().where(RegistrationAttachment.pending_user_id == PendingUser.id)
+        policies.append(RetentionPolicy(
+            "pending_users",
+            PendingUser.__table__,
+            lambda now: and_(
+                PendingUser.is_reviewed == True,
+                PendingUser.updated_at < now - timedelta(days=days),
+                # Files of approved users stay linked; only rejected registrations give theirs up
+                or_(~has_files, PendingUser.admin_notes.startswith("Rejected: "))
+            ),
+            before_delete=detach_registrations
+        ))
+
+    if settings.REJECTED_WAITLIST_RETENTION_DAYS:
+        days = settings.REJECTED_WAITLIST_RETENTION_DAYS
+        policies.append(RetentionPolicy(
+            "waitlist_requests",
+            WaitlistRequest.__table__,
+            lambda now: and_(
+                WaitlistRequest.status == WaitlistStatus.REJECTED,
+                WaitlistRequest.updated_at < now - timedelta(days=days)
+            )
+        ))
+
+    if settings.INVITATION_RETENTION_DAYS:
+        days = settings.INVITATION_RETENTION_DAYS
+        policies.append(RetentionPolicy(
+            "invitations",
+            Invitation.__table__,
+            lambda now: or_(
+                and_(Invitation.is_used == True, Invitation.used_at < now - timedelta(days=days)),
+                and_(Invitation.is_used == False, Invitation.expires_at < now - timedelta(days=days))
+            )
+        ))
+
+    if settings.ADMIN_NOTIFICATION_RETENTION_DAYS:
+        days = settings.ADMIN_NOTIFICATION_RETENTION_DAYS
+        policies.append(RetentionPolicy(
+            "admin_notification_events",
+            AdminNotificationEvent.__table__,
+            lambda now: and_(
+                AdminNotificationEvent.delivery != NotificationDelivery.PENDING,
+                AdminNotificationEvent.created_at < now - timedelta(days=days)
+            )
+        ))
+
+    if settings.EMAIL_OUTBOX_RETENTION_DAYS:
+        days = settings.EMAIL_OUTBOX_RETENTION_DAYS
+        policies.append(RetentionPolicy(
+            "email_outbox",
+            EmailOutbox.__table__,
+            lambda now: and_(
+                EmailOutbox.status.in_([OutboxStatus.SENT, OutboxStatus.FAILED]),
+                EmailOutbox.created_at < now - timedelta(days=days)
+            )
+        ))
+
+    # Finished bulk jobs stop being pollable after JOB_RETENTION_SECONDS anyway
+    policies.append(job_retention_policy())
+
+    if settings.ANALYTICS_HOURLY_RETENTION_DAYS:
+        # Downsampling: daily buckets already hold these counts
+        policies.append(hourly_retention_policy())
+
+    return policies
+
+
+retention_engine = RetentionEngine(
+    build_policies(),
+    batch_size=settings.RETENTION_BATCH_SIZE,
+    pause_seconds=settings.RETENTION_BATCH_PAUSE_SECONDS,
+    lease_seconds=settings.RETENTION_LEASE_SECONDS
+)
+
+
+def run_retention(db: Session) -> dict:
+    """Apply every retention policy. Returns rows deleted per table."""
+    return retention_engine.run(db)
+
+
+def get_retention_metrics() -> dict:
+    """Rows deleted, batch latency and backlog per table"""
+    return retention_engine.metrics()
@@ -0,0 +1,196 @@
+"""
+Login Rollups
+
+Keeps per-(user, service) and per-user login totals up to date as sessions
+are created, so user statistics never have to count login history.
+
+The login write-behind calls apply_logins() in the same transaction that
+inserts the new sessions. rebuild_login_rollups() recomputes everything from
+login_history, active_sessions and the login history archive; on startup it
+runs automatically when the rollups count fewer logins than the tables hold
+(as on the first deploy with rollups).
+"""
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import case, delete, func, literal_column, or_, select, union_all
+from sqlalchemy.orm import Session
+
+from app.models.active_session import ActiveSession
+from app.models.login_history import LoginHistory
+from app.models.login_rollup import UserLoginRollup, UserServiceLoginRollup
+from app.services import archive_service
+from app.utils.upsert import insert_for, lock_for_rebuild
+
+_pairs = UserServiceLoginRollup.__table__
+_users = UserLoginRollup.__table__
+
+# (user_id, service_id) -> [login_count, first_login_at, last_login_at]
+PairTotals = Dict[Tuple[int, int], list]
+
+
+def _add(totals: PairTotals, user_id: int, service_id: int, login_at: datetime):
+    current = totals.get((user_id, service_id))
+    if current is None:
+        totals[(user_id, service_id)] = [1, login_at, login_at]
+    else:
+        current[0] += 1
+        current[1] = min(current[1], login_at)
+        current[2] = max(current[2], login_at)
+
+
+def apply_logins(db: Session, sessions: Iterable[dict]):
+    """
+    Add new sessions to the rollups
+    Caller commits, normally together with the session inserts
+    """
+    totals: PairTotals = {}
+    for session in sessions:
+        _add(totals, session["user_id"], session["service_id"], session["login_at"])
+
+    if totals:
+        _apply_pair_totals(db, totals)
+        _refresh_users(db, {user_id for user_id, _ in totals})
+
+
+def _apply_pair_totals(db: Session, totals: PairTotals):
+    """Upsert per-(user, service) totals, adding to any existing counts"""
+    insert = insert_for(db)
+    stmt = insert(_pairs)
+    new = stmt.excluded
+
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[_pairs.c.user_id, _pairs.c.service_id],
+        set_={
+            "login_count": _pairs.c.login_count + new.login_count,
+            "first_login_at": case(
+                (or_(_pairs.c.first_login_at == None, new.first_login_at < _pairs.c.first_login_at),
+                 new.first_login_at),
+                else_=_pairs.c.first_login_at
+            ),
+            "last_login_at": case(
+                (or_(_pairs.c.last_login_at == None, new.last_login_at > _pairs.c.last_login_at),
+                 new.last_login_at),
+                else_=_pairs.c.last_login_at
+            )
+        }
+    )
+
+    db.execute(stmt, [
+        {
+            "user_id": user_id,
+            "service_id": service_id,
+            "login_count": count,
+            "first_login_at": first,
+            "last_login_at": last
+        }
+        for (user_id, service_id), (count, first, last) in totals.items()
+    ])
+
+
+def _refresh_users(db: Session, user_ids: Optional[set] = None):
+    """
+    Recompute per-user rows from the per-(user, service) rows
+    Touches one row per service the user has logged into
+    """
+    source = select(
+        _pairs.c.user_id,
+        func.sum(_pairs.c.login_count),
+        func.count(),
+        func.min(_pairs.c.first_login_at),
+        func.max(_pairs.c.last_login_at)
+    )
+    if user_ids is not None:
+        source = source.where(_pairs.c.user_id.in_(user_ids))
+    else:
+        # SQLite needs a WHERE before the upsert's ON CONFLICT
+        source = source.where(literal_column("1") == 1)
+    source = source.group_by(_pairs.c.user_id)
+
+    insert = insert_for(db)
+    stmt = insert(_users).from_select(
+        ["user_id", "login_count", "services_used", "first_login_at", "last_login_at"],
+        source
+    )
+    new = stmt.excluded
+
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[_users.c.user_id],
+        set_={
+            "login_count": new.login_count,
+            "services_used": new.services_used,
+            "first_login_at": new.first_login_at,
+            "last_login_at": new.last_login_at
+        }
+    ))
+
+
+def rebuild_login_rollups(db: Session, include_archive: bool = True) -> int:
+    """
+    Recompute all rollups from scratch
+    Returns the number of users with a rollup
+
+    Logins written meanwhile wait for the rebuild to commit and are added on
+    top, so none is missed or counted twice.
+    """
+    lock_for_rebuild(db, _pairs, _users)
+    db.execute(delete(_users))
+    db.execute(delete(_pairs))
+
+    # Sessions still in the database, aggregated in SQL
+    logins = union_all(
+        select(LoginHistory.user_id, LoginHistory.service_id, LoginHistory.login_at),
+        select(ActiveSession.user_id, ActiveSession.service_id, ActiveSession.login_at)
+    ).subquery()
+
+    db.execute(
+        _pairs.insert().from_select(
+            ["user_id", "service_id", "login_count", "first_login_at", "last_login_at"],
+            select(
+                logins.c.user_id,
+                logins.c.service_id,
+                func.count(),
+                func.min(logins.c.login_at),
+                func.max(logins.c.login_at)
+            ).group_by(logins.c.user_id, logins.c.service_id)
+        )
+    )
+
+    # Sessions already moved out to the archive
+    if include_archive:
+        totals: PairTotals = {}
+        for record in archive_service.iter_all_archived_login_history():
+            _add(
+                totals, record["user_id"], record["service_id"],
+                datetime.fromisoformat(record["login_at"])
+            )
+        if totals:
+            _apply_pair_totals(db, totals)
+
+    _refresh_users(db)
+    db.commit()
+
+    return db.query(UserLoginRollup).count()
+
+
+def rollups_incomplete(db: Session) -> bool:
+    """
+    True when the rollups count fewer logins than login_history and active_sessions hold
+    Complete rollups also count archived logins, so they are never fewer.
+    """
+    counted = db.query(func.coalesce(func.sum(UserServiceLoginRollup.login_count), 0)).scalar()
+    stored = db.query(func.count(LoginHistory.id)).scalar() + db.query(func.count(ActiveSession.id)).scalar()
+    db.rollback()
+    return counted < stored
+
+
+def backfill_login_rollups(db: Session) -> Optional[int]:
+    """Rebuild the rollups if they are missing logins. Returns users rebuilt, or None."""
+    if not rollups_incomplete(db):
+        return None
+    return rebuild_login_rollups(db)
+
+
+def get_user_rollup(db: Session, user_id: int) -> Optional[UserLoginRollup]:
+    return db.get(UserLoginRollup, user_id)
+
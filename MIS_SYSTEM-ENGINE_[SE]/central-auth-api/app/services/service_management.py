@@ -1,4 +1,5 @@
 from app.models.registered_service import RegisteredService
+from app.core.service_registry import service_registry
 from sqlalchemy.orm import Session
 import uuid
 from typing import Optional
@@ -36,18 +37,21 @@ def register_new_service(
     db.commit()
     db.refresh(service)
     
+    service_registry.invalidate(service.id)
+    
     return service
 
 def get_all_services(db: Session, include_inactive: bool = False):
     """
     Get list of all registered services
+    Read from the database: the listing returns API keys, which the service registry does not keep
     """
     query = db.query(RegisteredService)
     
     if not include_inactive:
         query = query.filter(RegisteredService.is_active == True)
     
-    return query.all()
+    return query.order_by(RegisteredService.id).all()
 
 def deactivate_service(service_id: int, db: Session) -> bool:
     """
@@ -63,4 +67,6 @@ def deactivate_service(service_id: int, db: Session) -> bool:
     service.is_active = False
     db.commit()
     
-    return True
\ No newline at end of file
+    service_registry.invalidate(service_id)
+    
+    return True
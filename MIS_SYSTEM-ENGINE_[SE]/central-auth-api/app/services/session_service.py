@@ -1,62 +1,246 @@
 from app.models.login_history import LoginHistory
+from app.models.active_session import ActiveSession
 from app.models.active_user import ActiveUser
+from sqlalchemy import delete, insert, select, literal
 from sqlalchemy.orm import Session
-from datetime import datetime
+from datetime import datetime, timedelta
+from typing import Optional
+from app.config import settings
 from app.core.security import decode_access_token
+from app.core.login_writer import login_writer
+from app.utils.upsert import insert_for
+
+# Columns copied when a session moves from active_sessions to login_history
+_MOVED_COLUMNS = (
+    "user_id", "service_id", "session_token", "login_at",
+    "session_expires_at", "ip_address", "user_agent"
+)
 
 def validate_session_token(token: str, db: Session) -> dict:
     """
     Verify if a session token is still valid
     Services call this to check if user is still logged in
     """
-    
+
     # Decode the JWT token
     payload = decode_access_token(token)
-    
+
     if not payload:
         raise ValueError("Invalid token")
-    
-    # Check if session exists in login history
-    login_record = db.query(LoginHistory).filter(
-        LoginHistory.session_token == token
-    ).first()
-    
-    if not login_record:
-        raise ValueError("Session not found")
-    
+
+    # Sessions still queued for write-behind are not in the table yet
+    pending = login_writer.pending_session(token)
+
+    if pending:
+        session_expires_at = pending["session_expires_at"]
+    else:
+        # Only live sessions are kept in active_sessions
+        session_expires_at = db.query(ActiveSession.session_expires_at).filter(
+            ActiveSession.session_token == token
+        ).scalar()
+
+        if session_expires_at is None and adopt_live_history_sessions(db, token):
+            session_expires_at = db.query(ActiveSession.session_expires_at).filter(
+                ActiveSession.session_token == token
+            ).scalar()
+
+        if session_expires_at is None:
+            session_expires_at = _write_unflushed_session(token, payload, db)
+
+        if session_expires_at is None:
+            raise ValueError("Session not found")
+
     # Check if session has expired
-    if datetime.utcnow() > login_record.session_expires_at:
+    if datetime.utcnow() > session_expires_at:
         raise ValueError("Session has expired")
-    
+
     # Check if user is still active
     user = db.query(ActiveUser).filter(
         ActiveUser.id == payload["user_id"],
         ActiveUser.is_active == True
     ).first()
-    
+
     if not user:
         raise ValueError("User account is inactive")
-    
+
     return {
         "valid": True,
         "user_id": user.id,
         "username": user.username,
-        "expires_at": login_record.session_expires_at
+        "expires_at": session_expires_at
     }
 
 def logout_session(token: str, db: Session) -> bool:
     """
     Logout a user session
-    Marks the logout time in login_history
+    Moves the session from active_sessions to login_history with a logout time
     """
-    login_record = db.query(LoginHistory).filter(
-        LoginHistory.session_token == token
-    ).first()
-    
-    if not login_record:
+    # Make sure a just-created session has reached the table
+    if login_writer.pending_session(token):
+        login_writer.flush()
+
+    moved = _move_to_history(
+        db,
+        ActiveSession.session_token == token,
+        logout_at=datetime.utcnow()
+    )
+
+    if not moved:
+        # Possibly still queued for write-behind in another worker, or from before active_sessions
+        payload = decode_access_token(token)
+        if payload and (adopt_live_history_sessions(db, token) or _write_unflushed_session(token, payload, db)):
+            moved = _move_to_history(
+                db,
+                ActiveSession.session_token == token,
+                logout_at=datetime.utcnow()
+            )
+
+    if not moved:
         raise ValueError("Session not found")
-    
-    login_record.logout_at = datetime.utcnow()
+
+    db.commit()
+
+    return True
+
+def adopt_live_history_sessions(db: Session, token: Optional[str] = None) -> int:
+    """
+    Move sessions that are still live in login_history into active_sessions
+    Sessions created before active_sessions existed were written straight to
+    login_history. Run on startup for every recent session, and by validation
+    and logout for one token. Returns the number of sessions moved.
+    """
+    now = datetime.utcnow()
+    criteria = [LoginHistory.logout_at.is_(None), LoginHistory.session_expires_at > now]
+    if token is not None:
+        criteria.append(LoginHistory.session_token == token)
+        # Unknown and ended tokens are common on the validation path; only read for them
+        if db.query(LoginHistory.id).filter(*criteria).first() is None:
+            return 0
+    else:
+        # Live sessions were created within the session lifetime; keeps this on the login_at index
+        criteria.append(LoginHistory.login_at >= now - timedelta(minutes=settings.SESSION_EXPIRY_MINUTES))
+
+    insert_session = insert_for(db)
+    db.execute(
+        insert_session(ActiveSession).from_select(
+            list(_MOVED_COLUMNS),
+            select(*[getattr(LoginHistory, name) for name in _MOVED_COLUMNS]).where(*criteria)
+        ).on_conflict_do_nothing(index_elements=[ActiveSession.session_token])
+    )
+    result = db.execute(
+        delete(LoginHistory)
+        .where(*criteria)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+    return result.rowcount
+
+def _write_unflushed_session(token: str, payload: dict, db: Session) -> Optional[datetime]:
+    """
+    Insert a session that another worker accepted but has not flushed yet
+    Every worker queues logins in its own write-behind buffer, so a session
+    created on one worker can be validated on another before it reaches
+    active_sessions. The signed token carries everything the row needs.
+    Returns the session expiry, or None for tokens that are not a live session.
+    """
+    # Only PIN verification mints tokens with a session id and a service
+    if not all(key in payload for key in ("jti", "user_id", "service_id", "exp")):
+        return None
+
+    session_expires_at = datetime.utcfromtimestamp(payload["exp"])
+    if session_expires_at <= datetime.utcnow():
+        return None
+
+    # Logged out or expired already; never bring an ended session back
+    ended = db.query(LoginHistory.id).filter(LoginHistory.session_token == token).first()
+    if ended:
+        return None
+
+    insert_session = insert_for(db)
+    db.execute(
+        insert_session(ActiveSession).values(
+            user_id=payload["user_id"],
+            service_id=payload["service_id"],
+            session_token=token,
+            login_at=session_expires_at - timedelta(minutes=settings.SESSION_EXPIRY_MINUTES),
+            session_expires_at=session_expires_at
+        ).on_conflict_do_nothing(index_elements=[ActiveSession.session_token])
+    )
     db.commit()
-    
-    return True
\ No newline at end of file
+
+    return session_expires_at
+
+def sweep_expired_sessions(db: Session, batch_size: int = 500) -> int:
+    """
+    Move expired sessions from active_sessions to login_history
+    Runs periodically in the background; returns the number of sessions moved
+    """
+    now = datetime.utcnow()
+    total = 0
+
+    while True:
+        ids = [
+            row.id for row in db.query(ActiveSession.id).filter(
+                ActiveSession.session_expires_at < now
+            ).limit(batch_size)
+        ]
+
+        if not ids:
+            break
+
+        total += _move_to_history(db, ActiveSession.id.in_(ids))
+        db.commit()
+
+        if len(ids) < batch_size:
+            break
+
+    return total
+
+def get_active_sessions(
+    db: Session,
+    user_id: Optional[int] = None,
+    service_id: Optional[int] = None,
+    skip: int = 0,
+    limit: int = 100
+):
+    """
+    Get sessions that are currently logged in
+    Cheap indexed scan of the small active_sessions table
+    """
+    query = db.query(ActiveSession).filter(
+        ActiveSession.session_expires_at >= datetime.utcnow()
+    )
+
+    if user_id:
+        query = query.filter(ActiveSession.user_id == user_id)
+
+    if service_id:
+        query = query.filter(ActiveSession.service_id == service_id)
+
+    return query.order_by(ActiveSession.login_at.desc()).offset(skip).limit(limit).all()
+
+def _move_to_history(db: Session, criteria, logout_at: Optional[datetime] = None) -> int:
+    """
+    Copy matching active sessions into login_history and delete them
+    Caller commits so both statements land in one transaction
+    """
+    source = select(
+        *[getattr(ActiveSession, name) for name in _MOVED_COLUMNS],
+        literal(logout_at, LoginHistory.logout_at.type).label("logout_at")
+    ).where(criteria)
+
+    db.execute(
+        insert(LoginHistory).from_select(
+            list(_MOVED_COLUMNS) + ["logout_at"],
+            source
+        )
+    )
+
+    result = db.execute(
+        delete(ActiveSession)
+        .where(criteria)
+        .execution_options(synchronize_session=False)
+    )
+
+    return result.rowcount
@@ -0,0 +1,170 @@
+"""
+Orphaned Upload Collection
+
+Uploads are made before the registration that uses them is submitted, so
+visitors who abandon the registration portal leave files nobody points
+at. An upload is orphaned once it is older than UPLOAD_ORPHAN_GRACE_HOURS
+and no registration links it (registration_attachments). Links are only
+removed when retention deletes a rejected registration, so approved
+users keep their files.
+
+Orphans are deleted in batches, each in its own short transaction like
+the retention engine, and under the same kind of database lease so only
+one worker collects at a time. Each DELETE re-checks that the uploads are
+still orphaned and returns the rows it removed; only those release what
+they held. Stored files go only when nothing else references them: a blob
+when its ref_count reaches zero, a pre-store file when no other upload
+has its path, derivatives when no upload has the content.
+"""
+import os
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from sqlalchemy import and_, bindparam, delete, exists, select, update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.leases import held_lease, renew_lease
+from app.models.photo_hash import PhotoHash
+from app.models.upload import RegistrationAttachment, Upload
+from app.models.upload_blob import UploadBlob
+from app.services import upload_service
+
+LEASE_NAME = "upload-gc"
+
+
+def orphaned(cutoff: datetime):
+    """WHERE clause for uploads created before cutoff that no registration links"""
+    linked = exists().where(RegistrationAttachment.upload_id == Upload.id)
+    return and_(Upload.created_at < cutoff, Upload.owner_id.is_(None), ~linked)
+
+
+def _file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _delete_batch(db: Session, ids: List[int], criteria) -> Tuple[int, List[str], List[Tuple[str, str]]]:
+    """
+    Delete the uploads among ids that are still orphaned and release what they held
+    Returns (uploads deleted, files to remove, (sha256, path) of blobs to remove)
+    """
+    # A registration may have linked one of them since the batch was selected
+    deleted = db.execute(
+        delete(Upload)
+        .where(Upload.id.in_(ids), criteria)
+        .returning(Upload.sha256, Upload.path)
+        .execution_options(synchronize_session=False)
+    ).all()
+    if not deleted:
+        return 0, [], []
+
+    paths = []
+    blobs = []
+
+    released = Counter(
+        sha256 for sha256, path in deleted if path.startswith(f"{upload_service.BLOB_DIR}/")
+    )
+    legacy = {path for _, path in deleted if not path.startswith(f"{upload_service.BLOB_DIR}/")}
+    if released:
+        table = UploadBlob.__table__
+        db.execute(
+            update(table)
+            .where(table.c.sha256 == bindparam("released_sha256"))
+            .values(ref_count=table.c.ref_count - bindparam("released"))
+            .execution_options(synchronize_session=False),
+            [{"released_sha256": sha256, "released": count} for sha256, count in released.items()]
+        )
+        gone = db.execute(
+            delete(UploadBlob)
+            .where(UploadBlob.sha256.in_(released), UploadBlob.ref_count <= 0)
+            .returning(UploadBlob.sha256, UploadBlob.extension)
+            .execution_options(synchronize_session=False)
+        ).all()
+        blobs += [
+            (sha256, os.path.join(settings.UPLOAD_DIR, *upload_service.blob_relpath(sha256, extension).split("/")))
+            for sha256, extension in gone
+        ]
+
+    # Files from before the store, unless another upload still has the path
+    if legacy:
+        still_used = {path for (path,) in db.query(Upload.path).filter(Upload.path.in_(legacy))}
+        paths += [
+            os.path.join(settings.UPLOAD_DIR, *path.split("/"))
+            for path in legacy - still_used
+        ]
+
+    # Derivatives and duplicate-detection hashes, once no upload has the content
+    hashes = {sha256 for sha256, _ in deleted}
+    still_used = {sha256 for (sha256,) in db.query(Upload.sha256).filter(Upload.sha256.in_(hashes))}
+    if hashes - still_used:
+        db.execute(delete(PhotoHash).where(PhotoHash.sha256.in_(hashes - still_used)))
+    for sha256 in hashes - still_used:
+        paths += [path for path, _, _ in upload_service.derivative_targets(sha256)]
+
+    return len(deleted), paths, blobs
+
+
+def collect_orphaned_uploads(
+    db: Session,
+    grace_hours: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    pause_seconds: Optional[float] = None
+) -> dict:
+    """
+    Delete uploads no registration references once the grace period has passed
+    Returns uploads deleted, files removed and bytes reclaimed
+    """
+    grace_hours = settings.UPLOAD_ORPHAN_GRACE_HOURS if grace_hours is None else grace_hours
+    batch_size = batch_size or settings.RETENTION_BATCH_SIZE
+    pause_seconds = settings.RETENTION_BATCH_PAUSE_SECONDS if pause_seconds is None else pause_seconds
+    criteria = orphaned(datetime.utcnow() - timedelta(hours=grace_hours))
+
+    report = {"uploads_deleted": 0, "files_deleted": 0, "bytes_reclaimed": 0, "batches": 0}
+
+    with held_lease(db, LEASE_NAME, settings.RETENTION_LEASE_SECONDS) as holder:
+        if holder is None:
+            return report
+        last_id = 0
+
+        while renew_lease(db, LEASE_NAME, holder, settings.RETENTION_LEASE_SECONDS):
+            ids = db.execute(
+                select(Upload.id).where(criteria, Upload.id > last_id).order_by(Upload.id).limit(batch_size)
+            ).scalars().all()
+            if not ids:
+                db.rollback()
+                break
+            last_id = ids[-1]
+
+            deleted, paths, blobs = _delete_batch(db, ids, criteria)
+            db.commit()
+
+            # Files go after the commit; a crash in between only leaves stray files
+            for path in paths:
+                if os.path.exists(path):
+                    report["bytes_reclaimed"] += _file_size(path)
+                    report["files_deleted"] += 1
+                    upload_service.remove_file(path)
+            for sha256, path in blobs:
+                size = _file_size(path)
+                if upload_service.remove_blob_file(db, sha256, path):
+                    report["bytes_reclaimed"] += size
+                    report["files_deleted"] += 1
+
+            report["uploads_deleted"] += deleted
+            report["batches"] += 1
+
+            if len(ids) < batch_size:
+                break
+            time.sleep(pause_seconds)
+
+    if report["uploads_deleted"]:
+        print(
+            f"🧹 Removed {report['uploads_deleted']} orphaned upload(s), "
+            f"{report['files_deleted']} file(s), {report['bytes_reclaimed']} bytes reclaimed"
+        )
+    return report
@@ -0,0 +1,563 @@
+"""
+Upload Storage
+
+Streams uploaded files to disk in UPLOAD_CHUNK_SIZE chunks. Reads and
+writes run in the threadpool so a large upload never blocks the event
+loop. The SHA-256 is computed while streaming, and the size limit is
+checked chunk by chunk. Files are written under a temporary name and
+renamed into place, so an aborted upload never leaves a partial file.
+
+Files are stored by content: UPLOAD_DIR/blobs/ab/cd/abcd...<ext>, keyed by
+SHA-256 and sharded two levels deep. Identical uploads share one blob,
+counted in upload_blobs.ref_count. A blob's URL never changes, so the
+/uploads mount serves blobs as immutable.
+
+Every upload also gets an uploads row (size, type, hash, owner), so
+listings are indexed queries rather than directory scans. Registrations
+link their files through registration_attachments.
+
+Photos get thumbnail and medium derivatives under UPLOAD_DIR/derivatives,
+keyed by the original's SHA-256 like blobs (see app.core.images).
+"""
+import hashlib
+import mimetypes
+import os
+import re
+import uuid
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from fastapi import UploadFile
+from sqlalchemy import delete, func, or_, update
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.core.images import FORMATS, ImageProcessor, image_processor, render_derivatives, variant_sizes
+from app.models.pending_user import PendingUser
+from app.models.photo_hash import PhotoHash
+from app.models.upload import RegistrationAttachment, Upload
+from app.models.upload_blob import UploadBlob
+from app.utils.pagination import Page, apply_date_range, keyset_paginate
+from app.utils.upsert import insert_for
+
+BLOB_DIR = "blobs"
+DERIVATIVE_DIR = "derivatives"
+
+# file_id of a stored blob: <sha256><extension>
+BLOB_FILE_ID = re.compile(r"^([0-9a-f]{64})(\.[A-Za-z0-9]{1,15})?$")
+
+
+class UploadTooLargeError(ValueError):
+    """The upload crossed its size limit"""
+
+
+def remove_file(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+async def save_upload(file: UploadFile, directory: str, filename: str, max_bytes: int) -> dict:
+    """
+    Stream an upload to directory/filename
+    Returns the path, size in bytes and hex SHA-256 of the stored file
+    """
+    path = os.path.join(directory, filename)
+    temp_path = f"{path}.{uuid.uuid4().hex}.part"
+    digest = hashlib.sha256()
+    size = 0
+
+    out = await run_in_threadpool(open, temp_path, "wb")
+    try:
+        while True:
+            chunk = await file.read(settings.UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLargeError(f"File exceeds the {max_bytes} byte limit")
+            digest.update(chunk)
+            await run_in_threadpool(out.write, chunk)
+        await run_in_threadpool(out.close)
+        await run_in_threadpool(os.replace, temp_path, path)
+    except BaseException:
+        await run_in_threadpool(out.close)
+        await run_in_threadpool(remove_file, temp_path)
+        raise
+
+    return {"path": path, "size_bytes": size, "sha256": digest.hexdigest()}
+
+
+def clean_extension(filename: Optional[str], default: str) -> str:
+    """File extension to store under, falling back to default when missing or unusual"""
+    extension = os.path.splitext(filename)[1].lower() if filename else ""
+    if not re.match(r"^\.[a-z0-9]{1,15}$", extension):
+        return default
+    return extension
+
+
+def blob_relpath(sha256: str, extension: str) -> str:
+    """Path of a blob relative to UPLOAD_DIR"""
+    return "/".join([BLOB_DIR, sha256[:2], sha256[2:4], f"{sha256}{extension}"])
+
+
+def blob_path(blob: UploadBlob) -> str:
+    return os.path.join(settings.UPLOAD_DIR, *blob_relpath(blob.sha256, blob.extension).split("/"))
+
+
+def blob_file_id(blob: UploadBlob) -> str:
+    return f"{blob.sha256}{blob.extension}"
+
+
+def blob_url(blob: UploadBlob) -> str:
+    return f"/uploads/{blob_relpath(blob.sha256, blob.extension)}"
+
+
+def get_blob_by_file_id(db: Session, file_id: str) -> Optional[UploadBlob]:
+    match = BLOB_FILE_ID.match(file_id)
+    if not match:
+        return None
+    return db.get(UploadBlob, match.group(1))
+
+
+def _place_blob(temp_path: str, final_path: str):
+    """Move a finished upload into the store, or drop it if the content is already there"""
+    if os.path.exists(final_path):
+        remove_file(temp_path)
+        return
+    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+    os.replace(temp_path, final_path)
+
+
+async def store_upload(
+    db: Session,
+    file: UploadFile,
+    media_type: str,
+    extension: str,
+    max_bytes: int
+) -> Tuple[Upload, UploadBlob]:
+    """
+    Stream an upload into the content-addressed store and record it
+    Identical content is stored once; the existing blob gets another reference
+    """
+    temp_dir = os.path.join(settings.UPLOAD_DIR, "tmp")
+    await run_in_threadpool(os.makedirs, temp_dir, exist_ok=True)
+    stored = await save_upload(file, temp_dir, uuid.uuid4().hex, max_bytes)
+
+    return await record_upload(
+        db, stored["path"], stored["size_bytes"], stored["sha256"],
+        media_type, extension, file.content_type, file.filename
+    )
+
+
+async def record_upload(
+    db: Session,
+    temp_path: str,
+    size_bytes: int,
+    sha256: str,
+    media_type: str,
+    extension: str,
+    content_type: Optional[str],
+    filename: Optional[str]
+) -> Tuple[Upload, UploadBlob]:
+    """Move a fully received file into the store and record the upload"""
+    # The reference is committed before the file is placed, so a concurrent
+    # release of the same content puts its file back (see remove_blob_file)
+    try:
+        now = datetime.utcnow()
+        insert = insert_for(db)
+        stmt = insert(UploadBlob).values(
+            sha256=sha256,
+            extension=extension,
+            media_type=media_type,
+            content_type=content_type,
+            size_bytes=size_bytes,
+            ref_count=1,
+            created_at=now,
+            last_referenced_at=now
+        )
+        # An existing blob keeps its extension, so its URL never changes
+        extension = db.execute(stmt.on_conflict_do_update(
+            index_elements=[UploadBlob.sha256],
+            set_={"ref_count": UploadBlob.ref_count + 1, "last_referenced_at": now}
+        ).returning(UploadBlob.extension)).scalar_one()
+
+        upload = Upload(
+            file_id=f"{sha256}{extension}",
+            path=blob_relpath(sha256, extension),
+            media_type=media_type,
+            content_type=content_type,
+            size_bytes=size_bytes,
+            sha256=sha256,
+            original_filename=(filename or "")[:255] or None
+        )
+        db.add(upload)
+        db.commit()
+        db.refresh(upload)
+    except BaseException:
+        db.rollback()
+        await run_in_threadpool(remove_file, temp_path)
+        raise
+
+    try:
+        await run_in_threadpool(
+            _place_blob,
+            temp_path,
+            os.path.join(settings.UPLOAD_DIR, *upload.path.split("/"))
+        )
+    except BaseException:
+        await run_in_threadpool(remove_file, temp_path)
+        delete_upload(db, upload)
+        raise
+
+    blob = db.get(UploadBlob, sha256)
+    db.refresh(blob)
+    return upload, blob
+
+
+def remove_blob_file(db: Session, sha256: str, path: str) -> bool:
+    """
+    Remove a blob's file once its row has been deleted and committed
+    The file is moved aside first and put back if the same content was
+    uploaded again meanwhile, since that upload may have found the file
+    still in place. Returns True if the file was deleted.
+    """
+    removed_path = f"{path}.{uuid.uuid4().hex}.removed"
+    try:
+        os.replace(path, removed_path)
+    except FileNotFoundError:
+        return False
+
+    if db.query(UploadBlob.sha256).filter(UploadBlob.sha256 == sha256).first() is not None:
+        os.replace(removed_path, path)
+        return False
+
+    remove_file(removed_path)
+    remove_derivatives(sha256)
+    return True
+
+
+def release_blob(db: Session, blob: UploadBlob) -> bool:
+    """
+    Drop one reference to a blob, deleting it once nothing points at it
+    Returns True if the file was deleted
+    """
+    sha256, path = blob.sha256, blob_path(blob)
+    db.execute(
+        update(UploadBlob)
+        .where(UploadBlob.sha256 == sha256, UploadBlob.ref_count > 0)
+        .values(ref_count=UploadBlob.ref_count - 1)
+        .execution_options(synchronize_session=False)
+    )
+    # Only the release that took the count to zero deletes the row
+    deleted = db.execute(
+        delete(UploadBlob)
+        .where(UploadBlob.sha256 == sha256, UploadBlob.ref_count <= 0)
+        .returning(UploadBlob.sha256)
+        .execution_options(synchronize_session=False)
+    ).first() is not None
+    db.commit()
+
+    if deleted:
+        return remove_blob_file(db, sha256, path)
+    return False
+
+
+def derivative_relpath(sha256: str, variant: str, fmt: str) -> str:
+    """Path of a photo derivative relative to UPLOAD_DIR"""
+    return "/".join([DERIVATIVE_DIR, sha256[:2], sha256[2:4], f"{sha256}_{variant}{FORMATS[fmt][0]}"])
+
+
+def derivative_targets(sha256: str) -> List[Tuple[str, int, str]]:
+    return [
+        (os.path.join(settings.UPLOAD_DIR, *derivative_relpath(sha256, variant, fmt).split("/")), size, fmt)
+        for variant, size in variant_sizes().items()
+        for fmt in FORMATS
+    ]
+
+
+def derivative_urls(sha256: str) -> dict:
+    """URLs of a photo's derivatives, e.g. {"thumbnail": {"webp": ..., "jpeg": ...}}"""
+    return {
+        variant: {fmt: f"/uploads/{derivative_relpath(sha256, variant, fmt)}" for fmt in FORMATS}
+        for variant in variant_sizes()
+    }
+
+
+def download_target(upload: Upload, variant: Optional[str] = None, fmt: str = "webp") -> Tuple[str, str, str]:
+    """
+    File to send for an upload or one of its derivatives
+    Returns (path relative to UPLOAD_DIR, content type, ETag)
+    """
+    if variant is None:
+        content_type = upload.content_type or mimetypes.guess_type(upload.path)[0] or "application/octet-stream"
+        return upload.path, content_type, f'"{upload.sha256}"'
+
+    if upload.media_type != "photo" or variant not in variant_sizes() or fmt not in FORMATS:
+        raise ValueError("No such derivative")
+    relpath = derivative_relpath(upload.sha256, variant, fmt)
+    return relpath, mimetypes.guess_type(relpath)[0], f'"{upload.sha256}-{variant}-{fmt}"'
+
+
+def derivatives_exist(sha256: str) -> bool:
+    return all(os.path.exists(path) for path, _, _ in derivative_targets(sha256))
+
+
+def remove_derivatives(sha256: str):
+    for path, _, _ in derivative_targets(sha256):
+        remove_file(path)
+
+
+async def generate_derivatives(sha256: str, source_relpath: str):
+    """
+    Render a photo's derivatives in the image process pool
+    Run after the upload response; failures are logged, the original stays usable
+    """
+    source_path = os.path.join(settings.UPLOAD_DIR, *source_relpath.split("/"))
+    try:
+        await image_processor.render(source_path, derivative_targets(sha256))
+    except Exception as e:
+        print(f"Warning: Could not render derivatives for {source_relpath}: {e}")
+
+
+def upload_url(upload: Upload) -> str:
+    return f"/uploads/{upload.path}"
+
+
+def get_uploads(
+    db: Session,
+    media_type: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None
+) -> Page:
+    """Uploads, newest first, optionally only photos or audio"""
+    query = db.query(Upload)
+
+    if media_type:
+        query = query.filter(Upload.media_type == media_type)
+
+    query = apply_date_range(query, Upload.created_at, start_date, end_date)
+
+    return keyset_paginate(
+        query, Upload.created_at, Upload.id,
+        count_key=("uploads", media_type, start_date, end_date),
+        cursor=cursor, limit=limit, skip=skip
+    )
+
+
+def find_upload(db: Session, file_id: str, media_type: Optional[str] = None) -> Optional[Upload]:
+    """Latest upload handed out under file_id"""
+    query = db.query(Upload).filter(Upload.file_id == file_id)
+    if media_type:
+        query = query.filter(Upload.media_type == media_type)
+    return query.order_by(Upload.id.desc()).first()
+
+
+def delete_upload(db: Session, upload: Upload) -> bool:
+    """
+    Delete one upload and its registration links
+    Returns True if the stored file itself was removed
+    """
+    db.query(RegistrationAttachment).filter(
+        RegistrationAttachment.upload_id == upload.id
+    ).delete(synchronize_session=False)
+    db.delete(upload)
+
+    same_content = db.query(Upload.id).filter(
+        Upload.sha256 == upload.sha256, Upload.id != upload.id
+    ).first()
+    if not same_content:
+        db.query(PhotoHash).filter(PhotoHash.sha256 == upload.sha256).delete(synchronize_session=False)
+
+    blob = db.get(UploadBlob, upload.sha256) if upload.path.startswith(f"{BLOB_DIR}/") else None
+    if blob is not None:
+        return release_blob(db, blob)
+
+    # Files from before the store are not shared through a blob
+    shared = db.query(Upload.id).filter(
+        Upload.path == upload.path, Upload.id != upload.id
+    ).first()
+    db.commit()
+    if not same_content:
+        remove_derivatives(upload.sha256)
+    if shared:
+        return False
+    remove_file(os.path.join(settings.UPLOAD_DIR, *upload.path.split("/")))
+    return True
+
+
+def _split_ids(ids: Optional[str]) -> List[str]:
+    return [file_id.strip() for file_id in (ids or "").split(",") if file_id.strip()]
+
+
+def attach_to_registration(
+    db: Session,
+    pending_user_id: int,
+    photo_ids: Optional[str] = None,
+    audio_oath_id: Optional[str] = None
+) -> int:
+    """
+    Link the files a registration was submitted with and mark it as their owner
+    Ids that match no upload are ignored. Caller commits. Returns links created.
+    """
+    wanted = [(file_id, "photo", position) for position, file_id in enumerate(_split_ids(photo_ids))]
+    wanted += [(file_id, "audio_oath", 0) for file_id in _split_ids(audio_oath_id)]
+    if not wanted:
+        return 0
+
+    # One query for every id; an unowned upload is preferred over one already claimed
+    candidates = {}
+    for upload in db.query(Upload).filter(
+        Upload.file_id.in_({file_id for file_id, _, _ in wanted})
+    ).order_by(Upload.owner_id.isnot(None), Upload.id.desc()):
+        candidates.setdefault(upload.file_id, []).append(upload)
+
+    links = []
+    linked = set()
+    for file_id, kind, position in wanted:
+        uploads = [u for u in candidates.get(file_id, []) if u.id not in linked]
+        if not uploads:
+            continue
+        upload = uploads[0]
+        linked.add(upload.id)
+        upload.owner_id = pending_user_id
+        links.append({
+            "pending_user_id": pending_user_id,
+            "upload_id": upload.id,
+            "kind": kind,
+            "position": position
+        })
+
+    if links:
+        db.execute(RegistrationAttachment.__table__.insert(), links)
+    return len(links)
+
+
+def detach_registrations(db: Session, pending_user_ids: List[int]):
+    """
+    Unlink the files of registrations about to be deleted. Caller commits.
+    The uploads are orphaned and collected after the grace period (see upload_gc_service).
+    """
+    db.query(RegistrationAttachment).filter(
+        RegistrationAttachment.pending_user_id.in_(pending_user_ids)
+    ).delete(synchronize_session=False)
+    db.query(Upload).filter(
+        Upload.owner_id.in_(pending_user_ids)
+    ).update({"owner_id": None}, synchronize_session=False)
+
+
+def get_registration_attachments(db: Session, pending_user_id: int) -> List[Tuple[RegistrationAttachment, Upload]]:
+    """Files submitted with a registration, photos in order then the audio oath"""
+    return db.query(RegistrationAttachment, Upload).join(
+        Upload, Upload.id == RegistrationAttachment.upload_id
+    ).filter(
+        RegistrationAttachment.pending_user_id == pending_user_id
+    ).order_by(RegistrationAttachment.kind.desc(), RegistrationAttachment.position).all()
+
+
+# Directories that held uploads before the content-addressed store, by media type
+LEGACY_DIRS = {"photo": "photos", "audio": "audio"}
+
+
+def hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(settings.UPLOAD_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def backfill_uploads(db: Session) -> Tuple[int, int]:
+    """
+    Record files that predate the uploads table and link existing registrations to them
+    Files are not moved. Safe to run more than once. Returns (uploads added, links added).
+    """
+    known = {path for (path,) in db.query(Upload.path)}
+    rows = []
+
+    for media_type, directory in LEGACY_DIRS.items():
+        root = os.path.join(settings.UPLOAD_DIR, directory)
+        if not os.path.isdir(root):
+            continue
+        for filename in os.listdir(root):
+            full_path = os.path.join(root, filename)
+            relpath = f"{directory}/{filename}"
+            if relpath in known or not os.path.isfile(full_path) or filename.endswith(".part"):
+                continue
+            stat = os.stat(full_path)
+            rows.append({
+                "file_id": filename,
+                "path": relpath,
+                "media_type": media_type,
+                "content_type": None,
+                "size_bytes": stat.st_size,
+                "sha256": hash_file(full_path),
+                "original_filename": None,
+                "created_at": datetime.utcfromtimestamp(stat.st_mtime)
+            })
+
+    # Blobs stored before uploads were recorded: one row per missing reference
+    recorded = dict(db.query(Upload.sha256, func.count(Upload.id)).filter(
+        Upload.path.startswith(f"{BLOB_DIR}/")
+    ).group_by(Upload.sha256).all())
+    for blob in db.query(UploadBlob):
+        for _ in range(blob.ref_count - recorded.get(blob.sha256, 0)):
+            rows.append({
+                "file_id": blob_file_id(blob),
+                "path": blob_relpath(blob.sha256, blob.extension),
+                "media_type": blob.media_type,
+                "content_type": blob.content_type,
+                "size_bytes": blob.size_bytes,
+                "sha256": blob.sha256,
+                "original_filename": None,
+                "created_at": blob.created_at
+            })
+
+    if rows:
+        db.execute(Upload.__table__.insert(), rows)
+
+    linked = db.query(RegistrationAttachment.pending_user_id).distinct()
+    pending_users = db.query(PendingUser).filter(
+        or_(PendingUser.photo_ids.isnot(None), PendingUser.audio_oath_id.isnot(None)),
+        PendingUser.id.notin_(linked)
+    ).all()
+    links = sum(
+        attach_to_registration(db, user.id, user.photo_ids, user.audio_oath_id)
+        for user in pending_users
+    )
+
+    db.commit()
+    return len(rows), links
+
+
+def backfill_derivatives(db: Session, processor: ImageProcessor = image_processor, batch_size: int = 100) -> Tuple[int, int]:
+    """
+    Render missing derivatives for every recorded photo, in parallel across the pool
+    Returns (photos rendered, photos that failed)
+    """
+    sources = {}
+    for sha256, path in db.query(Upload.sha256, Upload.path).filter(
+        Upload.media_type == "photo"
+    ).order_by(Upload.id):
+        sources.setdefault(sha256, path)
+
+    missing = [
+        (os.path.join(settings.UPLOAD_DIR, *path.split("/")), derivative_targets(sha256))
+        for sha256, path in sources.items()
+        if not derivatives_exist(sha256)
+    ]
+
+    rendered = failed = 0
+    for start in range(0, len(missing), batch_size):
+        for (source_path, _), result in processor.run_many(render_derivatives, missing[start:start + batch_size]):
+            if isinstance(result, Exception):
+                print(f"Warning: Could not render derivatives for {source_path}: {result}")
+                failed += 1
+            else:
+                rendered += 1
+    return rendered, failed
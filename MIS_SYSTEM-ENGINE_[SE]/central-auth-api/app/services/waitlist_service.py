@@ -7,11 +7,17 @@ Handles waitlist/interest request operations including:
 - Sending invitation codes to approved users
 """
 
+from sqlalchemy import func, update
 from sqlalchemy.orm import Session
-from typing import List, Optional
-from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+from datetime import datetime, timedelta
 
+from starlette.concurrency import run_in_threadpool
+
+from app.core import jobs
+from app.core.background import with_session
 from app.models.waitlist import WaitlistRequest, WaitlistStatus
+from app.utils.pagination import Page, apply_date_range, keyset_paginate
 from app.services import invitation_service, notification_service
 
 
@@ -64,11 +70,10 @@ async def submit_interest(
     )
     
     db.add(waitlist_request)
-    db.commit()
-    db.refresh(waitlist_request)
     
     # Notify admin about new request
-    await notification_service.send_admin_notification(
+    notification_service.queue_admin_notification(
+        db,
         subject="New Waitlist Request",
         message=f"""
 A new user has submitted an interest request:
@@ -83,37 +88,49 @@ Please log in to the admin panel to review and approve/reject this request.
         """
     )
     
+    db.commit()
+    db.refresh(waitlist_request)
+    
     return waitlist_request
 
 
 def get_pending_requests(
     db: Session,
     skip: int = 0,
-    limit: int = 100
-) -> List[WaitlistRequest]:
-    """Get all pending waitlist requests"""
-    return db.query(WaitlistRequest).filter(
-        WaitlistRequest.status == WaitlistStatus.PENDING
-    ).order_by(
-        WaitlistRequest.created_at.desc()
-    ).offset(skip).limit(limit).all()
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None
+) -> Page:
+    """Get all pending waitlist requests, newest first"""
+    return get_all_requests(
+        db, status=WaitlistStatus.PENDING, skip=skip, limit=limit,
+        cursor=cursor, start_date=start_date, end_date=end_date
+    )
 
 
 def get_all_requests(
     db: Session,
     status: Optional[WaitlistStatus] = None,
     skip: int = 0,
-    limit: int = 100
-) -> List[WaitlistRequest]:
-    """Get all waitlist requests, optionally filtered by status"""
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None
+) -> Page:
+    """Get all waitlist requests, optionally filtered by status and date, newest first"""
     query = db.query(WaitlistRequest)
     
     if status:
         query = query.filter(WaitlistRequest.status == status)
     
-    return query.order_by(
-        WaitlistRequest.created_at.desc()
-    ).offset(skip).limit(limit).all()
+    query = apply_date_range(query, WaitlistRequest.created_at, start_date, end_date)
+    
+    return keyset_paginate(
+        query, WaitlistRequest.created_at, WaitlistRequest.id,
+        count_key=("waitlist_requests", status, start_date, end_date),
+        cursor=cursor, limit=limit, skip=skip
+    )
 
 
 def get_request_by_id(db: Session, request_id: int) -> Optional[WaitlistRequest]:
@@ -130,6 +147,23 @@ def get_request_by_email(db: Session, email: str) -> Optional[WaitlistRequest]:
     ).first()
 
 
+def _claim_pending(db: Session, request_ids: List[int], **values) -> set:
+    """
+    Move requests that are still pending to a new status in one conditional UPDATE
+    Returns the ids claimed; the rest were reviewed concurrently by someone else
+    """
+    if not request_ids:
+        return set()
+    claimed = db.execute(
+        update(WaitlistRequest)
+        .where(WaitlistRequest.id.in_(request_ids), WaitlistRequest.status == WaitlistStatus.PENDING)
+        .values(**values)
+        .returning(WaitlistRequest.id)
+        .execution_options(synchronize_session=False)
+    )
+    return {request_id for (request_id,) in claimed}
+
+
 async def approve_request(
     db: Session,
     request_id: int,
@@ -166,8 +200,13 @@ async def approve_request(
     if waitlist_request.status != WaitlistStatus.PENDING:
         raise ValueError(f"Request has already been {waitlist_request.status.value}")
     
-    # Approve the request
-    waitlist_request.approve(admin_username, admin_notes)
+    # Approve the request, unless a concurrent review got there first
+    values = {"status": WaitlistStatus.APPROVED, "reviewed_by": admin_username}
+    if admin_notes:
+        values["admin_notes"] = admin_notes
+    if not _claim_pending(db, [request_id], **values):
+        db.rollback()
+        raise ValueError("Request has already been reviewed")
     
     # Create invitation
     invitation = invitation_service.create_invitation(
@@ -175,16 +214,16 @@ async def approve_request(
         created_by=admin_username,
         intended_for=waitlist_request.email,
         notes=f"Auto-generated for waitlist request #{request_id}",
-        expires_in_hours=expires_in_hours
+        expires_in_hours=expires_in_hours,
+        commit=False
     )
     
     # Link invitation to request
     waitlist_request.mark_invited(str(invitation.id))
     
-    db.commit()
-    
-    # Send invitation email to user
-    await send_invitation_notification(
+    # Queue invitation email to user
+    queue_invitation_notification(
+        db,
         email=waitlist_request.email,
         full_name=waitlist_request.full_name,
         phone=waitlist_request.phone,
@@ -193,6 +232,8 @@ async def approve_request(
         expires_at=invitation.expires_at
     )
     
+    db.commit()
+    
     return {
         "success": True,
         "request_id": request_id,
@@ -232,30 +273,172 @@ async def reject_request(
     if waitlist_request.status != WaitlistStatus.PENDING:
         raise ValueError(f"Request has already been {waitlist_request.status.value}")
     
-    # Reject the request
-    waitlist_request.reject(admin_username, reason)
-    db.commit()
+    # Reject the request, unless a concurrent review got there first
+    if not _claim_pending(
+        db, [request_id],
+        status=WaitlistStatus.REJECTED, reviewed_by=admin_username, rejection_reason=reason
+    ):
+        db.rollback()
+        raise ValueError("Request has already been reviewed")
     
     # Optionally notify user of rejection
-    await send_rejection_notification(
+    queue_rejection_notification(
+        db,
         email=waitlist_request.email,
         full_name=waitlist_request.full_name,
         reason=reason
     )
     
+    db.commit()
+    
     return True
 
 
-async def send_invitation_notification(
+def bulk_triage(
+    db: Session,
+    request_ids: Iterable[int],
+    action: str,
+    admin_username: str,
+    admin_notes: Optional[str] = None,
+    reason: Optional[str] = None,
+    expires_in_hours: int = 72
+) -> Tuple[List[dict], List[dict]]:
+    """
+    Approve or reject many waitlist requests in one transaction
+    
+    Requests are claimed with one conditional UPDATE, so a request reviewed
+    concurrently (here or by a single approve/reject) is reported as a
+    conflict rather than reviewed twice. Approvals get their invitations
+    minted in one batch and linked back with a single executemany update.
+    Emails are queued in the outbox.
+    
+    Returns:
+        One outcome per requested id
+    """
+    if action not in ("approve", "reject"):
+        raise ValueError("action must be 'approve' or 'reject'")
+    if action == "reject" and not reason:
+        raise ValueError("A reason is required to reject requests")
+    
+    ids = list(dict.fromkeys(request_ids))
+    requests = {
+        request.id: request
+        for request in db.query(WaitlistRequest).filter(WaitlistRequest.id.in_(ids))
+    }
+    
+    outcomes = {}
+    pending = []
+    for request_id in ids:
+        request = requests.get(request_id)
+        if request is None:
+            outcomes[request_id] = {"request_id": request_id, "status": "error", "detail": "Waitlist request not found"}
+        elif request.status != WaitlistStatus.PENDING:
+            outcomes[request_id] = {
+                "request_id": request_id, "status": "error",
+                "detail": f"Request has already been {request.status.value}"
+            }
+        else:
+            pending.append(request)
+    
+    if action == "approve":
+        values = {"reviewed_by": admin_username, "status": WaitlistStatus.INVITED}
+        if admin_notes:
+            values["admin_notes"] = admin_notes
+    else:
+        values = {"reviewed_by": admin_username, "status": WaitlistStatus.REJECTED, "rejection_reason": reason}
+    
+    claimed = _claim_pending(db, [request.id for request in pending], **values)
+    for request in pending:
+        if request.id not in claimed:
+            outcomes[request.id] = {
+                "request_id": request.id, "status": "error",
+                "detail": "Request was reviewed concurrently"
+            }
+    pending = [request for request in pending if request.id in claimed]
+    
+    if pending and action == "approve":
+        expires_at = datetime.utcnow() + timedelta(hours=expires_in_hours) if expires_in_hours > 0 else None
+        codes = invitation_service.reserve_invitation_codes(db, len(pending))
+        rows = [
+            {
+                "code": code,
+                "pin": invitation_service.generate_pin(),
+                "created_by": admin_username,
+                "intended_for": request.email,
+                "notes": f"Auto-generated for waitlist request #{request.id}",
+                "expires_at": expires_at
+            }
+            for code, request in zip(codes, pending)
+        ]
+        invitation_ids = invitation_service.insert_invitations(db, rows)
+        
+        # Bulk UPDATE by primary key of the rows claimed above: one executemany for the whole batch
+        db.execute(update(WaitlistRequest), [
+            {"id": request.id, "invitation_id": str(invitation_id)}
+            for request, invitation_id in zip(pending, invitation_ids)
+        ])
+        
+        for request, row, invitation_id in zip(pending, rows, invitation_ids):
+            outcomes[request.id] = {
+                "request_id": request.id,
+                "status": "invited",
+                "invitation_id": invitation_id
+            }
+            queue_invitation_notification(
+                db,
+                email=request.email,
+                full_name=request.full_name,
+                phone=request.phone,
+                invitation_code=row["code"],
+                pin=row["pin"],
+                expires_at=expires_at
+            )
+    
+    elif pending:
+        for request in pending:
+            outcomes[request.id] = {"request_id": request.id, "status": "rejected"}
+            queue_rejection_notification(
+                db,
+                email=request.email,
+                full_name=request.full_name,
+                reason=reason
+            )
+    
+    db.commit()
+    
+    return [outcomes[request_id] for request_id in ids]
+
+
+async def run_bulk_triage(job_id: str, **triage_args):
+    """
+    Background body of a bulk triage job
+    Does the database work off the event loop
+    """
+    await run_in_threadpool(with_session(lambda db: jobs.start_job(db, job_id)))
+    try:
+        results = await run_in_threadpool(
+            with_session(lambda db: bulk_triage(db, **triage_args))
+        )
+        emails_queued = sum(1 for result in results if result["status"] != "error")
+        await run_in_threadpool(
+            with_session(lambda db: jobs.finish_job(db, job_id, results, emails_queued))
+        )
+    except Exception as e:
+        print(f"Bulk triage job {job_id} failed: {e}")
+        await run_in_threadpool(with_session(lambda db: jobs.fail_job(db, job_id, str(e))))
+
+
+def queue_invitation_notification(
+    db: Session,
     email: str,
     full_name: str,
     phone: Optional[str],
     invitation_code: str,
     pin: str,
     expires_at: Optional[datetime]
-) -> bool:
+) -> None:
     """
-    Send invitation code to user via email (and SMS if phone provided)
+    Queue invitation code email to user (and SMS if phone provided)
     """
     from app.config import settings
     
@@ -291,23 +474,22 @@ Best regards,
 The SPACE Team
     """
     
-    # Send email
-    success = await notification_service.send_user_notification(email, subject, message)
+    # Queue email
+    notification_service.queue_user_notification(db, email, subject, message)
     
     # TODO: Implement SMS notification if phone provided
     # if phone:
     #     send_sms_notification(phone, f"Your SPACE invitation: Code: {invitation_code}, PIN: {pin}")
-    
-    return success
 
 
-async def send_rejection_notification(
+def queue_rejection_notification(
+    db: Session,
     email: str,
     full_name: str,
     reason: str
-) -> bool:
+) -> None:
     """
-    Notify user that their request was rejected
+    Queue email notifying user that their request was rejected
     """
     subject = "Update on Your SPACE Registration Request"
     message = f"""
@@ -327,29 +509,18 @@ Best regards,
 The SPACE Team
     """
     
-    return await notification_service.send_user_notification(email, subject, message)
+    notification_service.queue_user_notification(db, email, subject, message)
 
 
 def get_waitlist_stats(db: Session) -> dict:
     """Get waitlist statistics for admin dashboard"""
-    total = db.query(WaitlistRequest).count()
-    pending = db.query(WaitlistRequest).filter(
-        WaitlistRequest.status == WaitlistStatus.PENDING
-    ).count()
-    approved = db.query(WaitlistRequest).filter(
-        WaitlistRequest.status == WaitlistStatus.APPROVED
-    ).count()
-    invited = db.query(WaitlistRequest).filter(
-        WaitlistRequest.status == WaitlistStatus.INVITED
-    ).count()
-    rejected = db.query(WaitlistRequest).filter(
-        WaitlistRequest.status == WaitlistStatus.REJECTED
-    ).count()
+    counts = db.query(
+        WaitlistRequest.status, func.count(WaitlistRequest.id)
+    ).group_by(WaitlistRequest.status).all()
     
-    return {
-        "total": total,
-        "pending": pending,
-        "approved": approved,
-        "invited": invited,
-        "rejected": rejected
-    }
+    stats = {s.value: 0 for s in WaitlistStatus}
+    for status, count in counts:
+        stats[WaitlistStatus(status).value] = count
+    
+    stats["total"] = sum(stats.values())
+    return stats
@@ -0,0 +1,81 @@
+"""
+Multi-Index Hashing
+
+Finds every stored hash within a few bits of a query without comparing
+against all of them (Norouzi, Punjani and Fleet, "Fast Search in Hamming
+Space with Multi-Index Hashing").
+
+Each key is split into `chunks` substrings, each indexed in its own table.
+If two keys differ in at most r bits, some substring differs in at most
+r // chunks bits (pigeonhole). A search therefore looks up, in every table,
+the substrings within r // chunks bits of the query's and only checks the
+full distance of the keys found there. With 64-bit keys in four 16-bit
+chunks and r = 10 that is 4 x 137 lookups, each hitting about n / 65536
+keys.
+"""
+from functools import lru_cache
+from itertools import combinations
+from typing import Dict, Generic, List, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+def hamming(a: int, b: int) -> int:
+    """Number of differing bits"""
+    return bin(a ^ b).count("1")
+
+
+@lru_cache(maxsize=None)
+def _flips(width: int, radius: int) -> Tuple[int, ...]:
+    """Every mask of at most radius set bits within width bits"""
+    return tuple(
+        sum(1 << bit for bit in bits)
+        for count in range(min(radius, width) + 1)
+        for bits in combinations(range(width), count)
+    )
+
+
+class MultiIndexHash(Generic[T]):
+    def __init__(self, bits: int = 64, chunks: int = 4):
+        # (shift, width) of each substring; widths differ by at most one bit
+        self._spans = []
+        shift = 0
+        for i in range(chunks):
+            width = bits // chunks + (1 if i < bits % chunks else 0)
+            self._spans.append((shift, width))
+            shift += width
+        # One table per substring: substring value -> keys
+        self._tables: List[Dict[int, List[int]]] = [{} for _ in self._spans]
+        self._values: Dict[int, List[T]] = {}
+        self.size = 0
+
+    def add(self, key: int, value: T):
+        self.size += 1
+        values = self._values.get(key)
+        if values is not None:
+            values.append(value)
+            return
+
+        self._values[key] = [value]
+        for table, (shift, width) in zip(self._tables, self._spans):
+            table.setdefault((key >> shift) & ((1 << width) - 1), []).append(key)
+
+    def search(self, key: int, max_distance: int) -> List[Tuple[int, T]]:
+        """(distance, value) for every entry within max_distance of key, closest first"""
+        radius = max_distance // len(self._spans)
+        checked = set()
+        found = []
+
+        for table, (shift, width) in zip(self._tables, self._spans):
+            chunk = (key >> shift) & ((1 << width) - 1)
+            for flip in _flips(width, radius):
+                for candidate in table.get(chunk ^ flip, ()):
+                    if candidate in checked:
+                        continue
+                    checked.add(candidate)
+                    distance = hamming(key, candidate)
+                    if distance <= max_distance:
+                        found.extend((distance, value) for value in self._values[candidate])
+
+        found.sort(key=lambda match: match[0])
+        return found
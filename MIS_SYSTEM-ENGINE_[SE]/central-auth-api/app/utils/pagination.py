@@ -0,0 +1,161 @@
+"""
+Keyset Pagination
+
+List endpoints page on (timestamp, id) instead of OFFSET, so deep pages cost
+the same as the first one. The position of the last row is handed back to
+the client as an opaque cursor in the X-Next-Cursor header, and the total
+row count, cached for TOTAL_COUNT_CACHE_SECONDS, in X-Total-Count.
+
+`skip` is still honoured when no cursor is given so older clients keep
+working.
+
+SQLite keeps DATETIME values as text and compares them as strings. Rows
+written by SQLAlchemy carry microseconds ("2024-01-01 10:00:00.000000"),
+older rows and server defaults do not ("2024-01-01 10:00:00"), so on SQLite
+the cursor holds the sort value exactly as stored and is compared as text.
+"""
+import base64
+import json
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+from fastapi import Response
+from sqlalchemy import String, literal, tuple_, type_coerce
+
+from app.config import settings
+
+
+class Page:
+    def __init__(self, items: List, next_cursor: Optional[str], total: int):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.total = total
+
+
+def encode_cursor(sort_value: datetime, row_id: int, stored: Optional[str] = None) -> str:
+    """Opaque cursor pointing just past the given row, optionally with the sort value as stored"""
+    position = [sort_value.isoformat(), row_id]
+    if stored is not None:
+        position.append(stored)
+    raw = json.dumps(position).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int, Optional[str]]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded))
+        sort_value, row_id = position[:2]
+        stored = position[2] if len(position) > 2 else None
+        if stored is not None and not isinstance(stored, str):
+            raise ValueError("Invalid cursor")
+        return datetime.fromisoformat(sort_value), int(row_id), stored
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+class CountCache:
+    """Short-lived cache of total row counts, keyed by table and filters"""
+
+    def __init__(self, ttl_seconds: int = 30, max_entries: int = 1000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._counts: Dict[Hashable, Tuple[float, int]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, compute: Callable[[], int]) -> int:
+        now = time.monotonic()
+        with self._lock:
+            cached = self._counts.get(key)
+        if cached and now - cached[0] < self.ttl_seconds:
+            return cached[1]
+
+        count = compute()
+        with self._lock:
+            if len(self._counts) >= self.max_entries:
+                # Forget expired filter combinations before growing further
+                self._counts = {
+                    k: v for k, v in self._counts.items()
+                    if now - v[0] < self.ttl_seconds
+                }
+            self._counts[key] = (now, count)
+        return count
+
+    def clear(self):
+        with self._lock:
+            self._counts = {}
+
+
+total_count_cache = CountCache(ttl_seconds=settings.TOTAL_COUNT_CACHE_SECONDS)
+
+
+def apply_date_range(query, column, start: Optional[datetime] = None, end: Optional[datetime] = None):
+    """Restrict a query to start <= column < end"""
+    if start:
+        query = query.filter(column >= start)
+    if end:
+        query = query.filter(column < end)
+    return query
+
+
+def keyset_paginate(
+    query,
+    sort_column,
+    id_column,
+    count_key: Hashable,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    skip: int = 0,
+    descending: bool = True
+) -> Page:
+    """
+    Fetch one page of an already-filtered query ordered by (sort_column, id)
+
+    Raises ValueError for a malformed cursor.
+    """
+    total = total_count_cache.get(count_key, lambda: query.order_by(None).count())
+
+    # On SQLite the sort value is compared as the text it is stored as
+    as_text = query.session.get_bind().dialect.name == "sqlite"
+    sort_key = type_coerce(sort_column, String) if as_text else sort_column
+    position = tuple_(sort_key, id_column)
+
+    if cursor:
+        sort_value, row_id, stored = decode_cursor(cursor)
+        if as_text and stored is not None:
+            bound = literal(stored, String)
+        else:
+            bound = literal(sort_value, sort_column.type)
+        after = tuple_(bound, literal(row_id, id_column.type))
+        query = query.filter(position < after if descending else position > after)
+    elif skip:
+        # Legacy offset paging
+        query = query.offset(skip)
+
+    if descending:
+        query = query.order_by(sort_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(sort_column.asc(), id_column.asc())
+
+    # One extra row tells us whether there is another page
+    rows = query.limit(limit + 1).all()
+    items = rows[:limit]
+
+    next_cursor = None
+    if len(rows) > limit:
+        last = items[-1]
+        last_id = getattr(last, id_column.key)
+        stored = None
+        if as_text:
+            stored = query.session.query(sort_key).filter(id_column == last_id).scalar()
+        next_cursor = encode_cursor(getattr(last, sort_column.key), last_id, stored)
+
+    return Page(items, next_cursor, total)
+
+
+def set_page_headers(response: Response, page: Page):
+    response.headers["X-Total-Count"] = str(page.total)
+    if page.next_cursor:
+        response.headers["X-Next-Cursor"] = page.next_cursor
@@ -0,0 +1,30 @@
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+
+def insert_for(db: Session):
+    """
+    Dialect-specific insert() that supports on_conflict_do_update
+    The app runs on SQLite by default and on PostgreSQL when DATABASE_URL points at it
+    """
+    dialect = db.get_bind().dialect.name
+
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"Upsert is not supported on {dialect}")
+
+    return insert
+
+
+def lock_for_rebuild(db: Session, *tables):
+    """
+    Block concurrent writes to tables until the transaction ends, for rebuilds
+    On PostgreSQL this takes a table lock; on SQLite the rebuild's first write
+    already holds the database write lock, so it must write before it reads.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        for table in tables:
+            db.execute(text(f"LOCK TABLE {table.name} IN SHARE ROW EXCLUSIVE MODE"))
@@ -0,0 +1,30 @@
+import sys
+sys.path.append('.')
+
+from app.database import SessionLocal
+from app.core.images import image_processor
+from app.services.upload_service import backfill_derivatives
+
+def backfill():
+    """
+    Render thumbnail and medium derivatives for photos uploaded before the
+    derivative pipeline existed. Photos that already have them are skipped.
+    Run scripts/backfill_uploads.py first so older files are recorded.
+    """
+    print("🖼️  Rendering missing photo derivatives...")
+    
+    db = SessionLocal()
+    
+    try:
+        rendered, failed = backfill_derivatives(db)
+        print(f"✅ Rendered derivatives for {rendered} photo(s)")
+        if failed:
+            print(f"⚠️  {failed} photo(s) could not be read")
+    except Exception as e:
+        print(f"❌ Backfill failed: {str(e)}")
+    finally:
+        image_processor.shutdown()
+        db.close()
+
+if __name__ == "__main__":
+    backfill()
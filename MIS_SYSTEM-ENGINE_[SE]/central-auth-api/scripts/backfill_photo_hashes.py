@@ -0,0 +1,30 @@
+import sys
+sys.path.append('.')
+
+from app.database import SessionLocal
+from app.core.images import image_processor
+from app.services.photo_similarity_service import backfill_photo_hashes
+
+def backfill():
+    """
+    Compute duplicate-detection hashes (dHash) for photos uploaded before
+    they were hashed on upload. Photos that already have one are skipped.
+    Run scripts/backfill_uploads.py first so older files are recorded.
+    """
+    print("🔍 Hashing photos for duplicate detection...")
+    
+    db = SessionLocal()
+    
+    try:
+        hashed, failed = backfill_photo_hashes(db)
+        print(f"✅ Hashed {hashed} photo(s)")
+        if failed:
+            print(f"⚠️  {failed} photo(s) could not be read")
+    except Exception as e:
+        print(f"❌ Backfill failed: {str(e)}")
+    finally:
+        image_processor.shutdown()
+        db.close()
+
+if __name__ == "__main__":
+    backfill()
@@ -0,0 +1,29 @@
+import sys
+sys.path.append('.')
+
+from app.database import SessionLocal
+from app.services.upload_service import backfill_uploads
+
+def backfill():
+    """
+    Record uploads that predate the uploads table (files in uploads/photos and
+    uploads/audio, and blobs already in the store) and link existing
+    registrations to their photos and audio oath. Files are left where they are.
+    Safe to run more than once.
+    """
+    print("🔁 Backfilling upload records...")
+    
+    db = SessionLocal()
+    
+    try:
+        uploads, links = backfill_uploads(db)
+        print(f"✅ Recorded {uploads} upload(s)")
+        print(f"✅ Linked {links} registration attachment(s)")
+    except Exception as e:
+        print(f"❌ Backfill failed: {str(e)}")
+        db.rollback()
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    backfill()
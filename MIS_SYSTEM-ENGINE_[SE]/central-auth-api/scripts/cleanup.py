@@ -1,18 +1,20 @@
 import sys
 import os
-from datetime import datetime, timedelta
+from datetime import datetime
 
 # Add parent directory to path to import app modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from app.config import settings
 from app.database import SessionLocal
-from app.models.qr_session import QRSession
-from app.models.login_history import LoginHistory
+from app.services.retention_service import retention_engine
+from app.services.upload_gc_service import collect_orphaned_uploads
 
 def cleanup_expired_data():
     """
     Cleanup task to remove old data and keep database size manageable.
-    Should be run via cron job (e.g., daily).
+    Applies the same retention policies the API runs in the background,
+    for deployments that prefer a cron job (e.g., daily).
     """
     db = SessionLocal()
     now = datetime.utcnow()
@@ -20,28 +22,22 @@ def cleanup_expired_data():
     print(f"🧹 Starting cleanup at {now}")
     
     try:
-        # 1. Delete expired QR sessions
-        # Delete sessions that expired more than 1 hour ago
-        # We keep them briefly for debugging/logs if needed
-        qr_expiry_threshold = now - timedelta(hours=1)
+        results = retention_engine.run(db)
+        metrics = retention_engine.metrics()
         
-        deleted_qr = db.query(QRSession).filter(
-            QRSession.expires_at < qr_expiry_threshold
-        ).delete()
+        for table, deleted in results.items():
+            stats = metrics[table]
+            print(f"   - {table}: removed {deleted} rows "
+                  f"in {stats['last_run_batches']} batches "
+                  f"(max batch {stats['max_batch_ms']} ms, backlog {stats['backlog']})")
+            if stats["last_error"]:
+                print(f"     ❌ {stats['last_error']}")
         
-        print(f"   - Deleted {deleted_qr} expired QR sessions")
+        if settings.UPLOAD_ORPHAN_GRACE_HOURS:
+            report = collect_orphaned_uploads(db)
+            print(f"   - uploads: removed {report['uploads_deleted']} orphaned uploads "
+                  f"and {report['files_deleted']} files ({report['bytes_reclaimed']} bytes reclaimed)")
         
-        # 2. Delete old login history
-        # Keep history for 90 days for audit purposes
-        history_expiry_threshold = now - timedelta(days=90)
-        
-        deleted_history = db.query(LoginHistory).filter(
-            LoginHistory.login_at < history_expiry_threshold
-        ).delete()
-        
-        print(f"   - Deleted {deleted_history} old login history records (> 90 days)")
-        
-        db.commit()
         print("✅ Cleanup completed successfully")
         
     except Exception as e:
@@ -16,7 +16,21 @@ def init_database():
         print("  - admins")
         print("  - registered_services")
         print("  - qr_sessions")
+        print("  - active_sessions")
         print("  - login_history")
+        print("  - user_login_rollups")
+        print("  - user_service_login_rollups")
+        print("  - service_login_hourly")
+        print("  - service_login_daily")
+        print("  - email_outbox")
+        print("  - admin_notification_events")
+        print("  - upload_blobs")
+        print("  - uploads")
+        print("  - registration_attachments")
+        print("  - resumable_uploads")
+        print("  - photo_hashes")
+        print("  - job_leases")
+        print("  - bulk_jobs")
         
     except Exception as e:
         print(f"❌ Error creating tables: {e}")
@@ -0,0 +1,31 @@
+import sys
+sys.path.append('.')
+
+from app.database import SessionLocal
+from app.services.rollup_service import rebuild_login_rollups
+from app.services.analytics_service import rebuild_login_buckets
+
+def rebuild():
+    """
+    Recompute per-user and per-service login rollups and the analytics
+    buckets from login history, active sessions and the login history archive.
+    Run after restoring a backup or if the rollups are suspected to be off.
+    """
+    print("🔁 Rebuilding login rollups...")
+    
+    db = SessionLocal()
+    
+    try:
+        users = rebuild_login_rollups(db)
+        print(f"✅ Rebuilt login rollups for {users} user(s)")
+        
+        logins = rebuild_login_buckets(db)
+        print(f"✅ Rebuilt login analytics buckets from {logins} login(s)")
+    except Exception as e:
+        print(f"❌ Rebuild failed: {str(e)}")
+        db.rollback()
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    rebuild()
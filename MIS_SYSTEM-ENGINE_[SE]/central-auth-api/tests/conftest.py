@@ -3,7 +3,11 @@ from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from app.main import app
-from app.database import Base, get_db
+from app.database import Base, get_db, SessionLocal
+from app.core.service_registry import service_registry
+from app.utils.pagination import total_count_cache
+from app.services.dashboard_service import dashboard_snapshot
+from app.services.photo_similarity_service import photo_index
 
 SQLALCHEMY_TEST_DATABASE_URL = "sqlite:///./test.db"
 
@@ -13,9 +17,17 @@ engine = create_engine(
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Point sessions opened outside request handlers (startup, background jobs)
+# at the test database as well
+SessionLocal.configure(bind=engine)
+
 @pytest.fixture(scope="function")
 def db():
     Base.metadata.create_all(bind=engine)
+    service_registry.invalidate()
+    total_count_cache.clear()
+    dashboard_snapshot.invalidate()
+    photo_index.clear()
     db = TestingSessionLocal()
     try:
         yield db
@@ -23,6 +35,11 @@ def db():
         db.close()
         Base.metadata.drop_all(bind=engine)
 
+@pytest.fixture(scope="function")
+def session_factory(db):
+    """Factory for extra sessions on the test database (e.g. one per thread)"""
+    return TestingSessionLocal
+
 @pytest.fixture(scope="function")
 def client(db):
     def override_get_db():
@@ -43,3 +60,18 @@ def mock_system_open():
     with patch("app.routes.registration.is_system_open", return_value=True), \
          patch("app.routes.auth.is_system_open", return_value=True):
         yield
+
+@pytest.fixture(scope="function", autouse=True)
+def reset_rate_limiters():
+    # Limiters are module-level, so request counts would leak between tests
+    from app.middleware import rate_limiter
+    from app.routes import invitation, waitlist
+    for limiter in (
+        rate_limiter.login_rate_limiter,
+        rate_limiter.register_rate_limiter,
+        rate_limiter.qr_rate_limiter,
+        invitation.invitation_rate_limiter,
+        waitlist.interest_rate_limiter,
+    ):
+        limiter.requests.clear()
+    yield
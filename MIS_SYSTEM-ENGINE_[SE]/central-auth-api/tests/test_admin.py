@@ -1,3 +1,4 @@
+import json
 import pytest
 from fastapi import status
 from app.models.admin import Admin
@@ -54,3 +55,647 @@ def test_get_pending_users_authorized(client, test_admin):
     )
     assert response.status_code == status.HTTP_200_OK
     assert isinstance(response.json(), list)
+
+def _admin_headers(client):
+    token = client.post("/api/admin/login", json={
+        "username": "admin_test",
+        "password": "adminpass"
+    }).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+def test_active_sessions_and_user_stats(client, db, test_admin):
+    from datetime import datetime, timedelta
+    from app.models.active_user import ActiveUser
+    from app.models.registered_service import RegisteredService
+    from app.models.active_session import ActiveSession
+    from app.models.login_history import LoginHistory
+
+    user = ActiveUser(
+        email="stats@test.com", username="statsuser", full_name="Stats User",
+        hashed_password=hash_password("pass"), auth_key="stats-key", is_active=True
+    )
+    service_a = RegisteredService(service_name="A", service_url="http://a.com", api_key="key-a")
+    service_b = RegisteredService(service_name="B", service_url="http://b.com", api_key="key-b")
+    db.add_all([user, service_a, service_b])
+    db.commit()
+
+    now = datetime.utcnow()
+    db.add(LoginHistory(
+        user_id=user.id, service_id=service_a.id, session_token="old",
+        login_at=now - timedelta(days=1), session_expires_at=now - timedelta(days=1)
+    ))
+    db.add(ActiveSession(
+        user_id=user.id, service_id=service_b.id, session_token="live",
+        login_at=now, session_expires_at=now + timedelta(minutes=30)
+    ))
+    db.commit()
+
+    # Rows inserted directly bypass the write-behind, so build their rollups
+    from app.services.rollup_service import rebuild_login_rollups
+    rebuild_login_rollups(db, include_archive=False)
+
+    headers = _admin_headers(client)
+
+    response = client.get("/api/admin/active-sessions", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert [s["service_id"] for s in response.json()] == [service_b.id]
+
+    stats = client.get(f"/api/admin/user-stats/{user.id}", headers=headers).json()
+    assert stats["total_logins"] == 2
+    assert stats["services_used"] == 2
+
+def test_login_history_archived_in_chunks(client, db, test_admin, tmp_path, monkeypatch):
+    from datetime import datetime, timedelta
+    from app.config import settings
+    from app.models.login_history import LoginHistory
+    from app.services.archive_service import archive_login_history
+
+    monkeypatch.setattr(settings, "ARCHIVE_DIR", str(tmp_path))
+
+    now = datetime.utcnow()
+    for i, days_ago in enumerate((120, 120, 100, 1)):
+        login_at = now - timedelta(days=days_ago)
+        db.add(LoginHistory(
+            user_id=1, service_id=days_ago, session_token=f"token-{i}",
+            login_at=login_at, session_expires_at=login_at + timedelta(minutes=30)
+        ))
+    db.commit()
+
+    assert archive_login_history(db, older_than_days=90, chunk_size=2, pause_seconds=0) == 3
+    assert [r.service_id for r in db.query(LoginHistory).all()] == [1]
+    assert len(list(tmp_path.rglob("*.jsonl.gz"))) == 2
+
+    start = (now - timedelta(days=121)).date()
+    end = (now - timedelta(days=90)).date()
+    response = client.get(
+        "/api/admin/login-history/archive",
+        params={"start_date": str(start), "end_date": str(end), "service_id": 120},
+        headers=_admin_headers(client)
+    )
+    assert response.status_code == status.HTTP_200_OK
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert len(records) == 2
+    assert all(r["service_id"] == 120 for r in records)
+
+def test_archive_range_reads_only_existing_partitions(tmp_path):
+    from datetime import date, datetime, timedelta
+    from app.services.archive_service import iter_archived_login_history, write_partitions
+
+    rows = [
+        {"user_id": 1, "service_id": service_id, "login_at": datetime(2026, month, day)}
+        for service_id, (month, day) in enumerate(((1, 31), (2, 1), (3, 15)))
+    ]
+    write_partitions(rows, str(tmp_path))
+
+    def services(start, end):
+        return [r["service_id"] for r in iter_archived_login_history(start, end, archive_dir=str(tmp_path))]
+
+    # A century-wide range is no slower than the partitions on disk
+    assert services(date(1950, 1, 1), date(2050, 12, 31)) == [0, 1, 2]
+    assert services(date(2026, 2, 1), date(2026, 3, 14)) == [1]
+    assert services(date(2026, 1, 31) - timedelta(days=1), date(2026, 1, 31)) == [0]
+
+def test_retention_engine_batches_and_metrics(client, db, test_admin, tmp_path, monkeypatch):
+    from datetime import datetime, timedelta
+    from app.config import settings
+    from app.models.qr_session import QRSession
+    from app.models.waitlist import WaitlistRequest, WaitlistStatus
+    from app.models.invitation import Invitation
+    from app.services.retention_service import retention_engine
+
+    monkeypatch.setattr(settings, "ARCHIVE_DIR", str(tmp_path))
+    monkeypatch.setattr(retention_engine, "batch_size", 2)
+    monkeypatch.setattr(retention_engine, "pause_seconds", 0)
+
+    now = datetime.utcnow()
+    long_ago = now - timedelta(days=60)
+    for i in range(5):
+        db.add(QRSession(token=f"old-{i}", service_id=1, expires_at=long_ago))
+    db.add(QRSession(token="fresh", service_id=1, expires_at=now + timedelta(minutes=2)))
+    db.add(WaitlistRequest(full_name="R", email="r@test.com", status=WaitlistStatus.REJECTED, updated_at=long_ago))
+    db.add(WaitlistRequest(full_name="P", email="p@test.com", status=WaitlistStatus.PENDING, updated_at=long_ago))
+    db.add(Invitation(code="INV-USED", pin="1234", is_used=True, used_at=long_ago))
+    db.add(Invitation(code="INV-OPEN", pin="1234", expires_at=now + timedelta(days=1)))
+    db.commit()
+
+    results = retention_engine.run(db)
+
+    assert results["qr_sessions"] == 5
+    assert results["waitlist_requests"] == 1
+    assert results["invitations"] == 1
+    assert [q.token for q in db.query(QRSession).all()] == ["fresh"]
+    assert [w.email for w in db.query(WaitlistRequest).all()] == ["p@test.com"]
+    assert [i.code for i in db.query(Invitation).all()] == ["INV-OPEN"]
+
+    response = client.get("/api/admin/retention/metrics", headers=_admin_headers(client))
+    assert response.status_code == status.HTTP_200_OK
+    qr_metrics = response.json()["qr_sessions"]
+    assert qr_metrics["last_run_deleted"] == 5
+    assert qr_metrics["last_run_batches"] == 3
+    assert qr_metrics["backlog"] == 0
+
+def test_retention_runs_in_one_worker_at_a_time(db):
+    from datetime import datetime, timedelta
+    from app.core.leases import acquire_lease, release_lease
+    from app.models.qr_session import QRSession
+    from app.services.retention_service import retention_engine
+
+    db.add(QRSession(token="old", service_id=1, expires_at=datetime.utcnow() - timedelta(days=60)))
+    db.commit()
+
+    # Another worker is mid-run
+    holder = acquire_lease(db, "retention", 600)
+    assert holder is not None
+    assert acquire_lease(db, "retention", 600) is None
+
+    assert retention_engine.run(db) == {}
+    assert db.query(QRSession).count() == 1
+
+    release_lease(db, "retention", holder)
+    assert retention_engine.run(db)["qr_sessions"] == 1
+    assert db.query(QRSession).count() == 0
+
+def test_login_history_keyset_pagination(client, db, test_admin):
+    from datetime import datetime, timedelta
+    from app.models.login_history import LoginHistory
+
+    # Several rows share a login_at so pages must tie-break on id
+    now = datetime.utcnow()
+    for i in range(7):
+        login_at = now - timedelta(minutes=i // 3)
+        db.add(LoginHistory(
+            user_id=1, service_id=1, session_token=f"page-{i}",
+            login_at=login_at, session_expires_at=login_at + timedelta(minutes=30)
+        ))
+    db.add(LoginHistory(
+        user_id=1, service_id=1, session_token="too-old",
+        login_at=now - timedelta(days=2), session_expires_at=now - timedelta(days=2)
+    ))
+    db.commit()
+
+    headers = _admin_headers(client)
+    params = {"limit": 3, "start_date": (now - timedelta(days=1)).isoformat()}
+    seen = []
+
+    while True:
+        response = client.get("/api/admin/login-history", params=params, headers=headers)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["X-Total-Count"] == "7"
+        seen.extend(r["session_token"] for r in response.json())
+        if "X-Next-Cursor" not in response.headers:
+            break
+        params["cursor"] = response.headers["X-Next-Cursor"]
+
+    assert sorted(seen) == sorted(f"page-{i}" for i in range(7))
+    assert len(seen) == len(set(seen))
+
+    response = client.get("/api/admin/login-history", params={"cursor": "not-a-cursor"}, headers=headers)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+def test_keyset_pages_mix_legacy_and_server_default_timestamps(db):
+    from datetime import datetime
+    from sqlalchemy import text
+    from app.models.active_user import ActiveUser
+    from app.models.login_history import LoginHistory
+    from app.services import admin_service
+
+    # Same second, stored as "... 10:00:00" (legacy, server default) and "... 10:00:00.000000" (SQLAlchemy)
+    second = datetime(2024, 1, 1, 10, 0, 0)
+    for i in range(3):
+        db.execute(text(
+            "INSERT INTO login_history (user_id, service_id, session_token, login_at, session_expires_at) "
+            "VALUES (1, 1, :token, '2024-01-01 10:00:00', '2024-01-01 10:30:00')"
+        ), {"token": f"legacy-{i}"})
+        db.add(LoginHistory(
+            user_id=1, service_id=1, session_token=f"orm-{i}", login_at=second, session_expires_at=second
+        ))
+        db.flush()
+        db.execute(text(
+            "INSERT INTO active_users (email, username, hashed_password, full_name, auth_key, is_active) "
+            "VALUES (:name || '@test.com', :name, 'x', 'Server Default', :name, 1)"
+        ), {"name": f"default-{i}"})
+        db.add(ActiveUser(
+            email=f"orm-{i}@test.com", username=f"orm-{i}", hashed_password="x",
+            full_name="ORM", auth_key=f"orm-{i}", created_at=datetime.utcnow().replace(microsecond=0)
+        ))
+        db.flush()
+    db.commit()
+
+    def walk(fetch):
+        seen, cursor = [], None
+        for _ in range(10):
+            page = fetch(cursor)
+            seen += [row.id for row in page.items]
+            cursor = page.next_cursor
+            if cursor is None:
+                return seen
+        raise AssertionError(f"pages never ended: {seen}")
+
+    history = walk(lambda cursor: admin_service.get_login_history(db, limit=2, cursor=cursor))
+    assert sorted(history) == sorted(h.id for h in db.query(LoginHistory))
+    assert len(history) == len(set(history)) == 6
+
+    users = walk(lambda cursor: admin_service.get_all_users(db, limit=2, cursor=cursor))
+    assert sorted(users) == sorted(u.id for u in db.query(ActiveUser))
+    assert len(users) == len(set(users)) == 6
+
+def test_dashboard_snapshot_with_etag(client, db, test_admin):
+    from app.models.pending_user import PendingUser
+    from app.models.waitlist import WaitlistRequest, WaitlistStatus
+    from app.services.dashboard_service import dashboard_snapshot
+
+    db.add(PendingUser(email="p@test.com", username="p", full_name="P", hashed_password="x"))
+    db.add(WaitlistRequest(full_name="W", email="w@test.com", status=WaitlistStatus.REJECTED))
+    db.commit()
+
+    headers = _admin_headers(client)
+    response = client.get("/api/admin/dashboard", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["pending_registrations"] == 1
+    assert data["waitlist"]["rejected"] == 1
+    assert data["waitlist"]["total"] == 1
+    etag = response.headers["ETag"]
+
+    # Unchanged numbers keep the same ETag across refreshes
+    dashboard_snapshot.refresh(db)
+    response = client.get("/api/admin/dashboard", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    db.add(PendingUser(email="q@test.com", username="q", full_name="Q", hashed_password="x"))
+    db.commit()
+    dashboard_snapshot.refresh(db)
+    response = client.get("/api/admin/dashboard", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["pending_registrations"] == 2
+
+def test_login_analytics_buckets(client, db, test_admin, monkeypatch):
+    from datetime import datetime, timedelta
+    from app.models.login_bucket import ServiceLoginHourly, ServiceLoginDaily
+    from app.services import analytics_service
+    from app.services.retention_service import retention_engine
+
+    now = datetime.utcnow().replace(minute=30, second=0, microsecond=0)
+    old = now - timedelta(days=200)
+    sessions = [
+        {"user_id": 1, "service_id": 1, "login_at": now},
+        {"user_id": 2, "service_id": 1, "login_at": now + timedelta(minutes=5)},
+        {"user_id": 1, "service_id": 2, "login_at": now - timedelta(hours=3)},
+        {"user_id": 1, "service_id": 1, "login_at": old},
+    ]
+    analytics_service.record_logins(db, sessions[:2])
+    analytics_service.record_logins(db, sessions[2:])
+    db.commit()
+
+    headers = _admin_headers(client)
+    response = client.get("/api/admin/analytics/logins", headers=headers, params={
+        "start": (now - timedelta(days=1)).isoformat(),
+        "end": (now + timedelta(hours=1)).isoformat()
+    })
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["granularity"] == "hour"
+    by_service = {s["service_id"]: s for s in data["services"]}
+    assert by_service[1]["points"] == [{"bucket_start": now.replace(minute=0).isoformat(), "logins": 2}]
+    assert by_service[2]["total"] == 1
+
+    # Timezone-aware bounds are converted to UTC
+    response = client.get("/api/admin/analytics/logins", headers=headers, params={
+        "start": (now - timedelta(hours=1)).strftime("%Y-%m-%dT%H:%M:%S") + "+02:00",
+        "end": (now + timedelta(hours=1)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    })
+    assert response.status_code == status.HTTP_200_OK
+    by_service = {s["service_id"]: s for s in response.json()["services"]}
+    assert by_service[1]["total"] == 2
+    assert by_service[2]["total"] == 1
+
+    # Old hourly buckets are downsampled away; daily buckets keep the count
+    monkeypatch.setattr(retention_engine, "pause_seconds", 0)
+    retention_engine.run(db)
+    assert db.query(ServiceLoginHourly).filter(ServiceLoginHourly.bucket_start < now - timedelta(days=100)).count() == 0
+
+    response = client.get("/api/admin/analytics/logins", headers=headers, params={
+        "start": (old - timedelta(days=1)).isoformat(),
+        "end": (now + timedelta(days=1)).isoformat()
+    })
+    data = response.json()
+    assert data["granularity"] == "day"
+    assert sum(s["total"] for s in data["services"]) == 4
+    assert db.query(ServiceLoginDaily).count() == 3
+
+    response = client.get("/api/admin/analytics/logins", headers=headers, params={
+        "start": old.isoformat(), "end": now.isoformat(), "granularity": "hour"
+    })
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+def test_login_buckets_backfilled_from_existing_history(db):
+    from datetime import datetime, timedelta
+    from app.models.login_bucket import ServiceLoginDaily
+    from app.models.login_history import LoginHistory
+    from app.services import analytics_service
+
+    # History from before buckets existed, plus one login already counted live
+    now = datetime.utcnow()
+    for i in range(3):
+        db.add(LoginHistory(
+            user_id=1, service_id=1, session_token=f"old-{i}",
+            login_at=now - timedelta(days=i + 1), session_expires_at=now - timedelta(days=i + 1)
+        ))
+    db.add(LoginHistory(user_id=1, service_id=1, session_token="new", login_at=now, session_expires_at=now))
+    analytics_service.record_logins(db, [{"service_id": 1, "login_at": now}])
+    db.commit()
+
+    assert analytics_service.backfill_login_buckets(db) == 4
+    assert sum(b.login_count for b in db.query(ServiceLoginDaily)) == 4
+    assert analytics_service.backfill_login_buckets(db) is None
+
+def test_streaming_exports(client, db, test_admin, tmp_path, monkeypatch):
+    import csv
+    import gzip
+    import io
+    from datetime import datetime, timedelta
+    from app.config import settings
+    from app.models.active_session import ActiveSession
+    from app.models.login_history import LoginHistory
+    from app.services.archive_service import archive_login_history
+    from app.services.export_service import stream_export
+
+    monkeypatch.setattr(settings, "ARCHIVE_DIR", str(tmp_path))
+
+    now = datetime.utcnow()
+    for i in range(5):
+        db.add(LoginHistory(
+            user_id=1, service_id=1, session_token=f"secret-{i}",
+            login_at=now - timedelta(days=i), session_expires_at=now
+        ))
+    for days_ago in (200, 150):
+        db.add(LoginHistory(
+            user_id=1, service_id=1, session_token=f"old-{days_ago}",
+            login_at=now - timedelta(days=days_ago), session_expires_at=now - timedelta(days=days_ago)
+        ))
+    db.add(ActiveSession(
+        user_id=1, service_id=1, session_token="live",
+        login_at=now, session_expires_at=now + timedelta(minutes=30)
+    ))
+    db.commit()
+    assert archive_login_history(db, older_than_days=90, pause_seconds=0) == 2
+
+    headers = _admin_headers(client)
+    response = client.get("/api/admin/export/login_history", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-disposition"].endswith('.csv.gz"')
+    rows = list(csv.DictReader(io.StringIO(gzip.decompress(response.content).decode("utf-8"))))
+    assert [row["source"] for row in rows] == ["archive"] * 2 + ["history"] * 5 + ["active"]
+    assert rows[0]["login_at"] < rows[1]["login_at"]
+    assert rows[-1]["logout_at"] == ""
+    assert "session_token" not in rows[0]
+
+    # The date range applies to archived rows too
+    body = b"".join(stream_export(
+        "login_history", "ndjson", start_date=now - timedelta(days=160), end_date=now - timedelta(days=100)
+    ))
+    records = [json.loads(line) for line in gzip.decompress(body).decode("utf-8").splitlines()]
+    assert [(r["source"], r["login_at"]) for r in records] == [
+        ("archive", (now - timedelta(days=150)).isoformat())
+    ]
+
+    response = client.get("/api/admin/export/active_users", headers=headers,
+                          params={"format": "ndjson", "compress": "false"})
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert records == []
+
+    response = client.get("/api/admin/export/admins", headers=headers)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    # Small batches still produce one continuous gzip stream (three ended sessions, one live)
+    body = b"".join(stream_export(
+        "login_history", "ndjson", start_date=now - timedelta(days=2, hours=1), batch_size=2
+    ))
+    assert len(gzip.decompress(body).decode("utf-8").splitlines()) == 4
+
+def test_bulk_approve_and_reject(client, db, test_admin):
+    from app.models.active_user import ActiveUser
+    from app.models.email_outbox import EmailOutbox
+    from app.models.pending_user import PendingUser
+
+    pending = []
+    for i in range(4):
+        user = PendingUser(
+            email=f"bulk{i}@example.com", username=f"bulk{i}",
+            hashed_password="x", full_name=f"Bulk {i}", is_reviewed=False
+        )
+        db.add(user)
+        pending.append(user)
+    db.add(ActiveUser(
+        email="bulk3@example.com", username="taken", hashed_password="x",
+        full_name="Taken", auth_key="taken-key"
+    ))
+    db.commit()
+    ids = [user.id for user in pending]
+
+    headers = _admin_headers(client)
+    response = client.post("/api/admin/bulk-approve", headers=headers, json={
+        "user_ids": [ids[0], ids[1], ids[3], 999, ids[0]],
+        "admin_notes": "Intake"
+    })
+    assert response.status_code == status.HTTP_200_OK
+    results = {r["user_id"]: r for r in response.json()}
+    assert [r["user_id"] for r in response.json()] == [ids[0], ids[1], ids[3], 999]
+    assert results[ids[0]]["status"] == "approved"
+    assert results[ids[0]]["active_user_id"]
+    assert results[ids[3]]["detail"] == "Email already registered and approved"
+    assert results[999]["detail"] == "Pending user not found"
+    queued = sorted(recipient for (recipient,) in db.query(EmailOutbox.recipient))
+    assert queued == ["bulk0@example.com", "bulk1@example.com"]
+
+    keys = {u.auth_key for u in db.query(ActiveUser).filter(ActiveUser.username.in_(["bulk0", "bulk1"]))}
+    assert len(keys) == 2
+
+    response = client.post("/api/admin/bulk-reject", headers=headers, json={
+        "user_ids": [ids[1], ids[2]],
+        "reason": "Incomplete"
+    })
+    results = {r["user_id"]: r for r in response.json()}
+    assert results[ids[1]]["detail"] == "User already reviewed"
+    assert results[ids[2]]["status"] == "rejected"
+    db.expire_all()
+    assert db.get(PendingUser, ids[2]).admin_notes == "Rejected: Incomplete"
+
+def test_bulk_approve_retries_per_id_after_a_race(client, db, session_factory, test_admin, monkeypatch):
+    from app.models.active_user import ActiveUser
+    from app.models.pending_user import PendingUser
+    from app.services import registration_service
+
+    pending = [
+        PendingUser(email=f"race{i}@example.com", username=f"race{i}", hashed_password="x",
+                    full_name=f"Race {i}", is_reviewed=False)
+        for i in range(3)
+    ]
+    db.add_all(pending)
+    db.commit()
+    ids = [user.id for user in pending]
+
+    # Another request approves race1's email between the checks and the insert
+    generate_auth_key = registration_service.generate_auth_key
+    def racing_generate_auth_key():
+        other = session_factory()
+        other.add(ActiveUser(email="race1@example.com", username="elsewhere", hashed_password="x",
+                             full_name="Elsewhere", auth_key="race-key"))
+        other.commit()
+        other.close()
+        monkeypatch.setattr(registration_service, "generate_auth_key", generate_auth_key)
+        return generate_auth_key()
+    monkeypatch.setattr(registration_service, "generate_auth_key", racing_generate_auth_key)
+
+    response = client.post("/api/admin/bulk-approve", headers=_admin_headers(client), json={"user_ids": ids})
+    assert response.status_code == status.HTTP_200_OK
+    assert [r["status"] for r in response.json()] == ["approved", "error", "approved"]
+    assert response.json()[1]["detail"] == "Email or username already registered"
+    db.expire_all()
+    assert [u.is_reviewed for u in db.query(PendingUser).order_by(PendingUser.id)] == [True, False, True]
+
+def test_bulk_reject_skips_registrations_reviewed_meanwhile(client, db, session_factory, test_admin, monkeypatch):
+    from app.models.pending_user import PendingUser
+    from app.services import registration_service
+
+    pending = [
+        PendingUser(email=f"reject{i}@example.com", username=f"reject{i}", hashed_password="x",
+                    full_name=f"Reject {i}", is_reviewed=False)
+        for i in range(3)
+    ]
+    db.add_all(pending)
+    db.commit()
+    ids = [user.id for user in pending]
+
+    # Another admin approves reject1 after the batch was loaded
+    load_for_review = registration_service._load_for_review
+    def racing_load_for_review(user_ids, db):
+        loaded = load_for_review(user_ids, db)
+        other = session_factory()
+        registration_service.approve_user(ids[1], None, other)
+        other.close()
+        return loaded
+    monkeypatch.setattr(registration_service, "_load_for_review", racing_load_for_review)
+
+    response = client.post("/api/admin/bulk-reject", headers=_admin_headers(client), json={"user_ids": ids, "reason": "Spam"})
+    assert response.status_code == status.HTTP_200_OK
+    assert [r["status"] for r in response.json()] == ["rejected", "error", "rejected"]
+    assert response.json()[1]["detail"] == "User already reviewed"
+    db.expire_all()
+    assert db.get(PendingUser, ids[1]).admin_notes == "Approved"
+
+def test_bulk_mint_invitations(client, db, test_admin, monkeypatch):
+    import csv
+    import io
+    from app.models.invitation import Invitation
+    from app.services import invitation_service
+
+    headers = _admin_headers(client)
+    response = client.post("/api/invitation/bulk", headers=headers, json={
+        "count": 250, "intended_for": "Spring intake"
+    })
+    assert response.status_code == status.HTTP_201_CREATED
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(rows) == 250
+    assert len({row["code"] for row in rows}) == 250
+    assert all(len(row["pin"]) == 4 for row in rows)
+    assert db.query(Invitation).filter(Invitation.created_by == "admin_test").count() == 250
+    stored = db.get(Invitation, int(rows[0]["id"]))
+    assert (stored.code, stored.pin) == (rows[0]["code"], rows[0]["pin"])
+
+    # Codes that already exist are replaced rather than failing the batch
+    taken = rows[0]["code"]
+    candidates = iter([taken, taken, "INV-NEW001", "INV-NEW002"])
+    monkeypatch.setattr(invitation_service, "generate_invitation_code", lambda: next(candidates))
+    minted = invitation_service.mint_invitations(db, count=2)
+    assert sorted(inv["code"] for inv in minted) == ["INV-NEW001", "INV-NEW002"]
+
+    assert client.post("/api/invitation/bulk", json={"count": 5}).status_code == status.HTTP_401_UNAUTHORIZED
+
+def test_bulk_waitlist_triage_job(client, db, test_admin):
+    from app.models.email_outbox import EmailOutbox
+    from app.models.invitation import Invitation
+    from app.models.waitlist import WaitlistRequest, WaitlistStatus
+
+    requests = [
+        WaitlistRequest(full_name=f"Person {i}", email=f"wait{i}@example.com")
+        for i in range(5)
+    ]
+    requests[4].status = WaitlistStatus.REJECTED
+    db.add_all(requests)
+    db.commit()
+    ids = [r.id for r in requests]
+
+    headers = _admin_headers(client)
+    response = client.post("/api/waitlist/bulk-triage", headers=headers, json={
+        "request_ids": [ids[0], ids[1], ids[2], ids[4]], "action": "approve"
+    })
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    job_id = response.json()["job_id"]
+
+    job = client.get(f"/api/waitlist/jobs/{job_id}", headers=headers).json()
+    assert job["status"] == "completed"
+    assert job["emails_queued"] == 3
+    outcomes = {r["request_id"]: r for r in job["results"]}
+    assert outcomes[ids[4]]["detail"] == "Request has already been rejected"
+
+    db.expire_all()
+    invited = db.get(WaitlistRequest, ids[0])
+    assert invited.status == WaitlistStatus.INVITED
+    invitation = db.get(Invitation, int(invited.invitation_id))
+    assert invitation.intended_for == "wait0@example.com"
+    assert invitation.id == outcomes[ids[0]]["invitation_id"]
+
+    response = client.post("/api/waitlist/bulk-triage", headers=headers, json={
+        "request_ids": [ids[3]], "action": "reject"
+    })
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    response = client.post("/api/waitlist/bulk-triage", headers=headers, json={
+        "request_ids": [ids[3]], "action": "reject", "reason": "Full"
+    })
+    job = client.get(f"/api/waitlist/jobs/{response.json()['job_id']}", headers=headers).json()
+    assert job["results"] == [{"request_id": ids[3], "status": "rejected"}]
+    assert db.query(EmailOutbox).count() == 4
+
+    assert client.get("/api/waitlist/jobs/missing", headers=headers).status_code == status.HTTP_404_NOT_FOUND
+
+def test_bulk_triage_reports_concurrent_reviews(client, db, session_factory, test_admin, monkeypatch):
+    from app.models.bulk_job import BulkJob
+    from app.models.invitation import Invitation
+    from app.models.waitlist import WaitlistRequest, WaitlistStatus
+    from app.services import waitlist_service
+
+    requests = [WaitlistRequest(full_name=f"Racer {i}", email=f"racer{i}@example.com") for i in range(2)]
+    db.add_all(requests)
+    db.commit()
+    ids = [r.id for r in requests]
+
+    # A single approve lands between the bulk job's read and its claim
+    claim_pending = waitlist_service._claim_pending
+    def racing_claim(session, request_ids, **values):
+        other = session_factory()
+        other.query(WaitlistRequest).filter(WaitlistRequest.id == ids[1]).update(
+            {"status": WaitlistStatus.INVITED, "invitation_id": "elsewhere"}
+        )
+        other.commit()
+        other.close()
+        return claim_pending(session, request_ids, **values)
+    monkeypatch.setattr(waitlist_service, "_claim_pending", racing_claim)
+
+    headers = _admin_headers(client)
+    response = client.post("/api/waitlist/bulk-triage", headers=headers, json={
+        "request_ids": ids, "action": "approve"
+    })
+    job_id = response.json()["job_id"]
+
+    job = client.get(f"/api/waitlist/jobs/{job_id}", headers=headers).json()
+    assert [r["status"] for r in job["results"]] == ["invited", "error"]
+    assert job["results"][1]["detail"] == "Request was reviewed concurrently"
+    assert db.query(Invitation).count() == 1
+    db.expire_all()
+    assert db.get(WaitlistRequest, ids[1]).invitation_id == "elsewhere"
+
+    # Jobs are stored, so any worker can answer the poll
+    assert db.get(BulkJob, job_id).status == "completed"
@@ -99,3 +99,338 @@ def test_pin_verify_invalid_pin(client, test_service, test_user):
         "pin": "000000"
     })
     assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+def test_qr_generate_deactivated_service(client, test_service):
+    api_key = test_service.api_key
+
+    # Prime the service registry
+    response = client.post("/api/auth/qr/generate", json={
+        "service_id": test_service.id,
+        "service_api_key": api_key
+    })
+    assert response.status_code == status.HTTP_200_OK
+
+    # Deactivation must invalidate the cached entry
+    client.post(f"/api/services/deactivate/{test_service.id}")
+
+    response = client.post("/api/auth/qr/generate", json={
+        "service_id": test_service.id,
+        "service_api_key": api_key
+    })
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+def test_service_registry_remembers_unknown_ids(db, test_service):
+    from sqlalchemy import event
+    from app.core.service_registry import service_registry
+
+    selects = []
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        selects.append(statement)
+
+    service_registry.warm(db)
+    assert not hasattr(service_registry.get(test_service.id, db), "api_key")
+
+    event.listen(db.get_bind(), "before_cursor_execute", capture)
+    try:
+        for _ in range(3):
+            assert service_registry.authenticate(test_service.id + 1000, "bogus", db) is None
+    finally:
+        event.remove(db.get_bind(), "before_cursor_execute", capture)
+    assert len(selects) == 1
+
+def test_list_services_returns_api_keys(client, test_service):
+    response = client.get("/api/services/list")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()[0]["api_key"] == test_service.api_key
+
+def test_concurrent_scan_and_verify_single_winner(client, session_factory, test_service, test_user):
+    from concurrent.futures import ThreadPoolExecutor
+    from app.services import qr_service, pin_service
+
+    qr_token = client.post("/api/auth/qr/generate", json={
+        "service_id": test_service.id,
+        "service_api_key": test_service.api_key
+    }).json()["qr_token"]
+    auth_key = test_user.auth_key
+
+    def attempt(fn, *args):
+        session = session_factory()
+        try:
+            return fn(*args, session)
+        except ValueError as e:
+            return e
+        finally:
+            session.close()
+
+    workers = 16
+
+    # Many devices scanning the same token: exactly one gets a PIN
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        scans = list(pool.map(
+            lambda _: attempt(qr_service.process_qr_scan, qr_token, auth_key),
+            range(workers)
+        ))
+    winners = [r for r in scans if isinstance(r, dict)]
+    assert len(winners) == 1
+    assert all(str(r) == "QR code already scanned" for r in scans if not isinstance(r, dict))
+    pin = winners[0]["pin"]
+
+    # Many submissions of the correct PIN: exactly one session is created
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        verifications = list(pool.map(
+            lambda _: attempt(pin_service.verify_pin_and_create_session, qr_token, pin),
+            range(workers)
+        ))
+    sessions = [r for r in verifications if isinstance(r, dict)]
+    assert len(sessions) == 1
+    assert sessions[0]["user_info"]["user_id"] == test_user.id
+    assert all(str(r) == "This QR code was already used" for r in verifications if not isinstance(r, dict))
+
+def _login(client, service, user):
+    qr_token = client.post("/api/auth/qr/generate", json={
+        "service_id": service.id,
+        "service_api_key": service.api_key
+    }).json()["qr_token"]
+    pin = client.post("/api/auth/qr/scan", json={
+        "qr_token": qr_token,
+        "user_auth_key": user.auth_key
+    }).json()["pin"]
+    return client.post("/api/auth/pin/verify", json={
+        "qr_token": qr_token,
+        "pin": pin
+    }).json()["session_token"]
+
+def test_session_readable_before_write_behind_flush(client, db, test_service, test_user):
+    from app.models.login_history import LoginHistory
+
+    session_token = _login(client, test_service, test_user)
+
+    # Validation must see the session even if the row is still queued
+    response = client.post("/api/auth/validate-session", params={"token": session_token})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["user_id"] == test_user.id
+
+    response = client.post("/api/auth/logout", params={"token": session_token})
+    assert response.status_code == status.HTTP_200_OK
+
+    record = db.query(LoginHistory).filter(LoginHistory.session_token == session_token).one()
+    assert record.logout_at is not None
+    db.refresh(test_user)
+    assert test_user.last_login is not None
+
+def _queue_login_in_other_worker(service, user):
+    """A session accepted by another worker's write-behind buffer, not flushed yet"""
+    from datetime import datetime, timedelta
+    from unittest.mock import PropertyMock, patch
+    from app.config import settings
+    from app.core.login_writer import LoginWriteBehind
+    from app.core.security import create_access_token
+
+    now = datetime.utcnow()
+    token = create_access_token(
+        data={"user_id": user.id, "auth_key": user.auth_key, "service_id": service.id, "jti": uuid.uuid4().hex},
+        expires_delta=timedelta(minutes=settings.SESSION_EXPIRY_MINUTES)
+    )
+    other = LoginWriteBehind()
+    with patch.object(LoginWriteBehind, "running", new_callable=PropertyMock, return_value=True):
+        other.record_login(
+            user_id=user.id, service_id=service.id, session_token=token, login_at=now,
+            session_expires_at=now + timedelta(minutes=settings.SESSION_EXPIRY_MINUTES)
+        )
+    return other, token
+
+def test_session_queued_in_other_worker_validates(client, db, test_service, test_user):
+    from app.models.active_session import ActiveSession
+    from app.models.login_rollup import UserLoginRollup
+
+    other, token = _queue_login_in_other_worker(test_service, test_user)
+
+    response = client.post("/api/auth/validate-session", params={"token": token})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["user_id"] == test_user.id
+
+    # The other worker's flush finds the row already there
+    assert other.flush() == 1
+    assert db.query(ActiveSession).filter(ActiveSession.session_token == token).count() == 1
+    assert db.get(UserLoginRollup, test_user.id).login_count == 1
+
+def test_logout_in_other_worker_not_undone_by_flush(client, db, test_service, test_user):
+    from app.models.active_session import ActiveSession
+    from app.models.login_history import LoginHistory
+
+    other, token = _queue_login_in_other_worker(test_service, test_user)
+
+    response = client.post("/api/auth/logout", params={"token": token})
+    assert response.status_code == status.HTTP_200_OK
+
+    other.flush()
+    assert db.query(ActiveSession).filter(ActiveSession.session_token == token).count() == 0
+    assert db.query(LoginHistory).filter(LoginHistory.session_token == token).count() == 1
+
+    response = client.post("/api/auth/validate-session", params={"token": token})
+    assert response.status_code != status.HTTP_200_OK
+
+def test_write_behind_drops_bad_rows_after_max_attempts(db, test_service, test_user):
+    from datetime import datetime, timedelta
+    from unittest.mock import PropertyMock, patch
+    from app.core.login_writer import LoginWriteBehind
+    from app.models.active_session import ActiveSession
+
+    writer = LoginWriteBehind(max_attempts=2)
+    now = datetime.utcnow()
+    with patch.object(LoginWriteBehind, "running", new_callable=PropertyMock, return_value=True):
+        writer.record_login(test_user.id, test_service.id, "good-token", now, now + timedelta(minutes=30))
+        # Violates NOT NULL, so every batch containing it fails
+        writer.record_login(test_user.id, None, "bad-token", now, now + timedelta(minutes=30))
+
+    assert writer.flush() == 0
+    assert writer.pending_session("good-token") is not None
+
+    assert writer.flush() == 1
+    assert writer.pending_session("good-token") is None
+    assert writer.pending_session("bad-token") is None
+    assert [s.session_token for s in db.query(ActiveSession)] == ["good-token"]
+
+def test_sessions_live_in_login_history_adopted(client, db, test_service, test_user):
+    from datetime import datetime, timedelta
+    from app.core.security import create_access_token
+    from app.models.active_session import ActiveSession
+    from app.models.login_history import LoginHistory
+    from app.services.session_service import adopt_live_history_sessions
+
+    # Sessions written before active_sessions existed
+    now = datetime.utcnow()
+    tokens = []
+    for _ in range(2):
+        token = create_access_token(
+            data={"user_id": test_user.id, "service_id": test_service.id, "jti": uuid.uuid4().hex},
+            expires_delta=timedelta(minutes=30)
+        )
+        db.add(LoginHistory(
+            user_id=test_user.id, service_id=test_service.id, session_token=token,
+            login_at=now - timedelta(minutes=5), session_expires_at=now + timedelta(minutes=25)
+        ))
+        tokens.append(token)
+    db.add(LoginHistory(
+        user_id=test_user.id, service_id=test_service.id, session_token="ended",
+        login_at=now - timedelta(minutes=5), logout_at=now, session_expires_at=now + timedelta(minutes=25)
+    ))
+    db.commit()
+
+    # Validation falls back to login_history for one token
+    response = client.post("/api/auth/validate-session", params={"token": tokens[0]})
+    assert response.status_code == status.HTTP_200_OK
+
+    # Tokens with no live history row are only looked up, never written
+    from sqlalchemy import event
+    statements = []
+
+    def capture(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.get_bind(), "before_cursor_execute", capture)
+    try:
+        assert adopt_live_history_sessions(db, "ended") == 0
+        assert adopt_live_history_sessions(db, "forged") == 0
+    finally:
+        event.remove(db.get_bind(), "before_cursor_execute", capture)
+    assert statements and all(s.lstrip().upper().startswith("SELECT") for s in statements)
+
+    # The startup backfill moves the rest
+    assert adopt_live_history_sessions(db) == 1
+    assert {s.session_token for s in db.query(ActiveSession)} == set(tokens)
+    assert [h.session_token for h in db.query(LoginHistory)] == ["ended"]
+
+def test_expired_sessions_swept_to_history(client, db, test_service, test_user):
+    from datetime import datetime, timedelta
+    from app.core.login_writer import login_writer
+    from app.models.active_session import ActiveSession
+    from app.models.login_history import LoginHistory
+    from app.services.session_service import sweep_expired_sessions
+
+    other_service = RegisteredService(
+        service_name="Other Service",
+        service_url="http://otherservice.com",
+        api_key=str(uuid.uuid4())
+    )
+    db.add(other_service)
+    db.commit()
+
+    live_token = _login(client, test_service, test_user)
+    expired_token = _login(client, other_service, test_user)
+    login_writer.flush()
+
+    db.query(ActiveSession).filter(ActiveSession.session_token == expired_token).update(
+        {"session_expires_at": datetime.utcnow() - timedelta(minutes=1)}
+    )
+    db.commit()
+
+    assert sweep_expired_sessions(db, batch_size=1) == 1
+
+    remaining = [s.session_token for s in db.query(ActiveSession).all()]
+    assert remaining == [live_token]
+    archived = db.query(LoginHistory).filter(LoginHistory.session_token == expired_token).one()
+    assert archived.logout_at is None
+
+    response = client.post("/api/auth/validate-session", params={"token": expired_token})
+    assert response.status_code != status.HTTP_200_OK
+
+def test_login_rollups_updated_with_sessions(client, db, test_service, test_user):
+    from app.core.login_writer import login_writer
+    from app.models.login_rollup import UserLoginRollup, UserServiceLoginRollup
+    from app.services.rollup_service import rebuild_login_rollups
+
+    other_service = RegisteredService(
+        service_name="Other Service",
+        service_url="http://otherservice.com",
+        api_key=str(uuid.uuid4())
+    )
+    db.add(other_service)
+    db.commit()
+
+    _login(client, test_service, test_user)
+    _login(client, other_service, test_user)
+    _login(client, other_service, test_user)
+    login_writer.flush()
+
+    rollup = db.get(UserLoginRollup, test_user.id)
+    assert rollup.login_count == 3
+    assert rollup.services_used == 2
+    assert rollup.first_login_at <= rollup.last_login_at
+
+    pair = db.get(UserServiceLoginRollup, (test_user.id, other_service.id))
+    assert pair.login_count == 2
+
+    # A rebuild from the session tables lands on the same totals
+    rebuild_login_rollups(db, include_archive=False)
+    db.expire_all()
+    rebuilt = db.get(UserLoginRollup, test_user.id)
+    assert (rebuilt.login_count, rebuilt.services_used) == (3, 2)
+
+def test_login_rollups_backfilled_from_existing_history(client, db, test_service, test_user):
+    from datetime import datetime, timedelta
+    from app.core.login_writer import login_writer
+    from app.models.login_history import LoginHistory
+    from app.models.login_rollup import UserLoginRollup
+    from app.services.rollup_service import backfill_login_rollups
+
+    # History from before rollups existed
+    now = datetime.utcnow()
+    for i in range(4):
+        db.add(LoginHistory(
+            user_id=test_user.id, service_id=test_service.id, session_token=f"old-{i}",
+            login_at=now - timedelta(days=i + 1), session_expires_at=now - timedelta(days=i + 1)
+        ))
+    db.commit()
+
+    # Another worker already counted a new login into the empty rollups
+    _login(client, test_service, test_user)
+    login_writer.flush()
+    assert db.get(UserLoginRollup, test_user.id).login_count == 1
+
+    assert backfill_login_rollups(db) == 1
+    db.expire_all()
+    assert db.get(UserLoginRollup, test_user.id).login_count == 5
+
+    # Complete rollups are left alone on the next start
+    assert backfill_login_rollups(db) is None
@@ -0,0 +1,270 @@
+"""
+Email outbox and dispatcher, delivered to an in-process SMTP server (aiosmtpd)
+"""
+import asyncio
+import socket
+import time
+from datetime import datetime
+
+import pytest
+from fastapi import status
+
+from app.core.email import SMTPPool
+from app.core.email_dispatcher import EmailDispatcher
+from app.models.email_outbox import EmailOutbox, OutboxStatus
+from app.services import notification_service
+
+
+class SlowHandler:
+    """Accepts every message after a short delay, like a real relay"""
+
+    def __init__(self, delay_seconds: float = 0.01):
+        self.delay_seconds = delay_seconds
+        self.received = []
+        self.peers = set()
+
+    async def handle_DATA(self, server, session, envelope):
+        await asyncio.sleep(self.delay_seconds)
+        self.received.append(envelope.rcpt_tos[0])
+        self.peers.add(session.peer)
+        return "250 OK"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server():
+    controller_module = pytest.importorskip("aiosmtpd.controller")
+    handler = SlowHandler()
+    controller = controller_module.Controller(handler, hostname="127.0.0.1", port=_free_port())
+    controller.start()
+    try:
+        yield handler, controller.port
+    finally:
+        controller.stop()
+
+
+def _dispatcher(session_factory, port, **kwargs) -> EmailDispatcher:
+    pool = SMTPPool("127.0.0.1", port, start_tls=False, timeout=5, size=kwargs.pop("size", 5))
+    return EmailDispatcher(pool, session_factory=session_factory, **kwargs)
+
+
+def test_registration_queues_email_in_same_transaction(client, db):
+    response = client.post("/api/register/", json={
+        "email": "outbox@example.com",
+        "username": "outbox",
+        "password": "password123",
+        "full_name": "Outbox User"
+    })
+    assert response.status_code == status.HTTP_201_CREATED
+
+    queued = db.query(EmailOutbox).one()
+    assert queued.subject == "New User Registration"
+    assert queued.status == OutboxStatus.PENDING
+
+    # A rolled back transaction leaves nothing behind
+    notification_service.queue_email(db, ["nobody@example.com"], "Subject", "Body")
+    db.rollback()
+    assert db.query(EmailOutbox).count() == 1
+
+
+def test_dispatcher_throughput_with_pooled_connections(db, session_factory, smtp_server):
+    handler, port = smtp_server
+    for i in range(300):
+        notification_service.queue_email(db, [f"user{i}@example.com"], "Hello", "<p>Hi</p>")
+    db.commit()
+
+    dispatcher = _dispatcher(session_factory, port, batch_size=100, size=5)
+
+    async def drain():
+        try:
+            while await dispatcher.run_once():
+                pass
+        finally:
+            await dispatcher.pool.close()
+
+    started = time.perf_counter()
+    asyncio.run(drain())
+    elapsed = time.perf_counter() - started
+
+    assert len(handler.received) == 300
+    assert dispatcher.sent == 300
+    assert db.query(EmailOutbox).filter(EmailOutbox.status == OutboxStatus.SENT).count() == 300
+    # Connections are reused across messages and rounds, never more than the pool size
+    assert dispatcher.pool.connections_opened <= 5
+    assert len(handler.peers) <= 5
+    # 300 messages at 10ms each would take 3s one at a time
+    assert elapsed < 2.5
+
+
+def test_dispatcher_retries_with_backoff_then_gives_up(db, session_factory):
+    notification_service.queue_email(db, ["retry@example.com"], "Hello", "Body")
+    db.commit()
+
+    # Nothing listens on this port, so every attempt fails
+    dispatcher = _dispatcher(session_factory, _free_port(), max_attempts=2, retry_base_seconds=60)
+
+    asyncio.run(dispatcher.run_once())
+    db.expire_all()
+    message = db.query(EmailOutbox).one()
+    assert message.status == OutboxStatus.PENDING
+    assert message.attempts == 1
+    assert message.last_error
+    assert (message.next_attempt_at - datetime.utcnow()).total_seconds() > 50
+
+    # Not due yet
+    assert asyncio.run(dispatcher.run_once()) == 0
+
+    message.next_attempt_at = datetime.utcnow()
+    db.commit()
+    asyncio.run(dispatcher.run_once())
+    db.expire_all()
+    message = db.query(EmailOutbox).one()
+    assert message.status == OutboxStatus.FAILED
+    assert message.attempts == 2
+    assert dispatcher.failed == 1
+
+
+def test_claim_lease_covers_a_whole_batch_on_a_slow_server(session_factory):
+    # 100 messages over 5 connections go out in 20 rounds of sends that may each hit the timeout
+    dispatcher = _dispatcher(session_factory, _free_port(), batch_size=100, size=5)
+    assert dispatcher.lease_seconds >= 20 * 2 * dispatcher.pool.timeout
+
+    smaller = _dispatcher(session_factory, _free_port(), batch_size=10, size=5)
+    assert smaller.lease_seconds < dispatcher.lease_seconds
+
+
+def test_sent_and_failed_emails_are_purged(db, monkeypatch):
+    from datetime import timedelta
+    from app.services.retention_service import retention_engine
+
+    monkeypatch.setattr(retention_engine, "pause_seconds", 0)
+    old = datetime.utcnow() - timedelta(days=30)
+    for status_, created_at in [
+        (OutboxStatus.SENT, old), (OutboxStatus.FAILED, old),
+        (OutboxStatus.PENDING, old), (OutboxStatus.SENT, datetime.utcnow())
+    ]:
+        db.add(EmailOutbox(
+            recipient="pin@example.com", subject="Your invitation", body="PIN 1234",
+            status=status_, created_at=created_at
+        ))
+    db.commit()
+
+    assert retention_engine.run(db)["email_outbox"] == 2
+    remaining = {(m.status, m.created_at == old) for m in db.query(EmailOutbox)}
+    assert remaining == {(OutboxStatus.PENDING, True), (OutboxStatus.SENT, False)}
+
+
+def test_concurrent_dispatchers_claim_disjoint_messages(db, session_factory):
+    from concurrent.futures import ThreadPoolExecutor
+
+    for i in range(100):
+        notification_service.queue_email(db, [f"claim{i}@example.com"], "Hello", "Body")
+    db.commit()
+
+    # One dispatcher per worker process, all polling the same outbox
+    dispatchers = [EmailDispatcher(None, batch_size=40, session_factory=session_factory) for _ in range(4)]
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        claims = list(executor.map(lambda dispatcher: dispatcher._claim(), dispatchers))
+
+    ids = [message["id"] for claim in claims for message in claim]
+    assert len(ids) == len(set(ids)) == 100
+
+
+def test_admin_notifications_coalesce_into_digest(db, monkeypatch):
+    from app.config import settings
+    from app.models.admin_notification import AdminNotificationEvent, NotificationDelivery
+
+    monkeypatch.setattr(settings, "ADMIN_DIGEST_WINDOW_SECONDS", 300)
+    monkeypatch.setattr(settings, "ADMIN_DIGEST_IMMEDIATE_LIMIT", 2)
+
+    for i in range(6):
+        notification_service.queue_admin_notification(
+            db, "New User Registration", f"New user user{i} has registered"
+        )
+        db.commit()
+    notification_service.queue_admin_notification(db, "New Waitlist Request", "Name: Someone")
+    db.commit()
+
+    # The first two go out on their own, the rest wait for the digest
+    assert db.query(EmailOutbox).count() == 2
+    pending = db.query(AdminNotificationEvent).filter(
+        AdminNotificationEvent.delivery == NotificationDelivery.PENDING
+    ).count()
+    assert pending == 5
+
+    assert notification_service.send_admin_digest(db) == 5
+    digest = db.query(EmailOutbox).order_by(EmailOutbox.id.desc()).first()
+    assert digest.subject == "Admin digest: 5 new notifications"
+    assert "New User Registration (4)" in digest.body
+    assert "New Waitlist Request (1)" in digest.body
+    assert "user5" in digest.body
+
+    # Nothing new, no email
+    assert notification_service.send_admin_digest(db) == 0
+    assert db.query(EmailOutbox).count() == 3
+
+    # Digests disabled: always immediate
+    monkeypatch.setattr(settings, "ADMIN_DIGEST_WINDOW_SECONDS", 0)
+    notification_service.queue_admin_notification(db, "New User Registration", "Quiet period")
+    db.commit()
+    assert db.query(EmailOutbox).count() == 4
+
+
+def test_concurrent_digests_cover_each_event_once(db, session_factory):
+    from concurrent.futures import ThreadPoolExecutor
+    from app.models.admin_notification import AdminNotificationEvent, NotificationDelivery
+
+    db.add_all([
+        AdminNotificationEvent(
+            subject="New User Registration", message=f"New user user{i} has registered",
+            delivery=NotificationDelivery.PENDING
+        )
+        for i in range(20)
+    ])
+    db.commit()
+
+    # Every worker runs the digest task on the same schedule
+    def digest(_):
+        session = session_factory()
+        try:
+            return notification_service.send_admin_digest(session)
+        finally:
+            session.close()
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        covered = list(executor.map(digest, range(4)))
+
+    assert sum(covered) == 20
+    digests = db.query(EmailOutbox).filter(EmailOutbox.subject.like("Admin digest:%")).count()
+    assert digests == len([count for count in covered if count])
+
+
+def test_one_digest_per_window_across_workers(db, monkeypatch):
+    from app.config import settings
+    from app.core.leases import release_lease
+    from app.models.admin_notification import AdminNotificationEvent, NotificationDelivery
+    from app.models.job_lease import JobLease
+
+    monkeypatch.setattr(settings, "ADMIN_DIGEST_WINDOW_SECONDS", 300)
+
+    def hold(message):
+        db.add(AdminNotificationEvent(subject="New User Registration", message=message,
+                                      delivery=NotificationDelivery.PENDING))
+        db.commit()
+
+    hold("first")
+    assert notification_service.send_admin_digest(db) == 1
+
+    # A later worker in the same window leaves new events for the next window
+    hold("second")
+    assert notification_service.send_admin_digest(db) == 0
+
+    holder = db.get(JobLease, notification_service.DIGEST_LEASE_NAME).holder
+    release_lease(db, notification_service.DIGEST_LEASE_NAME, holder)
+    assert notification_service.send_admin_digest(db) == 1
+
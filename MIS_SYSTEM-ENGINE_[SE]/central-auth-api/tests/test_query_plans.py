@@ -0,0 +1,138 @@
+"""
+Query plan regression tests
+
+Runs each hot service query against a seeded database, then EXPLAIN QUERY
+PLANs every statement it issued. Fails if any of them reads a whole table
+without an index.
+"""
+import re
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event, text
+
+from app.core.service_registry import service_registry
+from app.database import Base
+from app.models.active_user import ActiveUser
+from app.models.invitation import Invitation
+from app.models.login_history import LoginHistory
+from app.models.pending_user import PendingUser
+from app.models.qr_session import QRSession
+from app.models.upload import Upload
+from app.models.waitlist import WaitlistRequest, WaitlistStatus
+from app.services import (
+    admin_service, analytics_service, dashboard_service, invitation_service, registration_service,
+    photo_similarity_service, retention_service, session_service, upload_gc_service, upload_service,
+    waitlist_service
+)
+
+# "SCAN login_history" with no index; "SCAN t USING INDEX ..." is fine
+FULL_SCAN = re.compile(r"^SCAN (\w+)$")
+
+
+@pytest.fixture
+def seeded_db(db):
+    now = datetime.utcnow()
+    for i in range(50):
+        at = now - timedelta(hours=i)
+        db.add(ActiveUser(
+            email=f"user{i}@test.com", username=f"user{i}", full_name=f"User {i}",
+            hashed_password="x", auth_key=f"auth-{i}", is_active=True
+        ))
+        db.add(PendingUser(
+            email=f"pending{i}@test.com", username=f"pending{i}", full_name=f"Pending {i}",
+            hashed_password="x", is_reviewed=i % 2 == 0
+        ))
+        db.add(WaitlistRequest(
+            full_name=f"Wait {i}", email=f"wait{i}@test.com",
+            status=list(WaitlistStatus)[i % len(WaitlistStatus)]
+        ))
+        db.add(Invitation(code=f"INV-{i:06d}", pin="1234", is_used=i % 3 == 0, expires_at=at))
+        db.add(QRSession(token=f"qr-{i}", service_id=1 + i % 3, expires_at=at))
+        db.add(LoginHistory(
+            user_id=1 + i % 5, service_id=1 + i % 3, session_token=f"token-{i}",
+            login_at=at, session_expires_at=at + timedelta(minutes=30)
+        ))
+        db.add(Upload(
+            file_id=f"file-{i}.jpg", path=f"photos/file-{i}.jpg", media_type=("photo", "audio")[i % 2],
+            size_bytes=100, sha256=f"{i:064x}", owner_id=1 + i % 5, created_at=at
+        ))
+    db.commit()
+
+    # Loading the whole (tiny) services table into the registry is intended
+    service_registry.warm(db)
+    return db
+
+
+@contextmanager
+def captured_selects(db):
+    """Collect every SELECT issued on the session's connection"""
+    statements = []
+    engine = db.get_bind()
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and not executemany:
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+
+def full_scans(db, statements):
+    scans = []
+    for statement, parameters in statements:
+        plan = db.connection().exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all()
+        for row in plan:
+            match = FULL_SCAN.match(row[-1])
+            # Subqueries show up as SCAN of their alias; only real tables count
+            if match and match.group(1) in Base.metadata.tables:
+                scans.append(f"{match.group(1)}: {statement}")
+    return scans
+
+
+HOT_QUERIES = {
+    "login_history_by_user": lambda db: admin_service.get_login_history(db, user_id=2, limit=10),
+    "login_history_by_service": lambda db: admin_service.get_login_history(db, service_id=2, limit=10),
+    "login_history_date_range": lambda db: admin_service.get_login_history(
+        db, limit=10, start_date=datetime.utcnow() - timedelta(days=1)
+    ),
+    "login_history_next_page": lambda db: admin_service.get_login_history(
+        db, user_id=2, limit=2,
+        cursor=admin_service.get_login_history(db, user_id=2, limit=2).next_cursor
+    ),
+    "pending_users": lambda db: registration_service.get_pending_users(db, limit=10),
+    "active_users": lambda db: admin_service.get_all_users(db, limit=10),
+    "waitlist_by_status": lambda db: waitlist_service.get_all_requests(
+        db, status=WaitlistStatus.PENDING, limit=10
+    ),
+    "waitlist_all": lambda db: waitlist_service.get_all_requests(db, limit=10),
+    "pending_invitations": lambda db: invitation_service.get_pending_invitations(db, limit=10),
+    "all_invitations": lambda db: invitation_service.get_all_invitations(db, limit=10),
+    "active_sessions": lambda db: session_service.get_active_sessions(db, limit=10),
+    "retention": lambda db: retention_service.run_retention(db),
+    "dashboard": lambda db: dashboard_service.build_snapshot(db),
+    "analytics_hourly": lambda db: analytics_service.get_login_series(
+        db, datetime.utcnow() - timedelta(days=1), datetime.utcnow(), service_id=2
+    ),
+    "uploads_all": lambda db: upload_service.get_uploads(db, limit=10),
+    "uploads_by_type": lambda db: upload_service.get_uploads(db, media_type="photo", limit=10),
+    "registration_attachments": lambda db: upload_service.get_registration_attachments(db, 2),
+    "photo_duplicates": lambda db: photo_similarity_service.find_duplicates(db, [1, 2, 3]),
+    "upload_gc": lambda db: upload_gc_service.collect_orphaned_uploads(db, grace_hours=24 * 365),
+    "analytics_daily": lambda db: analytics_service.get_login_series(
+        db, datetime.utcnow() - timedelta(days=365), datetime.utcnow()
+    ),
+}
+
+
+@pytest.mark.parametrize("name", sorted(HOT_QUERIES))
+def test_hot_query_uses_index(seeded_db, name):
+    with captured_selects(seeded_db) as statements:
+        HOT_QUERIES[name](seeded_db)
+
+    assert statements, "query issued no SELECT"
+    assert full_scans(seeded_db, statements) == []
@@ -0,0 +1,664 @@
+import hashlib
+import os
+
+import pytest
+from fastapi import FastAPI, File, UploadFile, status
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.middleware.body_limit import BodySizeLimitMiddleware
+from app.main import app as main_app
+from app.models.pending_user import PendingUser
+from app.models.upload import RegistrationAttachment, Upload
+from app.models.upload_blob import UploadBlob
+from test_admin import _admin_headers, test_admin  # noqa: F401
+
+
+def _blob_path(root, data):
+    sha = data["sha256"]
+    return root / "blobs" / sha[:2] / sha[2:4] / data["file_id"]
+
+
+def test_upload_photo_streams_with_checksum(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "UPLOAD_CHUNK_SIZE", 1000)
+    content = os.urandom(5500)
+
+    response = client.post(
+        "/api/upload/photo",
+        files={"file": ("face.png", content, "image/png")}
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+    data = response.json()
+    assert data["sha256"] == hashlib.sha256(content).hexdigest()
+    assert data["size_bytes"] == 5500
+    assert data["file_id"] == data["sha256"] + ".png"
+    assert _blob_path(tmp_path, data).read_bytes() == content
+
+    response = client.post(
+        "/api/upload/photo",
+        files={"file": ("notes.txt", b"hello", "text/plain")}
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_upload_over_limit_is_rejected_without_leftovers(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "UPLOAD_CHUNK_SIZE", 1000)
+    monkeypatch.setattr(settings, "UPLOAD_MAX_AUDIO_BYTES", 4000)
+
+    response = client.post(
+        "/api/upload/audio",
+        files={"file": ("oath.webm", os.urandom(4001), "audio/webm")}
+    )
+    assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    assert [p for p in tmp_path.rglob("*") if p.is_file()] == []
+
+
+def test_body_limit_middleware_rejects_early():
+    reached = []
+    app = FastAPI()
+    app.add_middleware(BodySizeLimitMiddleware, limits={"/limited": 1000})
+
+    @app.post("/limited")
+    async def limited(file: UploadFile = File(...)):
+        reached.append(True)
+        return {"size": len(await file.read())}
+
+    client = TestClient(app)
+
+    # Declared too large: refused before the body is read
+    response = client.post("/limited", files={"file": ("a.bin", b"x" * 2000)})
+    assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+
+    # No Content-Length: aborted once the streamed body crosses the limit
+    def body():
+        for _ in range(20):
+            yield b"y" * 256
+
+    response = client.post(
+        "/limited", content=body(),
+        headers={"Content-Type": "multipart/form-data; boundary=xyz"}
+    )
+    assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    assert reached == []
+
+    response = client.post("/limited", files={"file": ("a.bin", b"x" * 100)})
+    assert response.json() == {"size": 100}
+
+
+def test_identical_uploads_share_a_blob(client, db, test_admin, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    mount = next(route for route in main_app.routes if getattr(route, "name", None) == "uploads")
+    monkeypatch.setattr(mount.app, "all_directories", [str(tmp_path)])
+    content = os.urandom(2048)
+
+    first = client.post("/api/upload/photo", files={"file": ("a.jpg", content, "image/jpeg")}).json()
+    second = client.post("/api/upload/photo", files={"file": ("b.JPEG", content, "image/jpeg")}).json()
+    assert second["url"] == first["url"]
+    assert first["deduplicated"] is False
+    assert second["deduplicated"] is True
+    assert db.get(UploadBlob, first["sha256"]).ref_count == 2
+    assert len([p for p in (tmp_path / "blobs").rglob("*") if p.is_file()]) == 1
+
+    served = client.get(first["url"])
+    assert served.content == content
+    assert "immutable" in served.headers["cache-control"]
+
+    # Each upload is listed on its own, pointing at the shared file
+    listed = client.get(
+        "/api/upload/list", params={"media_type": "photos"}, headers=_admin_headers(client)
+    ).json()
+    assert [f["filename"] for f in listed["files"]] == ["b.JPEG", "a.jpg"]
+    assert {f["url"] for f in listed["files"]} == {first["url"]}
+
+    # The file goes away with its last reference
+    client.delete(f"/api/upload/photos/{first['file_id']}")
+    assert _blob_path(tmp_path, first).exists()
+    client.delete(f"/api/upload/photos/{first['file_id']}")
+    assert not _blob_path(tmp_path, first).exists()
+    db.expire_all()
+    assert db.get(UploadBlob, first["sha256"]) is None
+
+
+def test_release_racing_an_identical_upload_keeps_the_file(client, db, session_factory, tmp_path, monkeypatch):
+    from app.services import upload_service
+
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    content = os.urandom(2048)
+    first = client.post("/api/upload/photo", files={"file": ("a.jpg", content, "image/jpeg")}).json()
+
+    # Another worker deletes the only other reference just after the new
+    # upload found the file already stored
+    place_blob = upload_service._place_blob
+
+    def place_then_release(temp_path, final_path):
+        place_blob(temp_path, final_path)
+        other = session_factory()
+        try:
+            upload_service.delete_upload(other, upload_service.find_upload(other, first["file_id"]))
+        finally:
+            other.close()
+
+    monkeypatch.setattr(upload_service, "_place_blob", place_then_release)
+    second = client.post("/api/upload/photo", files={"file": ("b.jpg", content, "image/jpeg")}).json()
+
+    db.expire_all()
+    assert db.get(UploadBlob, second["sha256"]).ref_count == 1
+    assert _blob_path(tmp_path, second).read_bytes() == content
+
+    # A release that removed the row just before a re-upload committed puts the file back
+    assert upload_service.remove_blob_file(db, second["sha256"], str(_blob_path(tmp_path, second))) is False
+    assert _blob_path(tmp_path, second).read_bytes() == content
+    assert [p.name for p in (tmp_path / "blobs").rglob("*") if p.is_file()] == [second["file_id"]]
+
+
+def test_upload_listing_is_paginated(client, db, test_admin, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    headers = _admin_headers(client)
+    for i in range(5):
+        client.post("/api/upload/photo", files={"file": (f"p{i}.jpg", os.urandom(64), "image/jpeg")})
+    client.post("/api/upload/audio", files={"file": ("oath.webm", os.urandom(64), "audio/webm")})
+
+    response = client.get("/api/upload/list", params={"media_type": "photos", "limit": 3}, headers=headers)
+    assert response.headers["X-Total-Count"] == "5"
+    first_page = response.json()
+    assert [f["filename"] for f in first_page["files"]] == ["p4.jpg", "p3.jpg", "p2.jpg"]
+
+    response = client.get("/api/upload/list", params={
+        "media_type": "photos", "limit": 3, "cursor": response.headers["X-Next-Cursor"]
+    }, headers=headers)
+    assert [f["filename"] for f in response.json()["files"]] == ["p1.jpg", "p0.jpg"]
+    assert "X-Next-Cursor" not in response.headers
+
+    assert client.get("/api/upload/list", headers=headers).json()["count"] == 6
+    assert client.get("/api/upload/list", params={"media_type": "video"}, headers=headers).status_code == 400
+    assert client.get("/api/upload/list", params={"cursor": "junk"}, headers=headers).status_code == 400
+
+    # Listings expose owners and checksums, so they need an admin
+    assert client.get("/api/upload/list").status_code in (401, 403)
+
+
+def test_registration_links_its_uploads(client, db, test_admin, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    photos = [
+        client.post("/api/upload/photo", files={"file": (f"p{i}.jpg", os.urandom(64), "image/jpeg")}).json()
+        for i in range(2)
+    ]
+    oath = client.post("/api/upload/audio", files={"file": ("oath.webm", os.urandom(64), "audio/webm")}).json()
+
+    response = client.post("/api/register/", json={
+        "email": "attach@example.com",
+        "username": "attach",
+        "password": "password123",
+        "full_name": "Attach User",
+        "photo_ids": f"{photos[1]['file_id']},{photos[0]['file_id']},missing.jpg",
+        "audio_oath_id": oath["file_id"]
+    })
+    assert response.status_code == status.HTTP_201_CREATED
+    user = db.query(PendingUser).filter(PendingUser.username == "attach").one()
+
+    assert db.query(RegistrationAttachment).count() == 3
+    assert {u.owner_id for u in db.query(Upload)} == {user.id}
+
+    response = client.get(f"/api/upload/registrations/{user.id}", headers=_admin_headers(client))
+    data = response.json()
+    assert [p["upload_id"] for p in data["photos"]] == [photos[1]["upload_id"], photos[0]["upload_id"]]
+    assert data["audio_oath"]["upload_id"] == oath["upload_id"]
+    assert client.get(f"/api/upload/registrations/{user.id}").status_code in (401, 403)
+
+    # Deleting an upload drops its link
+    client.delete(f"/api/upload/photos/{photos[0]['file_id']}")
+    assert db.query(RegistrationAttachment).count() == 2
+
+
+def test_backfill_records_legacy_files(db, tmp_path, monkeypatch):
+    from app.services.upload_service import backfill_uploads
+
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    (tmp_path / "photos").mkdir()
+    (tmp_path / "photos" / "old.jpg").write_bytes(b"old photo")
+    db.add(PendingUser(
+        email="legacy@example.com", username="legacy", hashed_password="x",
+        full_name="Legacy", photo_ids="old.jpg"
+    ))
+    db.commit()
+
+    assert backfill_uploads(db) == (1, 1)
+    upload = db.query(Upload).one()
+    assert upload.path == "photos/old.jpg"
+    assert upload.sha256 == hashlib.sha256(b"old photo").hexdigest()
+    assert upload.owner_id is not None
+
+    # Running again changes nothing
+    assert backfill_uploads(db) == (0, 0)
+
+
+def _phone_photo(size=(1200, 800)) -> bytes:
+    """A JPEG stored sideways with EXIF orientation 6 (rotate 90° clockwise) and a GPS tag"""
+    from io import BytesIO
+    from PIL import Image
+
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    exif[0x8825] = {2: (51.0, 30.0, 0.0)}
+    out = BytesIO()
+    Image.new("RGB", size, (200, 30, 30)).save(out, "JPEG", exif=exif.tobytes())
+    return out.getvalue()
+
+
+def test_photo_derivatives_are_oriented_and_stripped(client, db, test_admin, tmp_path, monkeypatch):
+    from PIL import Image
+    from app.core.images import image_processor
+
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    try:
+        data = client.post(
+            "/api/upload/photo", files={"file": ("phone.jpg", _phone_photo(), "image/jpeg")}
+        ).json()
+
+        derivatives = data["derivatives"]
+        assert set(derivatives) == {"thumbnail", "medium"}
+        for variant, longest in (("thumbnail", 256), ("medium", 1024)):
+            for fmt in ("webp", "jpeg"):
+                path = tmp_path / derivatives[variant][fmt].removeprefix("/uploads/")
+                with Image.open(path) as image:
+                    # Portrait once the orientation tag is applied
+                    assert image.height == longest and image.width < longest
+                    assert not image.getexif()
+
+        assert _blob_path(tmp_path, data).stat().st_size > 0
+        listed = client.get("/api/upload/list", headers=_admin_headers(client)).json()
+        assert listed["files"][0]["derivatives"] == derivatives
+
+        # Derivatives go with the last reference to the photo
+        client.delete(f"/api/upload/photos/{data['file_id']}")
+        assert not (tmp_path / "derivatives").exists() or not any(
+            p.is_file() for p in (tmp_path / "derivatives").rglob("*")
+        )
+    finally:
+        image_processor.shutdown()
+
+
+def test_backfill_renders_missing_derivatives(db, tmp_path, monkeypatch):
+    from app.core.images import image_processor
+    from app.services.upload_service import backfill_derivatives, backfill_uploads, derivatives_exist
+
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    (tmp_path / "photos").mkdir()
+    (tmp_path / "photos" / "old.jpg").write_bytes(_phone_photo((640, 480)))
+    (tmp_path / "photos" / "broken.jpg").write_bytes(b"not an image")
+    backfill_uploads(db)
+
+    try:
+        assert backfill_derivatives(db) == (1, 1)
+        assert derivatives_exist(hashlib.sha256(_phone_photo((640, 480))).hexdigest())
+        # Done ones are skipped on the next run
+        assert backfill_derivatives(db) == (0, 1)
+    finally:
+        image_processor.shutdown()
+
+
+def test_resumable_upload_resends_only_missing_chunks(client, db, tmp_path, monkeypatch):
+    from app.models.resumable_upload import ResumableUpload
+
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    content = os.urandom(2500)
+    chunks = [content[:1000], content[1000:2000], content[2000:]]
+
+    created = client.post("/api/upload/resumable", json={
+        "media_type": "audio", "total_bytes": len(content), "filename": "oath.webm",
+        "content_type": "audio/webm", "sha256": hashlib.sha256(content).hexdigest()
+    })
+    assert created.status_code == status.HTTP_201_CREATED
+    upload_id = created.json()["upload_id"]
+    url = f"/api/upload/resumable/{upload_id}"
+
+    def put(offset, data, checksum=None):
+        return client.put(url, params={"offset": offset}, content=data, headers={
+            "X-Chunk-SHA256": checksum or hashlib.sha256(data).hexdigest()
+        })
+
+    assert put(0, chunks[0]).json()["received_bytes"] == 1000
+
+    # Corrupted in transit: rejected and discarded
+    response = put(1000, chunks[1], checksum=hashlib.sha256(b"other").hexdigest())
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert client.get(url).json()["received_bytes"] == 1000
+
+    # Retrying an acknowledged chunk is refused with the offset to resume from
+    response = put(0, chunks[0])
+    assert response.status_code == status.HTTP_409_CONFLICT
+    assert response.headers["Upload-Offset"] == "1000"
+
+    # Finalizing early is refused too
+    assert client.post(f"{url}/finalize").status_code == status.HTTP_409_CONFLICT
+
+    put(1000, chunks[1])
+    progress = put(2000, chunks[2]).json()
+    assert progress["complete"] is True
+    assert progress["chunks_received"] == 3
+
+    data = client.post(f"{url}/finalize").json()
+    assert data["sha256"] == hashlib.sha256(content).hexdigest()
+    assert _blob_path(tmp_path, data).read_bytes() == content
+    assert db.query(Upload).one().original_filename == "oath.webm"
+    assert db.query(ResumableUpload).count() == 0
+    assert client.get(url).status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_concurrent_finalize_stores_the_upload_once(client, db, session_factory, tmp_path, monkeypatch):
+    import asyncio
+    from app.services import resumable_upload_service, upload_service
+    from app.services.resumable_upload_service import UploadOffsetConflictError
+
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    content = os.urandom(1500)
+    upload_id = client.post("/api/upload/resumable", json={
+        "media_type": "audio", "total_bytes": len(content)
+    }).json()["upload_id"]
+    url = f"/api/upload/resumable/{upload_id}"
+    client.put(url, params={"offset": 0}, content=content)
+
+    # A failed finalize leaves the upload open for a retry
+    hash_file = upload_service.hash_file
+
+    def failing_hash(path):
+        raise OSError("disk unavailable")
+
+    monkeypatch.setattr(upload_service, "hash_file", failing_hash)
+    with pytest.raises(OSError):
+        client.post(f"{url}/finalize")
+
+    # A retry arriving while the first finalize is hashing is refused
+    refused = []
+
+    def hash_while_retried(path):
+        other = session_factory()
+        try:
+            upload = resumable_upload_service.get_resumable_upload(other, upload_id)
+            asyncio.run(resumable_upload_service.finalize_resumable_upload(other, upload))
+        except UploadOffsetConflictError as e:
+            refused.append(str(e))
+        finally:
+            other.close()
+        return hash_file(path)
+
+    monkeypatch.setattr(upload_service, "hash_file", hash_while_retried)
+    response = client.post(f"{url}/finalize")
+    assert response.status_code == status.HTTP_201_CREATED
+    assert refused == ["Upload is being written or finalized by another request"]
+    assert db.query(Upload).count() == 1
+    assert db.get(UploadBlob, response.json()["sha256"]).ref_count == 1
+
+
+def test_abandoned_resumable_uploads_expire(client, db, tmp_path, monkeypatch):
+    from datetime import datetime, timedelta
+    from app.models.resumable_upload import ResumableUpload
+    from app.services import resumable_upload_service
+
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    upload_id = client.post("/api/upload/resumable", json={
+        "media_type": "audio", "total_bytes": 5000
+    }).json()["upload_id"]
+    client.put(f"/api/upload/resumable/{upload_id}", params={"offset": 0}, content=b"x" * 100)
+
+    upload = db.query(ResumableUpload).one()
+    part = resumable_upload_service.part_path(upload)
+    assert os.path.getsize(part) == 100
+
+    assert resumable_upload_service.expire_resumable_uploads(db) == 0
+    upload.expires_at = datetime.utcnow() - timedelta(seconds=1)
+    db.commit()
+    assert client.get(f"/api/upload/resumable/{upload_id}").status_code == status.HTTP_404_NOT_FOUND
+    assert resumable_upload_service.expire_resumable_uploads(db) == 1
+    assert not os.path.exists(part)
+
+    response = client.post("/api/upload/resumable", json={
+        "media_type": "audio", "total_bytes": settings.UPLOAD_MAX_AUDIO_BYTES + 1
+    })
+    assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+
+
+def test_download_is_authorized_and_handed_to_nginx(client, db, test_admin, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    content = os.urandom(3000)
+    data = client.post("/api/upload/audio", files={"file": ("oath.webm", content, "audio/webm")}).json()
+    url = data["download_url"]
+    headers = _admin_headers(client)
+
+    assert client.get(url).status_code in (401, 403)
+
+    # Without nginx the API sends the file itself
+    response = client.get(url, headers=headers)
+    assert response.content == content
+    assert response.headers["etag"] == f'"{data["sha256"]}"'
+    assert "immutable" in response.headers["cache-control"]
+
+    response = client.get(url, headers={**headers, "If-None-Match": response.headers["etag"]})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    # Behind nginx only the decision is made here
+    monkeypatch.setattr(settings, "UPLOAD_ACCEL_REDIRECT_PREFIX", "/internal-uploads/")
+    response = client.get(url, headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.content == b""
+    assert response.headers["x-accel-redirect"] == f"/internal-uploads/{_blob_path(tmp_path, data).relative_to(tmp_path).as_posix()}"
+    assert response.headers["content-type"].startswith("audio/webm")
+
+    response = client.get(url, params={"variant": "thumbnail"}, headers=headers)
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    assert client.get("/api/upload/files/999", headers=headers).status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_orphaned_uploads_are_collected_after_grace_period(client, db, tmp_path, monkeypatch):
+    from datetime import datetime, timedelta
+    from app.services import upload_service
+    from app.services.upload_gc_service import collect_orphaned_uploads
+
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+
+    def upload(name, content):
+        return client.post("/api/upload/audio", files={"file": (name, content, "audio/webm")}).json()
+
+    kept = upload("kept.webm", os.urandom(1000))
+    abandoned = upload("abandoned.webm", os.urandom(2000))
+    shared = os.urandom(3000)
+    shared_orphan = upload("copy1.webm", shared)
+    shared_kept = upload("copy2.webm", shared)
+    recent = upload("recent.webm", os.urandom(500))
+
+    client.post("/api/register/", json={
+        "email": "gc@example.com", "username": "gc", "password": "password123",
+        "full_name": "GC User", "audio_oath_id": kept["file_id"]
+    })
+    # Claims the newest copy of the shared content
+    client.post("/api/register/", json={
+        "email": "gc2@example.com", "username": "gc2", "password": "password123",
+        "full_name": "GC User 2", "audio_oath_id": shared_kept["file_id"]
+    })
+
+    old = datetime.utcnow() - timedelta(hours=settings.UPLOAD_ORPHAN_GRACE_HOURS + 1)
+    db.query(Upload).filter(Upload.id != recent["upload_id"]).update({"created_at": old})
+    db.commit()
+
+    report = collect_orphaned_uploads(db, batch_size=1, pause_seconds=0)
+    assert report["uploads_deleted"] == 2
+    assert report["files_deleted"] == 1
+    assert report["bytes_reclaimed"] == 2000
+    assert report["batches"] == 2
+
+    remaining = {u.id for u in db.query(Upload)}
+    assert remaining == {kept["upload_id"], shared_kept["upload_id"], recent["upload_id"]}
+    assert not _blob_path(tmp_path, abandoned).exists()
+    assert _blob_path(tmp_path, shared_orphan).exists()
+    db.expire_all()
+    assert db.get(UploadBlob, shared_orphan["sha256"]).ref_count == 1
+
+    # A link keeps the file even if its registration row was removed by hand
+    owner_id = db.query(PendingUser.id).filter(PendingUser.username == "gc").scalar()
+    db.query(PendingUser).filter(PendingUser.id == owner_id).delete()
+    db.commit()
+    assert collect_orphaned_uploads(db, pause_seconds=0)["uploads_deleted"] == 0
+
+    # Unlinked like a rejected registration purged by retention, it is orphaned
+    upload_service.detach_registrations(db, [owner_id])
+    db.commit()
+    report = collect_orphaned_uploads(db, pause_seconds=0)
+    assert report["uploads_deleted"] == 1
+    assert report["bytes_reclaimed"] == 1000
+    assert db.query(RegistrationAttachment).count() == 1
+
+
+def test_upload_gc_rechecks_batches_and_takes_a_lease(client, db, tmp_path, monkeypatch):
+    from datetime import datetime, timedelta
+    from app.core.leases import acquire_lease, release_lease
+    from app.services import upload_gc_service
+
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    content = os.urandom(1000)
+    first = client.post("/api/upload/audio", files={"file": ("a.webm", content, "audio/webm")}).json()
+    second = client.post("/api/upload/audio", files={"file": ("b.webm", content, "audio/webm")}).json()
+    db.query(Upload).update({"created_at": datetime.utcnow() - timedelta(days=30)})
+    db.commit()
+    criteria = upload_gc_service.orphaned(datetime.utcnow() - timedelta(hours=1))
+
+    # Selected as orphans, then linked by a registration before the batch ran
+    client.post("/api/register/", json={
+        "email": "late@example.com", "username": "late", "password": "password123",
+        "full_name": "Late User", "audio_oath_id": second["file_id"]
+    })
+    deleted, paths, blobs = upload_gc_service._delete_batch(db, [first["upload_id"], second["upload_id"]], criteria)
+    db.commit()
+    assert (deleted, paths, blobs) == (1, [], [])
+    db.expire_all()
+    assert db.get(UploadBlob, first["sha256"]).ref_count == 1
+    assert _blob_path(tmp_path, second).read_bytes() == content
+
+    # Another worker is collecting
+    holder = acquire_lease(db, upload_gc_service.LEASE_NAME, 600)
+    third = client.post("/api/upload/audio", files={"file": ("c.webm", os.urandom(500), "audio/webm")}).json()
+    db.query(Upload).filter(Upload.id == third["upload_id"]).update({"created_at": datetime.utcnow() - timedelta(days=30)})
+    db.commit()
+    assert upload_gc_service.collect_orphaned_uploads(db, pause_seconds=0)["uploads_deleted"] == 0
+
+    release_lease(db, upload_gc_service.LEASE_NAME, holder)
+    assert upload_gc_service.collect_orphaned_uploads(db, pause_seconds=0)["uploads_deleted"] == 1
+    assert not _blob_path(tmp_path, third).exists()
+
+
+def test_retention_keeps_approved_registrations_files(client, db, tmp_path, monkeypatch):
+    from datetime import datetime, timedelta
+    from app.services import registration_service
+    from app.services.retention_service import retention_engine
+
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "ARCHIVE_DIR", str(tmp_path / "archive"))
+    monkeypatch.setattr(retention_engine, "pause_seconds", 0)
+
+    users = {}
+    for name in ("approved", "rejected", "bare"):
+        oath = client.post("/api/upload/audio", files={"file": (f"{name}.webm", os.urandom(1000), "audio/webm")}).json()
+        client.post("/api/register/", json={
+            "email": f"{name}@example.com", "username": name, "password": "password123",
+            "full_name": name.title(), "audio_oath_id": oath["file_id"] if name != "bare" else None
+        })
+        users[name] = (db.query(PendingUser).filter(PendingUser.username == name).one().id, oath)
+
+    registration_service.approve_user(users["approved"][0], None, db)
+    registration_service.reject_user(users["rejected"][0], "Incomplete", db)
+    registration_service.approve_user(users["bare"][0], None, db)
+    old = datetime.utcnow() - timedelta(days=settings.REVIEWED_PENDING_USER_RETENTION_DAYS + 1)
+    db.query(PendingUser).update({"updated_at": old})
+    db.commit()
+
+    assert retention_engine.run(db)["pending_users"] == 2
+    assert [u.username for u in db.query(PendingUser)] == ["approved"]
+
+    # The rejected registration's file was unlinked rather than left pointing at nothing
+    links = {(a.pending_user_id, a.upload_id) for a in db.query(RegistrationAttachment)}
+    assert links == {(users["approved"][0], users["approved"][1]["upload_id"])}
+    rejected_upload = db.get(Upload, users["rejected"][1]["upload_id"])
+    db.refresh(rejected_upload)
+    assert rejected_upload.owner_id is None
+
+
+def _random_photo(seed: int, size=(640, 480), quality=95) -> bytes:
+    import random
+    from io import BytesIO
+    from PIL import Image
+
+    noise = Image.frombytes("L", (16, 12), random.Random(seed).randbytes(16 * 12))
+    out = BytesIO()
+    noise.resize(size, Image.BICUBIC).convert("RGB").save(out, "JPEG", quality=quality)
+    return out.getvalue()
+
+
+def _resaved(content: bytes) -> bytes:
+    from io import BytesIO
+    from PIL import Image
+
+    out = BytesIO()
+    with Image.open(BytesIO(content)) as image:
+        image.resize((512, 384)).save(out, "JPEG", quality=60)
+    return out.getvalue()
+
+
+def test_multi_index_search_is_exact_and_prunes(monkeypatch):
+    import random
+    from app.utils import multi_index
+
+    rng = random.Random(7)
+    keys = [rng.getrandbits(64) for _ in range(2000)]
+    index = multi_index.MultiIndexHash()
+    for i, key in enumerate(keys):
+        index.add(key, i)
+
+    max_distance = settings.PHOTO_DUPLICATE_MAX_DISTANCE
+    # As far away as allowed, with the flipped bits spread evenly over the 16-bit substrings
+    near = keys[123]
+    for bit in [chunk * 16 + i for i in range(16) for chunk in range(4)][:max_distance]:
+        near ^= 1 << bit
+
+    calls = []
+    original = multi_index.hamming
+    monkeypatch.setattr(multi_index, "hamming", lambda a, b: calls.append(1) or original(a, b))
+
+    for query in (near, keys[456] ^ 0b1011):
+        calls.clear()
+        found = index.search(query, max_distance)
+        assert found == sorted(
+            (original(query, key), i) for i, key in enumerate(keys) if original(query, key) <= max_distance
+        )
+        assert len(calls) < len(keys) / 20
+
+    assert index.search(near, max_distance)[0] == (max_distance, 123)
+
+
+def test_pending_list_flags_near_duplicate_photos(client, db, test_admin, tmp_path, monkeypatch):
+    from app.core.images import image_processor
+
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "IMAGE_DERIVATIVES_ENABLED", False)
+    original = _random_photo(1)
+    photos = {"first": original, "again": _resaved(original), "other": _random_photo(2)}
+
+    try:
+        for username, content in photos.items():
+            file_id = client.post(
+                "/api/upload/photo", files={"file": (f"{username}.jpg", content, "image/jpeg")}
+            ).json()["file_id"]
+            client.post("/api/register/", json={
+                "email": f"{username}@example.com", "username": username, "password": "password123",
+                "full_name": username.title(), "photo_ids": file_id
+            })
+    finally:
+        image_processor.shutdown()
+
+    response = client.get("/api/admin/pending", headers=_admin_headers(client))
+    flagged = {user["username"]: user["possible_duplicates"] for user in response.json()}
+
+    assert [match["username"] for match in flagged["first"]] == ["again"]
+    assert [match["username"] for match in flagged["again"]] == ["first"]
+    assert flagged["first"][0]["distance"] <= settings.PHOTO_DUPLICATE_MAX_DISTANCE
+    assert flagged["other"] == []